@@ -0,0 +1,34 @@
+"""sync read markers and indexes
+
+Revision ID: a3c1f7d2e9b4
+Revises: 5f588ebba530
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c1f7d2e9b4'
+down_revision: Union[str, None] = '5f588ebba530'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('participant1_last_read_id', sa.Integer(), server_default='0', nullable=False, comment='参与者1已读到的最大消息ID'))
+    op.add_column('conversations', sa.Column('participant2_last_read_id', sa.Integer(), server_default='0', nullable=False, comment='参与者2已读到的最大消息ID'))
+    op.create_index('ix_conversations_p1_updated', 'conversations', ['participant1_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_conversations_p2_updated', 'conversations', ['participant2_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_messages_conversation_id_id', 'messages', ['conversation_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_id_id', table_name='messages')
+    op.drop_index('ix_conversations_p2_updated', table_name='conversations')
+    op.drop_index('ix_conversations_p1_updated', table_name='conversations')
+    op.drop_column('conversations', 'participant2_last_read_id')
+    op.drop_column('conversations', 'participant1_last_read_id')
@@ -0,0 +1,86 @@
+"""
+WebSocket 握手准入控制
+
+断线恢复后大量客户端同时重连，每个握手都要查询一次用户，会耗尽数据库连接池并拖慢 REST 请求。
+握手先经过令牌桶：
+    - 有令牌：立即放行（admitted）
+    - 无令牌但预计等待不超过 max_wait：预留令牌并短暂等待后放行（deferred）
+    - 否则拒绝（rejected），由调用方发送带 retry_after 的 reconnect 帧并以 1013 关闭
+"""
+from typing import Optional
+import asyncio
+import random
+import time
+
+
+class HandshakeAdmission:
+    """令牌桶（允许预留，令牌数可为负表示已排队的握手）"""
+
+    def __init__(self, rate: float, burst: int, max_wait: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数（<= 0 表示不限制）
+            burst: 桶容量（允许的瞬时握手数）
+            max_wait: 单个握手最多等待秒数
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        # 指标
+        self.admitted = 0
+        self.deferred = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> Optional[float]:
+        """
+        申请握手令牌
+
+        Returns:
+            None 表示已放行；否则为建议的重试等待秒数（已拒绝）
+        """
+        if self.rate <= 0:
+            self.admitted += 1
+            return None
+
+        self._refill(time.monotonic())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.admitted += 1
+            return None
+
+        wait = (1 - self._tokens) / self.rate
+        if wait > self.max_wait:
+            self.rejected += 1
+            # 在当前积压清空所需时间之后再随机分散一个同样长度的窗口
+            return wait + random.uniform(0, wait)
+
+        # 预留令牌后等待（后到的握手预留在更靠后的位置，按到达顺序放行）
+        self._tokens -= 1
+        self.deferred += 1
+        self.waiting += 1
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self.waiting -= 1
+            self.wait_seconds_total += wait
+        return None
+
+    def stats(self) -> dict:
+        """准入指标快照"""
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "admitted": self.admitted,
+            "deferred": self.deferred,
+            "rejected": self.rejected,
+            "waiting": self.waiting,
+            "wait_seconds_total": self.wait_seconds_total,
+        }
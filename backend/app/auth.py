@@ -1,28 +1,33 @@
 """
 JWT 认证工具模块
 """
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from .config import settings
+from .metrics import registry
 
 # JWT 配置
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-if SECRET_KEY is None:
-    raise ValueError("JWT_SECRET_KEY 环境变量未设置，请在 .env 文件中配置")
+SECRET_KEY = settings.jwt_secret_key
+ALGORITHM = settings.jwt_algorithm
+ACCESS_TOKEN_EXPIRE_DAYS = settings.jwt_access_token_expire_days
+
+# 认证主体缓存配置
+AUTH_CACHE_SIZE = settings.auth_cache_size
+AUTH_CACHE_TTL = settings.auth_cache_ttl
 
-ALGORITHM = os.getenv("JWT_ALGORITHM")
-if ALGORITHM is None:
-    raise ValueError("JWT_ALGORITHM 环境变量未设置，请在 .env 文件中配置")
+# 密码哈希线程池配置
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+PASSWORD_HASH_QUEUE = settings.password_hash_queue
 
-access_token_expire_days_str = os.getenv("JWT_ACCESS_TOKEN_EXPIRE_DAYS")
-if access_token_expire_days_str is None:
-    raise ValueError("JWT_ACCESS_TOKEN_EXPIRE_DAYS 环境变量未设置，请在 .env 文件中配置")
-ACCESS_TOKEN_EXPIRE_DAYS = int(access_token_expire_days_str)
+logger = logging.getLogger(__name__)
 
 # 密码加密上下文
 # 使用 bcrypt_sha256 以获得更好的兼容性和支持更长的密码
@@ -62,6 +67,125 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordPoolBusy(Exception):
+    """密码哈希线程池排队已满"""
+
+
+class PasswordExecutor:
+    """
+    密码哈希专用的有界线程池
+
+    bcrypt 计算一次需要数十毫秒，直接在协程中调用会阻塞事件循环（以及该 worker 上的所有 WebSocket）。
+    bcrypt 计算期间释放 GIL，放到独立线程池中即可与事件循环并行。
+    同时执行数为 max_workers，等待 + 执行中的任务超过 max_pending 时直接拒绝，避免登录洪峰无限排队。
+    """
+
+    # 排队超过该秒数时记录警告
+    SLOW_QUEUE_SECONDS = 1.0
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+            if max_workers > 0 else None
+        )
+        self._lock = threading.Lock()
+        self.pending = 0            # 等待 + 执行中
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    async def run(self, func: Callable, *args):
+        """
+        在线程池中执行 func(*args)
+
+        Raises:
+            PasswordPoolBusy: 排队已满
+        """
+        if self._executor is None:
+            # max_workers 为 0：在事件循环内直接计算（仅用于对比测试）
+            return self._timed(func, args, time.perf_counter())
+
+        with self._lock:
+            if self.max_pending > 0 and self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, args, time.perf_counter())
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _timed(self, func: Callable, args: tuple, submitted: float):
+        """执行并记录排队时间与执行时间"""
+        started = time.perf_counter()
+        queued = started - submitted
+        if queued > self.SLOW_QUEUE_SECONDS:
+            logger.warning("密码哈希排队 %.2fs（pending=%d）", queued, self.pending)
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.completed += 1
+                self.queue_seconds_total += queued
+                self.queue_seconds_max = max(self.queue_seconds_max, queued)
+                self.run_seconds_total += elapsed
+
+    def stats(self) -> dict:
+        """线程池指标快照"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_seconds_total": self.queue_seconds_total,
+                "queue_seconds_max": self.queue_seconds_max,
+                "run_seconds_total": self.run_seconds_total,
+            }
+
+    def shutdown(self) -> None:
+        """关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局密码哈希线程池
+password_executor = PasswordExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
+
+PASSWORD_HASH_PENDING = registry.gauge("password_hash_pending", "密码哈希线程池排队 + 执行中的任务数")
+PASSWORD_HASH_TASKS = registry.counter("password_hash_tasks_total", "密码哈希任务数", ("result",))
+PASSWORD_HASH_QUEUE_SECONDS = registry.counter("password_hash_queue_seconds_total", "密码哈希任务累计排队时间")
+
+
+def _collect_password_executor():
+    stats = password_executor.stats()
+    PASSWORD_HASH_PENDING.set(stats["pending"])
+    PASSWORD_HASH_TASKS.set(stats["completed"], "completed")
+    PASSWORD_HASH_TASKS.set(stats["rejected"], "rejected")
+    PASSWORD_HASH_QUEUE_SECONDS.set(stats["queue_seconds_total"])
+
+
+registry.on_collect(_collect_password_executor)
+
+
+async def hash_password_async(password: str) -> str:
+    """在密码哈希线程池中加密密码（协程中使用）"""
+    return await password_executor.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证密码（协程中使用）"""
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     创建 JWT Access Token
@@ -102,3 +226,61 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+
+class PrincipalCache:
+    """
+    已验证 Token → 用户ID 的缓存（有界 LRU + TTL）
+
+    命中时跳过 JWT 解码；条目在 TTL 与 Token 过期时间中较早者失效。
+    用户字段由用户目录（app.user_directory）提供，用户被修改、禁用或删除时由目录跨进程写穿失效。
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # token -> (过期时间戳, user_id)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[str]:
+        """返回缓存的用户ID，未命中或已过期返回 None"""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def put(self, token: str, payload: dict) -> None:
+        """
+        缓存已验证的 Token
+
+        Args:
+            token: JWT Token 字符串
+            payload: 解码后的 Token 数据（读取 user_id 和 exp）
+        """
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[token] = (expires_at, payload["user_id"])
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局认证主体缓存
+principal_cache = PrincipalCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
@@ -0,0 +1,227 @@
+"""
+头像渲染模块
+按用户ID确定性地生成「彩色背景 + 文字」圆形头像，并提供内存 LRU + 磁盘两级缓存
+
+文字和背景色都由完整用户ID的哈希决定：ID 常带有相同前缀（如 buyer_001、buyer_002），
+取前几个字符会让同类用户的头像完全一样。头像内容只与用户ID有关（URL 可长期强缓存），
+因此不使用可修改的用户名。
+"""
+import asyncio
+import colorsys
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import quote
+
+from PIL import Image, ImageDraw, ImageFont
+
+# 渲染器版本：修改绘制逻辑后递增，使旧的磁盘缓存和 ETag 失效
+AVATAR_RENDER_VERSION = 2
+
+# 默认头像尺寸
+DEFAULT_AVATAR_SIZE = 200
+
+# 允许的头像尺寸（请求尺寸向上取整到该列表，避免缓存被任意尺寸撑爆）
+AVATAR_SIZES = (32, 48, 64, 96, 128, 200, 256, 512)
+
+# 头像文字字符集（去掉易混淆的 I、O、0、1），两个字符共 32 × 32 种组合
+AVATAR_GLYPHS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+# 背景色：色相由哈希决定（360 种），亮度和饱和度固定，保证白色文字清晰
+AVATAR_LIGHTNESS = 0.55
+AVATAR_SATURATION = 0.6
+
+# 字体候选列表（Windows 微软雅黑 → Linux/Mac DejaVu）
+FONT_CANDIDATES = [
+    "msyh.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+]
+
+
+def hex_to_rgb(hex_color: str) -> tuple:
+    """将十六进制颜色转换为 RGB"""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def normalize_size(size: Optional[int]) -> int:
+    """将请求尺寸向上取整到允许的尺寸"""
+    if not size:
+        return DEFAULT_AVATAR_SIZE
+    for allowed in AVATAR_SIZES:
+        if size <= allowed:
+            return allowed
+    return AVATAR_SIZES[-1]
+
+
+def _user_digest(user_id: str) -> bytes:
+    """完整用户ID的哈希（文字和背景色共用）"""
+    return hashlib.sha1(user_id.encode("utf-8")).digest()
+
+
+def avatar_text_for(user_id: str) -> str:
+    """根据用户ID确定性地生成头像文字（两个字符）"""
+    digest = _user_digest(user_id)
+    return AVATAR_GLYPHS[digest[0] % len(AVATAR_GLYPHS)] + AVATAR_GLYPHS[digest[1] % len(AVATAR_GLYPHS)]
+
+
+def avatar_color_for(user_id: str) -> str:
+    """根据用户ID确定性地选择背景色（十六进制）"""
+    digest = _user_digest(user_id)
+    hue = int.from_bytes(digest[2:4], "big") % 360
+    r, g, b = colorsys.hls_to_rgb(hue / 360, AVATAR_LIGHTNESS, AVATAR_SATURATION)
+    return "#{:02X}{:02X}{:02X}".format(round(r * 255), round(g * 255), round(b * 255))
+
+
+def _load_font(font_size: int):
+    """尝试使用系统字体，如果失败则使用默认字体"""
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, font_size)
+        except (OSError, IOError):
+            continue
+    return ImageFont.load_default()
+
+
+def render_avatar(text: str, color: str, size: int = DEFAULT_AVATAR_SIZE) -> Image.Image:
+    """
+    渲染圆形头像
+
+    Args:
+        text: 头像上显示的文字
+        color: 背景颜色（十六进制）
+        size: 头像边长（像素）
+
+    Returns:
+        RGBA 图像对象
+    """
+    img = Image.new('RGB', (size, size), hex_to_rgb(color))
+    draw = ImageDraw.Draw(img)
+
+    # 字体大小随尺寸缩放（两个字符时略小）
+    font = _load_font(int(size * (0.4 if len(text) <= 1 else 0.34)))
+
+    # 计算文字位置（居中）
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    position = (
+        (size - text_width) // 2 - bbox[0],
+        (size - text_height) // 2 - bbox[1],
+    )
+
+    # 绘制文字（白色）
+    draw.text(position, text, fill=(255, 255, 255), font=font)
+
+    # 圆形遮罩
+    mask = Image.new('L', (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size, size), fill=255)
+
+    output = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    output.paste(img, (0, 0))
+    output.putalpha(mask)
+    return output
+
+
+def render_avatar_png(text: str, color: str, size: int = DEFAULT_AVATAR_SIZE) -> bytes:
+    """渲染头像并编码为 PNG 字节"""
+    buffer = io.BytesIO()
+    render_avatar(text, color, size).save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def generated_avatar_path(user_id: str) -> str:
+    """生成头像的相对路径（存入 User.avatar，由 /api/media/avatars/generated 接口渲染）"""
+    return f"/api/media/avatars/generated/{quote(user_id, safe='')}.png"
+
+
+def avatar_etag(user_id: str, size: int) -> str:
+    """生成头像 ETag（只与用户ID、尺寸和渲染器版本有关）"""
+    key = f"{AVATAR_RENDER_VERSION}:{size}:{user_id}".encode("utf-8")
+    return '"' + hashlib.sha1(key).hexdigest() + '"'
+
+
+class AvatarCache:
+    """
+    头像缓存
+
+    查找顺序：内存 LRU → 磁盘缓存 → 线程池渲染。
+    同一头像的并发请求共享同一次渲染。
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int, max_workers: int):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="avatar")
+
+    def _disk_path(self, user_id: str, size: int) -> Path:
+        """磁盘缓存路径（用户ID做哈希，避免路径注入）"""
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"v{AVATAR_RENDER_VERSION}" / str(size) / digest[:2] / f"{digest}.png"
+
+    def _remember(self, key: tuple, data: bytes):
+        """写入内存 LRU"""
+        self._lru[key] = data
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_cached(self, user_id: str, size: int) -> Optional[bytes]:
+        """仅查内存 LRU"""
+        key = (user_id, size)
+        data = self._lru.get(key)
+        if data is not None:
+            self._lru.move_to_end(key)
+        return data
+
+    def _load_or_render(self, user_id: str, size: int) -> bytes:
+        """在线程池中执行：读磁盘缓存，未命中则渲染并落盘"""
+        path = self._disk_path(user_id, size)
+        if path.exists():
+            return path.read_bytes()
+
+        data = render_avatar_png(avatar_text_for(user_id), avatar_color_for(user_id), size)
+
+        # 先写临时文件再原子替换，避免多进程同时写入产生半截文件
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+        return data
+
+    def has_on_disk(self, user_id: str, size: int) -> bool:
+        """磁盘缓存中是否已有该头像"""
+        return self._disk_path(user_id, size).exists()
+
+    async def get(self, user_id: str, size: int) -> bytes:
+        """获取头像 PNG 字节（命中缓存或渲染）"""
+        data = self.get_cached(user_id, size)
+        if data is not None:
+            return data
+
+        key = (user_id, size)
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self._load_or_render, user_id, size)
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._on_rendered(key, f))
+
+        # shield：单个请求被取消时不影响其他等待同一渲染结果的请求
+        return await asyncio.shield(future)
+
+    def _on_rendered(self, key: tuple, future: asyncio.Future):
+        """渲染完成回调：移出进行中列表并写入 LRU"""
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self._remember(key, future.result())
+
+    def shutdown(self):
+        """关闭渲染线程池"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,182 @@
+"""
+相同只读请求合并（single-flight）
+
+管理后台、实时监控等页面经常被多名管理员/客服同时打开，产生完全相同的 count + 分页查询。
+@coalesced 装饰的 GET 接口按 路由 + 规范化参数（FastAPI 解析后的路径/查询参数）+ 认证范围
+（Authorization 头）+ If-None-Match 生成键：
+    - 同一键已有请求在执行时，后到的请求等待并共享其结果（或异常），不再占用数据库连接
+    - COALESCE_WINDOW_MS > 0 时，结果在完成后继续保留该毫秒数供相同请求直接使用（微缓存，
+      数据最多滞后该时长）；为 0 时只合并同时在途的请求
+    - 首个请求被取消（客户端断开）时，等待中的请求各自重新执行
+
+只用于无副作用、结果只取决于参数的接口；合并只在单个进程内进行。
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import copy
+import functools
+import inspect
+import time
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .metrics import registry
+
+# 装饰器为没有 Request 参数的接口追加的参数名
+_REQUEST_PARAM = "coalesce_request"
+
+
+class _LeaderCancelled(Exception):
+    """首个请求被取消，等待者需要自行执行"""
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    """标记异常已读取（等待者可能已被取消，避免 "exception was never retrieved" 警告）"""
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """按键合并在途的异步调用（单线程事件循环内使用，无需加锁）"""
+
+    def __init__(self, enabled: bool, window: float):
+        """
+        Args:
+            enabled: 是否合并（关闭时直接执行）
+            window: 完成后结果的保留秒数（0 表示只合并在途请求）
+        """
+        self.enabled = enabled
+        self.window = window
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        # 键 -> (过期时间, 结果)
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}
+        self._next_purge = 0.0
+        self.leaders = 0
+        self.followers = 0
+        self.cached = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await fn()
+
+        if self._recent:
+            now = time.monotonic()
+            entry = self._recent.get(key)
+            if entry is not None and entry[0] > now:
+                self.cached += 1
+                return entry[1]
+            if now >= self._next_purge:
+                self._purge(now)
+
+        future = self._flights.get(key)
+        if future is not None:
+            self.followers += 1
+            try:
+                # shield：等待者被取消时不影响首个请求
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                return await fn()
+
+        future = self._flights[key] = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            del self._flights[key]
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as exc:
+            del self._flights[key]
+            future.set_exception(exc)
+            raise
+        del self._flights[key]
+        future.set_result(result)
+        if self.window > 0:
+            self._recent[key] = (time.monotonic() + self.window, result)
+        return result
+
+    def _purge(self, now: float) -> None:
+        """清除过期的微缓存结果（每个窗口最多执行一次）"""
+        expired = [key for key, (expires_at, _) in self._recent.items() if expires_at <= now]
+        for key in expired:
+            del self._recent[key]
+        self._next_purge = now + self.window
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leader": self.leaders,
+            "follower": self.followers,
+            "cached": self.cached,
+        }
+
+
+# 全局请求合并
+single_flight = SingleFlight(settings.request_coalescing, settings.coalesce_window_ms / 1000)
+
+
+def _share(result: Any) -> Any:
+    """Response 对象每个请求使用独立副本（头部列表与后台任务不共享）"""
+    if isinstance(result, Response):
+        result = copy.copy(result)
+        result.raw_headers = list(result.raw_headers)
+        result.background = None
+    return result
+
+
+def coalesced(name: str):
+    """
+    合并相同的并发只读请求
+
+    Args:
+        name: 键前缀（通常为接口名，区分参数相同的不同接口）
+
+    用法：
+        @router.get("/")
+        @coalesced("conversations")
+        async def get_conversations(...): ...
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        request_param = next(
+            (p.name for p in signature.parameters.values() if p.annotation is Request),
+            None,
+        )
+        parameters = list(signature.parameters.values())
+        if request_param is None:
+            parameters.append(inspect.Parameter(_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            request: Request = kwargs[request_param] if request_param else kwargs.pop(_REQUEST_PARAM)
+            params = tuple(sorted(
+                (key, repr(value)) for key, value in kwargs.items()
+                if not isinstance(value, (AsyncSession, Request))
+            ))
+            key = (
+                name,
+                params,
+                request.headers.get("authorization"),
+                request.headers.get("if-none-match"),
+            )
+            return _share(await single_flight.run(key, functools.partial(fn, **kwargs)))
+
+        wrapper.__signature__ = signature.replace(parameters=parameters)
+        return wrapper
+
+    return decorator
+
+
+COALESCE_IN_FLIGHT = registry.gauge("coalesce_in_flight", "合并中的在途请求键数")
+COALESCE_REQUESTS = registry.counter("coalesce_requests_total", "可合并请求的处理方式", ("result",))
+
+
+def _collect_coalesce():
+    stats = single_flight.stats()
+    COALESCE_IN_FLIGHT.set(stats["in_flight"])
+    for result in ("leader", "follower", "cached"):
+        COALESCE_REQUESTS.set(stats[result], result)
+
+
+registry.on_collect(_collect_coalesce)
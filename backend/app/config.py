@@ -0,0 +1,191 @@
+"""
+应用配置
+
+进程内只加载一次 .env 并解析全部环境变量，各模块通过 settings 读取，
+避免每个模块在导入时重复调用 load_dotenv() 和各自解析。
+
+所有配置必需，无默认值：仅在未设置（None）时报错，"False"、"0"、""（空字符串）均视为有效值。
+"""
+from dataclasses import dataclass
+from typing import List
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _require(name: str) -> str:
+    """读取必需的环境变量"""
+    value = os.getenv(name)
+    if value is None:
+        raise ValueError(f"{name} 环境变量未设置，请在 .env 文件中配置")
+    return value
+
+
+def _require_int(name: str) -> int:
+    return int(_require(name))
+
+
+def _require_bool(name: str) -> bool:
+    return _require(name).lower() == "true"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """全部环境变量配置"""
+
+    # 数据库
+    database_url: str
+    debug_sql: bool
+    db_pool_pre_ping: bool
+    db_pool_recycle: int
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: int
+    db_realtime_pool_size: int
+    db_realtime_max_overflow: int
+    db_realtime_pool_timeout: int
+    db_admin_pool_size: int
+    db_admin_max_overflow: int
+    db_admin_pool_timeout: int
+    sql_warn_queries: int
+    sql_warn_ms: int
+    sql_n_plus_one_threshold: int
+    db_shed_wait_target_ms: int
+    db_shed_max_concurrency: int
+
+    # JWT 认证
+    jwt_secret_key: str
+    jwt_algorithm: str
+    jwt_access_token_expire_days: int
+    auth_cache_size: int
+    auth_cache_ttl: int
+    password_hash_workers: int
+    password_hash_queue: int
+    user_directory_size: int
+    user_directory_ttl: int
+
+    # 服务器
+    host: str
+    port: int
+    reload: bool
+    debug: bool
+    base_url: str
+
+    # CORS
+    cors_origins: List[str]
+
+    # 文件上传
+    media_dir: str
+    max_file_size: int
+
+    # 头像生成
+    avatar_cache_size: int
+    avatar_render_workers: int
+
+    # 缓存
+    hot_messages_per_conversation: int
+    hot_messages_memory_mb: int
+    hot_messages_ttl: int
+    quick_reply_cache_size: int
+    cache_invalidation_dir: str
+    request_coalescing: bool
+    coalesce_window_ms: int
+
+    # 启动
+    seed_on_startup: bool
+    startup_budget_ms: int
+
+    # WebSocket 网关
+    ws_event_socket: str
+    ws_gateway_port: int
+    ws_drain_window_ms: int
+    ws_handshake_rate: float
+    ws_handshake_burst: int
+    ws_handshake_max_wait_ms: int
+    ws_capture_dir: str
+
+    # 运行指标
+    metrics_dir: str
+    metrics_flush_interval: int
+    loop_lag_interval_ms: int
+    loop_stall_threshold_ms: int
+
+    # 应用信息
+    app_title: str
+    app_description: str
+    app_version: str
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """从环境变量解析配置（缺失时抛出 ValueError）"""
+        base_url = _require("BASE_URL")
+        if not base_url:
+            raise ValueError("BASE_URL 环境变量未设置，请在 .env 文件中配置")
+
+        return cls(
+            database_url=_require("DATABASE_URL"),
+            debug_sql=_require_bool("DEBUG_SQL"),
+            db_pool_pre_ping=_require_bool("DB_POOL_PRE_PING"),
+            db_pool_recycle=_require_int("DB_POOL_RECYCLE"),
+            db_pool_size=_require_int("DB_POOL_SIZE"),
+            db_max_overflow=_require_int("DB_MAX_OVERFLOW"),
+            db_pool_timeout=_require_int("DB_POOL_TIMEOUT"),
+            db_realtime_pool_size=_require_int("DB_REALTIME_POOL_SIZE"),
+            db_realtime_max_overflow=_require_int("DB_REALTIME_MAX_OVERFLOW"),
+            db_realtime_pool_timeout=_require_int("DB_REALTIME_POOL_TIMEOUT"),
+            db_admin_pool_size=_require_int("DB_ADMIN_POOL_SIZE"),
+            db_admin_max_overflow=_require_int("DB_ADMIN_MAX_OVERFLOW"),
+            db_admin_pool_timeout=_require_int("DB_ADMIN_POOL_TIMEOUT"),
+            sql_warn_queries=_require_int("SQL_WARN_QUERIES"),
+            sql_warn_ms=_require_int("SQL_WARN_MS"),
+            sql_n_plus_one_threshold=_require_int("SQL_N_PLUS_ONE_THRESHOLD"),
+            db_shed_wait_target_ms=_require_int("DB_SHED_WAIT_TARGET_MS"),
+            db_shed_max_concurrency=_require_int("DB_SHED_MAX_CONCURRENCY"),
+            jwt_secret_key=_require("JWT_SECRET_KEY"),
+            jwt_algorithm=_require("JWT_ALGORITHM"),
+            jwt_access_token_expire_days=_require_int("JWT_ACCESS_TOKEN_EXPIRE_DAYS"),
+            auth_cache_size=_require_int("AUTH_CACHE_SIZE"),
+            auth_cache_ttl=_require_int("AUTH_CACHE_TTL"),
+            password_hash_workers=_require_int("PASSWORD_HASH_WORKERS"),
+            password_hash_queue=_require_int("PASSWORD_HASH_QUEUE"),
+            user_directory_size=_require_int("USER_DIRECTORY_SIZE"),
+            user_directory_ttl=_require_int("USER_DIRECTORY_TTL"),
+            host=_require("HOST"),
+            port=_require_int("PORT"),
+            reload=_require_bool("RELOAD"),
+            debug=_require_bool("DEBUG"),
+            base_url=base_url,
+            cors_origins=_require("CORS_ORIGINS").split(","),
+            media_dir=_require("MEDIA_DIR"),
+            max_file_size=_require_int("MAX_FILE_SIZE"),
+            avatar_cache_size=_require_int("AVATAR_CACHE_SIZE"),
+            avatar_render_workers=_require_int("AVATAR_RENDER_WORKERS"),
+            hot_messages_per_conversation=_require_int("HOT_MESSAGES_PER_CONVERSATION"),
+            hot_messages_memory_mb=_require_int("HOT_MESSAGES_MEMORY_MB"),
+            hot_messages_ttl=_require_int("HOT_MESSAGES_TTL"),
+            quick_reply_cache_size=_require_int("QUICK_REPLY_CACHE_SIZE"),
+            cache_invalidation_dir=_require("CACHE_INVALIDATION_DIR"),
+            request_coalescing=_require_bool("REQUEST_COALESCING"),
+            coalesce_window_ms=_require_int("COALESCE_WINDOW_MS"),
+            seed_on_startup=_require_bool("SEED_ON_STARTUP"),
+            startup_budget_ms=_require_int("STARTUP_BUDGET_MS"),
+            ws_event_socket=_require("WS_EVENT_SOCKET"),
+            ws_gateway_port=_require_int("WS_GATEWAY_PORT"),
+            ws_drain_window_ms=_require_int("WS_DRAIN_WINDOW_MS"),
+            ws_handshake_rate=float(_require("WS_HANDSHAKE_RATE")),
+            ws_handshake_burst=_require_int("WS_HANDSHAKE_BURST"),
+            ws_handshake_max_wait_ms=_require_int("WS_HANDSHAKE_MAX_WAIT_MS"),
+            ws_capture_dir=_require("WS_CAPTURE_DIR"),
+            metrics_dir=_require("METRICS_DIR"),
+            metrics_flush_interval=_require_int("METRICS_FLUSH_INTERVAL"),
+            loop_lag_interval_ms=_require_int("LOOP_LAG_INTERVAL_MS"),
+            loop_stall_threshold_ms=_require_int("LOOP_STALL_THRESHOLD_MS"),
+            app_title=_require("APP_TITLE"),
+            app_description=_require("APP_DESCRIPTION"),
+            app_version=_require("APP_VERSION"),
+        )
+
+
+# 全局配置（导入时解析一次）
+settings = Settings.from_env()
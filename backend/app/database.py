@@ -1,65 +1,145 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-if DATABASE_URL is None:
-    raise ValueError("DATABASE_URL 环境变量未设置，请在 .env 文件中配置")
-
-debug_sql_str = os.getenv("DEBUG_SQL")
-if debug_sql_str is None:
-    raise ValueError("DEBUG_SQL 环境变量未设置，请在 .env 文件中配置")
-DEBUG_SQL = debug_sql_str.lower() == "true"
+from typing import Dict
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import time
+from .config import settings
+from .load_shedding import Admission, create_shedder, load_shedders, request_priority, request_pool, DEFAULT_POOL, POOLS
+from .metrics import registry, DB_POOL_WAIT_SECONDS
+
+DATABASE_URL = settings.database_url
+DEBUG_SQL = settings.debug_sql
 
 # ================== 连接池与断连防护（必填） ==================
-# 说明：与其它环境变量保持一致风格：仅在未设置（None）时报错；
+# 说明：配置由 app.config 统一解析，仅在未设置（None）时报错；
 # "False"、"0"、""（空字符串）均视为有效值，但数值型配置不建议使用空字符串。
-
-pool_pre_ping_str = os.getenv("DB_POOL_PRE_PING")
-if pool_pre_ping_str is None:
-    raise ValueError("DB_POOL_PRE_PING 环境变量未设置，请在 .env 文件中配置")
-pool_pre_ping = pool_pre_ping_str.lower() == "true"
-
-pool_recycle_str = os.getenv("DB_POOL_RECYCLE")
-if pool_recycle_str is None:
-    raise ValueError("DB_POOL_RECYCLE 环境变量未设置，请在 .env 文件中配置")
-pool_recycle = int(pool_recycle_str)
-
-pool_size_str = os.getenv("DB_POOL_SIZE")
-if pool_size_str is None:
-    raise ValueError("DB_POOL_SIZE 环境变量未设置，请在 .env 文件中配置")
-pool_size = int(pool_size_str)
-
-max_overflow_str = os.getenv("DB_MAX_OVERFLOW")
-if max_overflow_str is None:
-    raise ValueError("DB_MAX_OVERFLOW 环境变量未设置，请在 .env 文件中配置")
-max_overflow = int(max_overflow_str)
-
-pool_timeout_str = os.getenv("DB_POOL_TIMEOUT")
-if pool_timeout_str is None:
-    raise ValueError("DB_POOL_TIMEOUT 环境变量未设置，请在 .env 文件中配置")
-pool_timeout = int(pool_timeout_str)
+pool_pre_ping = settings.db_pool_pre_ping
+pool_recycle = settings.db_pool_recycle
+pool_size = settings.db_pool_size
+max_overflow = settings.db_max_overflow
+pool_timeout = settings.db_pool_timeout
 
 # 注：对 mysql+aiomysql 来说，常见的 connect_args 参数通常无需设置。
 # 若需要限制初始连接等待，可按需加入：connect_args={"connect_timeout": 10}
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=DEBUG_SQL,
-    pool_pre_ping=pool_pre_ping,
-    pool_recycle=pool_recycle,
-    pool_size=pool_size,
-    max_overflow=max_overflow,
-    pool_timeout=pool_timeout,
-)
-async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
-
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+# ================== 命名连接池（隔离舱） ==================
+# 同一数据库按流量类型使用独立的引擎和连接池，慢的管理后台查询不会占满实时路径的连接：
+#   default   未声明连接池的接口（DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT）
+#   realtime  WebSocket 处理、发送消息、标记已读（DB_REALTIME_*）
+#   admin     管理后台全量列表与统计（DB_ADMIN_*）
+# 接口通过 @db_priority(..., pool=...) 声明，WebSocket 等无请求的代码使用 session_maker(名称)。
+# 每个 worker 的连接上限为三个连接池 size + overflow 之和。
+POOL_SETTINGS = {
+    DEFAULT_POOL: (pool_size, max_overflow, pool_timeout),
+    "realtime": (settings.db_realtime_pool_size, settings.db_realtime_max_overflow, settings.db_realtime_pool_timeout),
+    "admin": (settings.db_admin_pool_size, settings.db_admin_max_overflow, settings.db_admin_pool_timeout),
+}
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """记录取连接等待时间的连接池（池满时等待其它请求归还，或新建连接），并上报给过载保护"""
+
+    # 日志沿用原连接池的 logger（sqlalchemy.pool.impl.AsyncAdaptedQueuePool.{连接池名称}），
+    # 级别仍由 sqlalchemy 日志配置 / DEBUG_SQL 控制
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+    @property
+    def name(self) -> str:
+        """连接池名称（即 pool_logging_name，连接池重建时保留）"""
+        return self.logging_name or DEFAULT_POOL
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_WAIT_SECONDS.observe(waited, self.name)
+            load_shedders[self.name].observe_wait(waited)
+
+
+def _create_engine(name: str, size: int, overflow: int, timeout: int) -> AsyncEngine:
+    create_shedder(name, size + overflow)
+    return create_async_engine(
+        DATABASE_URL,
+        echo=DEBUG_SQL,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        pool_size=size,
+        max_overflow=overflow,
+        pool_timeout=timeout,
+    )
+
+
+class AdmittedSession(Session):
+    """首次需要数据库连接时才经过过载保护（info["admission"]，由 get_db 设置）"""
+
+    def get_bind(self, *args, **kwargs):
+        admission = self.info.get("admission")
+        if admission is not None:
+            admission.acquire()
+        return super().get_bind(*args, **kwargs)
+
+
+engines: Dict[str, AsyncEngine] = {
+    name: _create_engine(name, *POOL_SETTINGS[name]) for name in POOLS
+}
+session_makers: Dict[str, async_sessionmaker] = {
+    name: async_sessionmaker(e, class_=AsyncSession, sync_session_class=AdmittedSession, expire_on_commit=False)
+    for name, e in engines.items()
+}
+
+# 默认连接池（迁移、初始化数据、脚本等沿用）
+engine = engines[DEFAULT_POOL]
+async_session_maker = session_makers[DEFAULT_POOL]
+
+
+def session_maker(pool: str) -> async_sessionmaker:
+    """获取命名连接池的会话工厂（供 WebSocket 处理等不经过 get_db 的代码使用）"""
+    return session_makers[pool]
+
+
+async def dispose_engines() -> None:
+    """关闭全部连接池（应用关闭时调用）"""
+    for e in engines.values():
+        await e.dispose()
+
+
+# 连接池状态（每次输出指标时采集）
+DB_POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "已借出的数据库连接数", ("pool",))
+DB_POOL_OVERFLOW = registry.gauge("db_pool_overflow", "超出 pool_size 的连接数（负数表示尚未建满）", ("pool",))
+DB_POOL_SIZE = registry.gauge("db_pool_size", "连接池大小", ("pool",))
+
+
+def _collect_pool():
+    for name, e in engines.items():
+        pool = e.pool
+        DB_POOL_CHECKED_OUT.set(pool.checkedout(), name)
+        DB_POOL_OVERFLOW.set(pool.overflow(), name)
+        DB_POOL_SIZE.set(pool.size(), name)
+
+
+registry.on_collect(_collect_pool)
+
+
+async def get_db(request: Request):
+    """
+    请求级数据库会话
+
+    使用接口声明的连接池（未声明时为 default）。会话首次需要连接时经过该连接池的过载保护
+    （app.load_shedding）：连接池饱和时按接口优先级直接返回 503，不进入连接池排队；
+    没有执行查询的请求（合并请求的跟随者、命中缓存的请求）不占用并发名额。
+    """
+    pool = request_pool(request)
+    admission = Admission(load_shedders[pool], request_priority(request))
+    try:
+        async with session_makers[pool](info={"admission": admission}) as session:
+            yield session
+    finally:
+        admission.release()
 
 
 # ==================== 已废弃 ====================
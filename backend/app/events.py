@@ -0,0 +1,134 @@
+"""
+REST → WebSocket 事件通道
+
+REST 接口产生的实时通知（会话摘要变更、消息已读）与用户目录失效通过 notifier 发出：
+    - WS_EVENT_SOCKET 为空：REST 与 WebSocket 在同一进程（开发模式），直接调用 ConnectionManager
+    - WS_EVENT_SOCKET 为 Unix socket 路径：WebSocket 由独立网关（gateway.py）承载，
+      REST worker 将事件按行 JSON 写入该 socket，由网关转发给在线用户
+
+通知是尽力而为的：网关不可用时记录警告并丢弃，不影响 REST 请求本身
+（客户端重连后通过 /api/sync 补齐）。
+"""
+from typing import Optional
+import asyncio
+import logging
+import os
+import orjson
+from .config import settings
+from .user_directory import user_directory
+from .websocket import manager, conversation_update_frame
+
+logger = logging.getLogger(__name__)
+
+
+class EventPublisher:
+    """事件通道客户端：每个 REST worker 保持一条到网关的 Unix socket 长连接"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def publish(self, event: dict) -> bool:
+        """
+        发送事件（断线时重连一次）
+
+        Returns:
+            是否已写入网关
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        data = orjson.dumps(event) + b"\n"
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None or self._writer.is_closing():
+                        _, self._writer = await asyncio.open_unix_connection(self.path)
+                    self._writer.write(data)
+                    await self._writer.drain()
+                    return True
+                except OSError as e:
+                    self._writer = None
+                    if attempt:
+                        logger.warning("推送事件到 WebSocket 网关失败（%s）: %s", self.path, e)
+        return False
+
+    async def close(self) -> None:
+        """关闭连接"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class Notifier:
+    """REST 侧实时通知入口（按部署模式选择直接调用或经事件通道转发）"""
+
+    def __init__(self, socket_path: str):
+        self.publisher = EventPublisher(socket_path) if socket_path else None
+
+    async def notify_conversation_update(self, conversation) -> None:
+        """推送会话摘要变更"""
+        if self.publisher is None:
+            await manager.notify_conversation_update(conversation)
+        else:
+            await self.publisher.publish({"op": "conversation_update", "frame": conversation_update_frame(conversation)})
+
+    async def notify_message_read(self, conversation_id: int, reader_id: str) -> None:
+        """通知会话另一方消息已读"""
+        if self.publisher is None:
+            await manager.notify_message_read(conversation_id, reader_id)
+        else:
+            await self.publisher.publish({"op": "message_read", "conversation_id": conversation_id, "reader_id": reader_id})
+
+    async def notify_user_changed(self, user_id: str) -> None:
+        """用户被修改/禁用/删除后通知网关清除用户目录条目（同进程时 invalidate 已清除）"""
+        if self.publisher is not None:
+            await self.publisher.publish({"op": "user_changed", "user_id": user_id})
+
+    async def close(self) -> None:
+        if self.publisher is not None:
+            await self.publisher.close()
+
+
+# 全局通知入口
+notifier = Notifier(settings.ws_event_socket)
+
+
+async def dispatch(event: dict) -> None:
+    """网关侧：执行一条事件"""
+    op = event.get("op")
+    if op == "conversation_update":
+        await manager.send_conversation_update(event["frame"])
+    elif op == "message_read":
+        await manager.notify_message_read(event["conversation_id"], event["reader_id"])
+    elif op == "user_changed":
+        user_directory.discard(event["user_id"])
+    else:
+        logger.warning("未知的事件类型: %s", op)
+
+
+async def _handle_publisher(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """网关侧：读取一个 REST worker 的事件流"""
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                await dispatch(orjson.loads(line))
+            except Exception as e:
+                logger.error("处理事件失败: %s", e)
+    finally:
+        writer.close()
+
+
+async def start_event_server(path: str) -> asyncio.AbstractServer:
+    """网关侧：在 Unix socket 上监听事件（启动前清理残留的 socket 文件）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(_handle_publisher, path=path)
+    logger.info("WebSocket 网关事件通道已监听: %s", path)
+    return server
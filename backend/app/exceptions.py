@@ -6,7 +6,7 @@ from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from pydantic import ValidationError
 import logging
 import traceback
-import os
+from .config import settings
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -105,10 +105,7 @@ async def general_exception_handler(request: Request, exc: Exception):
     logger.error(traceback.format_exc())
     
     # 开发环境返回详细错误，生产环境返回通用错误
-    debug_str = os.getenv("DEBUG")
-    if debug_str is None:
-        raise ValueError("DEBUG 环境变量未设置，请在 .env 文件中配置")
-    debug_mode = debug_str.lower() == "true"
+    debug_mode = settings.debug
     
     if debug_mode:
         return JSONResponse(
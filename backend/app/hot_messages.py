@@ -0,0 +1,214 @@
+"""
+活跃会话最近消息缓存
+
+打开会话时的第一页（page=1、order=desc）就是最近写入的若干条消息。每个会话在进程内保留一个
+最近 HOT_MESSAGES_PER_CONVERSATION 条已序列化消息的环形缓冲（不含 sender，返回时从用户目录填充），
+命中时跳过 count / 版本戳聚合 / 分页查询：
+    - 读：第一页查库后写入缓冲；之后同一会话的第一页请求只执行一次版本探测
+      （会话主键 + (conversation_id, id) 索引取最大消息ID，与两方已读标记一起作为版本），
+      版本一致即直接由缓冲返回
+    - 写：本进程发送消息后追加到已有缓冲（先确认缓冲是最新的，否则丢弃）
+    - 失效：标记已读、删除消息时丢弃本进程缓冲，并在 CACHE_INVALIDATION_DIR 中更新该会话所在分桶的
+      版本文件（hot_messages.{会话ID % 256}）；版本探测同时 stat 该文件，其它 worker 的单条已读、
+      删除等不改变最大消息ID和已读标记的操作也能立即发现（同桶其它会话的缓冲随之重建）
+按估算内存（HOT_MESSAGES_MEMORY_MB）做 LRU 淘汰，命中率见 /api/metrics 的 hot_messages_lookups_total。
+"""
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
+import time
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import queries
+from .config import settings
+from .invalidation import invalidation
+from .metrics import registry
+from .models import Message
+from .serializers import serialize_message
+
+# 每条缓存消息在序列化长度之外的估算开销（dict 与字段对象）
+_ENTRY_OVERHEAD = 400
+
+# 失效通道分桶数：每个会话一个版本文件会随会话数无限增长，按会话ID取模共用
+_CHANNEL_BUCKETS = 256
+
+
+def _channel(conversation_id: int) -> str:
+    return f"hot_messages.{conversation_id % _CHANNEL_BUCKETS}"
+
+
+def _size(message: dict) -> int:
+    return len(orjson.dumps(message)) + _ENTRY_OVERHEAD
+
+
+class _Buffer:
+    """单个会话的缓冲：最近的消息（旧 → 新）与生成时的版本和统计"""
+
+    __slots__ = ("messages", "version", "total_count", "read_count", "expires_at", "bytes")
+
+    def __init__(self, capacity: int, version: tuple, total_count: int, read_count: int, expires_at: float):
+        self.messages: deque = deque(maxlen=capacity)
+        self.version = version
+        self.total_count = total_count
+        self.read_count = read_count
+        self.expires_at = expires_at
+        self.bytes = 0
+
+
+class HotMessages:
+    """活跃会话最近消息缓存（单线程事件循环内使用，无需加锁）"""
+
+    def __init__(self, capacity: int, memory_bytes: int, ttl: int):
+        """
+        Args:
+            capacity: 每个会话保留的消息条数（0 表示关闭）
+            memory_bytes: 全部缓冲的估算内存上限
+            ttl: 缓冲最长有效秒数
+        """
+        self.capacity = capacity
+        self.memory_bytes = memory_bytes
+        self.ttl = ttl
+        self._buffers: "OrderedDict[int, _Buffer]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.memory_bytes > 0 and self.ttl > 0
+
+    def cacheable(self, order: str, page: int, page_size: int) -> bool:
+        """请求是否可能由缓冲返回（只缓存倒序第一页）"""
+        ok = self.enabled and order != 'asc' and page == 1 and 0 < page_size <= self.capacity
+        if self.enabled and not ok:
+            self.bypasses += 1
+        return ok
+
+    @staticmethod
+    async def probe(db: AsyncSession, conversation_id: int) -> Optional[tuple]:
+        """
+        查询会话当前版本（最大消息ID, 参与者1已读标记, 参与者2已读标记, 失效通道版本）
+
+        失效通道版本在查库之前读取：查库期间其它进程发布的失效会在下次探测时发现
+
+        Returns:
+            版本元组，会话不存在时返回 None
+        """
+        channel_version = invalidation.version(_channel(conversation_id))
+        result = await db.execute(queries.conversation_version(conversation_id))
+        row = result.one_or_none()
+        return None if row is None else (row[0], row[1], row[2], channel_version)
+
+    def get(self, conversation_id: int, version: tuple, page_size: int) -> Optional[Tuple[list, int, int]]:
+        """
+        版本一致时返回 (倒序消息列表, 总数, 已读数)，否则丢弃缓冲并返回 None
+        """
+        buffer = self._buffers.get(conversation_id)
+        if buffer is None or buffer.version != version or buffer.expires_at <= time.monotonic():
+            if buffer is not None:
+                self.discard(conversation_id)
+            self.misses += 1
+            return None
+        # 缓冲条数不足一页且不是会话全部消息时无法返回
+        if len(buffer.messages) < page_size and len(buffer.messages) < buffer.total_count:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._buffers.move_to_end(conversation_id)
+        messages = list(buffer.messages)[-page_size:]
+        messages.reverse()
+        return messages, buffer.total_count, buffer.read_count
+
+    def fill(self, conversation_id: int, version: tuple, total_count: int, read_count: int, messages) -> None:
+        """用查库得到的倒序第一页消息建立缓冲"""
+        if not self.enabled:
+            return
+        self.discard(conversation_id)
+        buffer = _Buffer(self.capacity, version, total_count, read_count, time.monotonic() + self.ttl)
+        for message in reversed(messages[:self.capacity]):
+            data = serialize_message(message, None)
+            buffer.messages.append(data)
+            buffer.bytes += _size(data)
+        self._buffers[conversation_id] = buffer
+        self.bytes += buffer.bytes
+        self._evict()
+
+    async def append(self, db: AsyncSession, message: Message) -> None:
+        """
+        本进程写入新消息后追加到已有缓冲
+
+        只在缓冲包含该消息之前的最新一条时追加（其它 worker 可能在此期间写入过消息），否则丢弃缓冲
+        """
+        buffer = self._buffers.get(message.conversation_id)
+        if buffer is None:
+            return
+        result = await db.execute(queries.previous_message_id(message.conversation_id, message.id))
+        previous_id = result.scalar()
+        if buffer.version[0] != previous_id or buffer.expires_at <= time.monotonic():
+            self.discard(message.conversation_id)
+            return
+
+        data = serialize_message(message, None)
+        delta = _size(data)
+        if len(buffer.messages) == buffer.messages.maxlen:
+            delta -= _size(buffer.messages[0])
+        buffer.messages.append(data)
+        buffer.bytes += delta
+        self.bytes += delta
+        buffer.version = (message.id,) + buffer.version[1:]
+        buffer.total_count += 1
+        self._evict()
+
+    def invalidate(self, conversation_id: int) -> None:
+        """会话消息的已读状态或内容发生变化后调用（提交之后），并通知其它 worker"""
+        self.discard(conversation_id)
+        invalidation.bump(_channel(conversation_id))
+
+    def discard(self, conversation_id: int) -> None:
+        """只丢弃本进程缓冲"""
+        buffer = self._buffers.pop(conversation_id, None)
+        if buffer is not None:
+            self.bytes -= buffer.bytes
+
+    def clear(self) -> None:
+        self._buffers.clear()
+        self.bytes = 0
+
+    def _evict(self) -> None:
+        while self.bytes > self.memory_bytes and self._buffers:
+            _, buffer = self._buffers.popitem(last=False)
+            self.bytes -= buffer.bytes
+
+    def stats(self) -> dict:
+        """缓存指标快照"""
+        return {
+            "conversations": len(self._buffers),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+        }
+
+
+# 全局最近消息缓存
+hot_messages = HotMessages(
+    settings.hot_messages_per_conversation,
+    settings.hot_messages_memory_mb * 1024 * 1024,
+    settings.hot_messages_ttl,
+)
+
+HOT_MESSAGES_CONVERSATIONS = registry.gauge("hot_messages_conversations", "最近消息缓存的会话数")
+HOT_MESSAGES_BYTES = registry.gauge("hot_messages_bytes", "最近消息缓存的估算内存")
+HOT_MESSAGES_LOOKUPS = registry.counter("hot_messages_lookups_total", "会话消息第一页的缓存查询次数", ("result",))
+
+
+def _collect_hot_messages():
+    stats = hot_messages.stats()
+    HOT_MESSAGES_CONVERSATIONS.set(stats["conversations"])
+    HOT_MESSAGES_BYTES.set(stats["bytes"])
+    HOT_MESSAGES_LOOKUPS.set(stats["hits"], "hit")
+    HOT_MESSAGES_LOOKUPS.set(stats["misses"], "miss")
+    HOT_MESSAGES_LOOKUPS.set(stats["bypasses"], "bypass")
+
+
+registry.on_collect(_collect_hot_messages)
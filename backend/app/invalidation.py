@@ -0,0 +1,54 @@
+"""
+跨 worker 缓存失效通道
+
+进程内缓存在本进程写入后可以立即失效，其它 gunicorn worker 则需要得知"数据已变化"。
+CACHE_INVALIDATION_DIR 非空时，每类缓存对应目录下的一个版本文件 {名称}.version：
+    - 写入方 bump(名称)：写临时文件后原子替换（inode 与修改时间都会变化）
+    - 读取方 version(名称)：一次 stat()，与缓存建立时记录的版本比较，不一致则丢弃缓存
+目录应位于 tmpfs（如 /run/live_chat/invalidation），stat 不产生磁盘 IO。
+CACHE_INVALIDATION_DIR 为空（开发模式单进程）时 version 恒为 None，只依赖本进程失效。
+"""
+from typing import Optional, Tuple
+import os
+import tempfile
+import time
+from .config import settings
+
+
+class InvalidationChannel:
+    """基于共享目录版本文件的失效通知"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.version")
+
+    def version(self, name: str) -> Optional[Tuple[int, int]]:
+        """
+        读取当前版本
+
+        Returns:
+            (inode, 修改时间 ns)；未配置目录或尚未写入过时返回 None
+        """
+        if not self.directory:
+            return None
+        try:
+            stat = os.stat(self._path(name))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def bump(self, name: str) -> None:
+        """通知所有进程 name 对应的缓存已失效（本进程应另行清除自身缓存）"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{name}.")
+        with os.fdopen(fd, "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, self._path(name))
+
+
+# 全局失效通道
+invalidation = InvalidationChannel(settings.cache_invalidation_dir)
@@ -0,0 +1,240 @@
+"""
+数据库过载保护（按优先级快速失败）
+
+连接池耗尽时，请求会在池中等待 DB_POOL_TIMEOUT 秒后才失败，排队期间每个请求都占着内存和连接。
+通过 get_db 访问数据库的请求在会话首次需要连接时（而不是依赖注入时）经过所用连接池
+（app.database 命名连接池）各自的自适应并发限制；没有访问数据库的请求（如 @coalesced 合并后
+只等待首个请求结果的请求、命中进程内缓存的请求）不占用并发名额：
+    - 连接池每次取连接时上报等待时间（InstrumentedPool），按指数滑动平均跟踪
+    - 平均等待超过 DB_SHED_WAIT_TARGET_MS 时并发上限按比例下调（每 100ms 最多一次，
+      不低于 pool_size + max_overflow）；未超过且上限被用满时逐步上调，最高 DB_SHED_MAX_CONCURRENCY
+    - 按接口优先级放行（@db_priority 标记，未标记为 normal，同时可声明使用的连接池）：
+          high    发送消息、标记已读：始终放行
+          normal  并发数低于上限时放行
+          low     管理后台全量列表：并发数低于上限的一半且平均等待未超标时放行
+      未放行的请求立即返回 503 和 Retry-After，不进入连接池排队
+"""
+from typing import Dict, Optional
+import time
+from fastapi import HTTPException, Request
+from .config import settings
+from .metrics import registry
+
+HIGH = "high"
+NORMAL = "normal"
+LOW = "low"
+PRIORITIES = (HIGH, NORMAL, LOW)
+
+# 命名连接池（app.database 按名称创建引擎）
+DEFAULT_POOL = "default"
+POOLS = (DEFAULT_POOL, "realtime", "admin")
+
+# 低优先级请求可使用的并发上限比例
+LOW_PRIORITY_SHARE = 0.5
+# 等待时间滑动平均系数
+EWMA_ALPHA = 0.2
+# 超过该秒数没有取连接时认为连接池空闲（滑动平均不再有效）
+STALE_AFTER = 1.0
+# 超标时下调上限的比例与最小间隔
+DECREASE_FACTOR = 0.9
+DECREASE_INTERVAL = 0.1
+# 被拒绝时建议的重试秒数
+RETRY_AFTER = {NORMAL: 1, LOW: 5}
+
+
+def db_priority(priority: str, pool: str = DEFAULT_POOL, scoped_by: Optional[str] = None):
+    """
+    标记接口的数据库访问优先级与使用的连接池
+
+    Args:
+        priority: high / normal / low
+        pool: 命名连接池（POOLS 之一）
+        scoped_by: 请求带有该查询参数时按 normal 优先级、default 连接池处理
+                   （如会话列表带 user_id 时是用户自己的列表，不带时是管理后台的全量列表）
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"未知的优先级: {priority}")
+    if pool not in POOLS:
+        raise ValueError(f"未知的连接池: {pool}")
+
+    def decorator(fn):
+        fn.db_priority = priority
+        fn.db_pool = pool
+        fn.db_scoped_by = scoped_by
+        return fn
+
+    return decorator
+
+
+def _scoped(request: Request, endpoint) -> bool:
+    scoped_by = getattr(endpoint, "db_scoped_by", None)
+    return bool(scoped_by and request.query_params.get(scoped_by))
+
+
+def request_priority(request: Request) -> str:
+    """根据匹配到的接口确定请求优先级"""
+    endpoint = request.scope.get("endpoint")
+    if _scoped(request, endpoint):
+        return NORMAL
+    return getattr(endpoint, "db_priority", NORMAL)
+
+
+def request_pool(request: Request) -> str:
+    """根据匹配到的接口确定使用的连接池"""
+    endpoint = request.scope.get("endpoint")
+    if _scoped(request, endpoint):
+        return DEFAULT_POOL
+    return getattr(endpoint, "db_pool", DEFAULT_POOL)
+
+
+class LoadShedder:
+    """自适应并发限制（单线程事件循环内使用，无需加锁）"""
+
+    def __init__(self, wait_target: float, min_limit: int, max_limit: int):
+        """
+        Args:
+            wait_target: 取连接平均等待时间目标（秒），<= 0 表示关闭
+            min_limit: 并发上限的下限
+            max_limit: 并发上限的上限（初始值）
+        """
+        self.wait_target = wait_target
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.wait_ewma = 0.0
+        self._observed_at = 0.0
+        self._decreased_at = 0.0
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.wait_target > 0
+
+    def current_wait(self, now: float) -> float:
+        """当前的平均取连接等待时间（连接池空闲时为 0）"""
+        if now - self._observed_at > STALE_AFTER:
+            return 0.0
+        return self.wait_ewma
+
+    def observe_wait(self, seconds: float) -> None:
+        """连接池每次取连接后调用"""
+        now = time.monotonic()
+        self.wait_ewma = self.current_wait(now) * (1 - EWMA_ALPHA) + seconds * EWMA_ALPHA
+        self._observed_at = now
+        if not self.enabled:
+            return
+        if self.wait_ewma > self.wait_target:
+            if now - self._decreased_at >= DECREASE_INTERVAL:
+                self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+                self._decreased_at = now
+        elif self.in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def acquire(self, priority: str) -> Optional[int]:
+        """
+        申请执行数据库请求
+
+        Returns:
+            None 表示已放行（结束后必须调用 release）；否则为建议的 Retry-After 秒数
+        """
+        if self.enabled and priority != HIGH:
+            if priority == LOW:
+                admitted = (
+                    self.in_flight < self.limit * LOW_PRIORITY_SHARE
+                    and self.current_wait(time.monotonic()) <= self.wait_target
+                )
+            else:
+                admitted = self.in_flight < self.limit
+            if not admitted:
+                self.shed[priority] += 1
+                return RETRY_AFTER[priority]
+        self.admitted[priority] += 1
+        self.in_flight += 1
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """过载保护指标快照"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "wait_ewma": self.current_wait(time.monotonic()),
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+
+class Admission:
+    """一个请求的数据库准入（首次需要连接时申请，请求结束时释放）"""
+
+    def __init__(self, shedder: LoadShedder, priority: str):
+        self.shedder = shedder
+        self.priority = priority
+        self.admitted = False
+
+    def acquire(self) -> None:
+        """
+        申请执行（已放行时直接返回）
+
+        Raises:
+            HTTPException: 503，未放行（不进入连接池排队）
+        """
+        if self.admitted:
+            return
+        retry_after = self.shedder.acquire(self.priority)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=503,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": str(retry_after)},
+            )
+        self.admitted = True
+
+    def release(self) -> None:
+        if self.admitted:
+            self.shedder.release()
+            self.admitted = False
+
+
+# 每个命名连接池的过载保护（由 app.database 创建连接池时注册）
+load_shedders: Dict[str, LoadShedder] = {}
+
+
+def create_shedder(pool: str, connections: int) -> LoadShedder:
+    """
+    为连接池创建过载保护
+
+    Args:
+        pool: 连接池名称
+        connections: 连接池最大连接数（pool_size + max_overflow），作为并发上限的下限
+    """
+    shedder = load_shedders[pool] = LoadShedder(
+        settings.db_shed_wait_target_ms / 1000,
+        connections,
+        settings.db_shed_max_concurrency,
+    )
+    return shedder
+
+
+DB_ADMISSION_LIMIT = registry.gauge("db_admission_limit", "数据库请求的自适应并发上限", ("pool",))
+DB_ADMISSION_IN_FLIGHT = registry.gauge("db_admission_in_flight", "正在执行的数据库请求数", ("pool",))
+DB_POOL_WAIT_EWMA = registry.gauge("db_pool_wait_ewma_seconds", "取连接等待时间的滑动平均", ("pool",))
+DB_REQUESTS = registry.counter("db_requests_total", "数据库请求准入结果", ("pool", "priority", "result"))
+
+
+def _collect_load_shedder():
+    for pool, shedder in load_shedders.items():
+        stats = shedder.stats()
+        DB_ADMISSION_LIMIT.set(stats["limit"], pool)
+        DB_ADMISSION_IN_FLIGHT.set(stats["in_flight"], pool)
+        DB_POOL_WAIT_EWMA.set(stats["wait_ewma"], pool)
+        for priority in PRIORITIES:
+            DB_REQUESTS.set(stats["admitted"][priority], pool, priority, "admitted")
+            DB_REQUESTS.set(stats["shed"][priority], pool, priority, "shed")
+
+
+registry.on_collect(_collect_load_shedder)
@@ -0,0 +1,135 @@
+"""
+事件循环延迟监控
+
+阻塞事件循环的代码（同步文件读写、大对象 JSON 编码、CPU 密集计算）会推迟同一 worker 上
+所有请求和 WebSocket 推送，但不会出现在任何单个请求的耗时里。
+
+    - 采样协程：每 LOOP_LAG_INTERVAL_MS 休眠一次，实际唤醒时间与预期之差即调度延迟，
+      记入 event_loop_lag_seconds 直方图
+    - 看门狗线程：采样协程超过 LOOP_STALL_THRESHOLD_MS 未按时唤醒时，抓取事件循环线程
+      当前的调用栈（即正在阻塞的代码），恢复后记录阻塞总时长并输出警告日志
+
+最近的阻塞记录通过 GET /api/debug/loop（管理员）和网关 /api/ws-health 查看。
+持有 GIL 的 C 扩展调用期间看门狗无法运行，此时抓到的是调用返回后的位置。
+"""
+from collections import deque
+from typing import Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_STALLS = registry.counter("event_loop_stalls_total", "事件循环阻塞超过阈值的次数")
+
+
+class LoopMonitor:
+    """事件循环延迟采样 + 阻塞调用栈抓取"""
+
+    def __init__(self, interval: float, threshold: float, keep: int = 20, samples: int = 1000):
+        """
+        Args:
+            interval: 采样间隔（秒，<= 0 表示关闭）
+            threshold: 阻塞告警阈值（秒）
+            keep: 保留的阻塞记录条数
+            samples: 保留的延迟样本数（用于 /api/debug/loop 的近期统计）
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=keep)
+        self._lags: deque = deque(maxlen=samples)
+        self._beat = 0.0
+        self._stall: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self) -> None:
+        """在 lifespan 启动阶段调用（需在事件循环线程中）"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+
+    async def _sample(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - started - self.interval, 0.0)
+            self._beat = now
+            LOOP_LAG_SECONDS.observe(lag)
+            self._lags.append(lag)
+
+            with self._lock:
+                stall, self._stall = self._stall, None
+            if stall is not None:
+                stall["duration_ms"] = round(lag * 1000, 1)
+                LOOP_STALLS.inc()
+                logger.warning("事件循环阻塞 %.0fms，阻塞期间的调用栈：\n%s", lag * 1000, stall["stack"])
+
+    def _watch(self) -> None:
+        """看门狗线程：发现采样协程迟迟未唤醒时抓取事件循环线程的调用栈"""
+        check_every = max(min(self.interval, self.threshold / 2), 0.005)
+        while not self._stop.wait(check_every):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stall = {
+                "at": int(time.time()),
+                "duration_ms": None,  # 恢复后由采样协程填写
+                "stack": "".join(traceback.format_stack(frame)),
+            }
+            with self._lock:
+                self._stall = stall
+                self.stalls.append(stall)
+
+    def stats(self) -> dict:
+        """近期延迟统计与阻塞记录"""
+        lags = sorted(self._lags)
+        summary = {"samples": len(lags)}
+        if lags:
+            summary.update({
+                "p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+                "p99_ms": round(lags[min(int(len(lags) * 0.99), len(lags) - 1)] * 1000, 2),
+                "max_ms": round(lags[-1] * 1000, 2),
+            })
+        with self._lock:
+            stalls = list(self.stalls)
+        return {
+            "enabled": self.enabled,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag": summary,
+            "stalls": stalls,
+        }
+
+
+# 全局事件循环监控
+loop_monitor = LoopMonitor(settings.loop_lag_interval_ms / 1000, settings.loop_stall_threshold_ms / 1000)
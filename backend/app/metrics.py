@@ -0,0 +1,376 @@
+"""
+运行指标（Prometheus 文本格式）
+
+各模块在进程内登记 Counter / Gauge / Histogram，GET /api/metrics 输出 Prometheus 文本格式。
+
+多进程汇总（gunicorn 多 worker + 独立 WebSocket 网关）：
+    - METRICS_DIR 非空时，每个进程每 METRICS_FLUSH_INTERVAL 秒将自身指标快照写入
+      {METRICS_DIR}/{主机名}-{pid}.json（先写临时文件再原子替换）
+    - /api/metrics 读取目录下全部快照：Counter / Histogram 求和；
+      Gauge 按 worker 标签分别输出，且只输出最近仍在刷新的进程
+    - gunicorn 回收 worker 后由 child_exit 钩子调用 archive_worker，
+      把已退出进程的 Counter / Histogram 并入 archive.json，避免快照文件无限增加
+METRICS_DIR 为空时只输出当前进程的指标。
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import glob
+import logging
+import math
+import os
+import socket
+import time
+import orjson
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 已退出进程的累计指标
+ARCHIVE_FILE = "archive.json"
+
+
+class _Metric:
+    """指标基类：按标签值元组保存数值"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def export(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "values": [[list(key), value] for key, value in self._values.items()],
+        }
+
+
+class Counter(_Metric):
+    """只增计数"""
+
+    type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        """同步进程内已有的累计值（供 on_collect 回调使用）"""
+        self._values[labelvalues] = float(value)
+
+
+class Gauge(_Metric):
+    """瞬时值（多进程汇总时按 worker 分别输出）"""
+
+    type = "gauge"
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = float(value)
+
+
+class Histogram(_Metric):
+    """分桶直方图（保存各桶非累计计数 + 总和，最后一个桶为 +Inf）"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        state = self._values.get(labelvalues)
+        if state is None:
+            state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        """统计代码块耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def export(self) -> dict:
+        data = super().export()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """进程内指标登记表"""
+
+    def __init__(self, directory: str, flush_interval: float):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"指标 {metric.name} 重复登记")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, collector: Callable[[], None]) -> None:
+        """登记采集回调：快照前调用，用于把连接池、队列等当前状态写入 Gauge"""
+        self._collectors.append(collector)
+
+    @property
+    def worker(self) -> str:
+        """当前进程标识（按调用时的 pid，fork 后自动变化）"""
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    def snapshot(self) -> dict:
+        """当前进程的指标快照"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("指标采集失败: %s", e)
+        return {name: metric.export() for name, metric in self.metrics.items()}
+
+    def flush(self) -> None:
+        """将当前进程快照写入 METRICS_DIR（未配置时不处理）"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.worker}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+
+    async def flush_forever(self) -> None:
+        """后台定期刷新快照（在 lifespan 中启动，关闭时取消并再刷新一次）"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("写入指标快照失败: %s", e)
+
+    def render(self) -> str:
+        """汇总全部进程的指标，输出 Prometheus 文本格式"""
+        merged: Dict[str, dict] = {}
+        _merge(merged, self.snapshot(), self.worker, include_gauges=True)
+        if self.directory:
+            own = os.path.join(self.directory, f"{self.worker}.json")
+            fresh_after = time.time() - self.flush_interval * 3
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                if path == own:
+                    continue
+                snapshot = _load(path)
+                if snapshot is None:
+                    continue
+                worker = os.path.basename(path)[:-len(".json")]
+                try:
+                    fresh = os.path.getmtime(path) >= fresh_after
+                except OSError:
+                    fresh = False
+                # 超过 3 个刷新周期未更新的进程视为已退出，不再输出其瞬时值
+                _merge(merged, snapshot, worker, include_gauges=fresh and worker != "archive")
+        return _render(merged)
+
+
+def _load(path: str) -> Optional[dict]:
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged: Dict[str, dict], snapshot: dict, worker: str, include_gauges: bool) -> None:
+    """把一个进程的快照并入汇总结果（Counter / Histogram 求和，Gauge 加 worker 标签）"""
+    for name, data in snapshot.items():
+        kind = data["type"]
+        if kind == "gauge" and not include_gauges:
+            continue
+        target = merged.get(name)
+        if target is None:
+            labels = data["labels"] + (["worker"] if kind == "gauge" else [])
+            target = merged[name] = {
+                "type": kind,
+                "help": data["help"],
+                "labels": labels,
+                "buckets": data.get("buckets"),
+                "values": {},
+            }
+        values = target["values"]
+        for labelvalues, value in data["values"]:
+            key = tuple(labelvalues)
+            if kind == "gauge":
+                values[key + (worker,)] = value
+            elif kind == "histogram":
+                current = values.get(key)
+                if current is None:
+                    values[key] = [list(value[0]), value[1]]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+            else:
+                values[key] = values.get(key, 0.0) + value
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _render(merged: Dict[str, dict]) -> str:
+    lines = []
+    for name in sorted(merged):
+        data = merged[name]
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        labels = data["labels"]
+        for key in sorted(data["values"]):
+            value = data["values"][key]
+            if data["type"] == "histogram":
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(data["buckets"]) + [math.inf], counts):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{name}_bucket{_format_labels(labels, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels, key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels, key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labels, key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def archive_worker(pid: int) -> None:
+    """
+    gunicorn child_exit 钩子调用：把已退出 worker 的 Counter / Histogram 并入 archive.json 并删除其快照
+
+    在 master 进程中顺序执行，无需加锁。
+    """
+    if not settings.metrics_dir:
+        return
+    path = os.path.join(settings.metrics_dir, f"{socket.gethostname()}-{pid}.json")
+    snapshot = _load(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(settings.metrics_dir, ARCHIVE_FILE)
+    merged: Dict[str, dict] = {}
+    archived = _load(archive_path)
+    if archived is not None:
+        _merge(merged, archived, "archive", include_gauges=False)
+    _merge(merged, snapshot, "archive", include_gauges=False)
+    data = {
+        name: {
+            "type": metric["type"],
+            "help": metric["help"],
+            "labels": metric["labels"],
+            "buckets": metric["buckets"],
+            "values": [[list(key), value] for key, value in metric["values"].items()],
+        }
+        for name, metric in merged.items()
+    }
+    tmp_path = f"{archive_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data))
+    os.replace(tmp_path, archive_path)
+    os.unlink(path)
+
+
+# 全局指标登记表
+registry = MetricsRegistry(settings.metrics_dir, settings.metrics_flush_interval)
+
+
+# ==================== 指标定义 ====================
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（按路由模板）", ("method", "route", "status"),
+)
+WS_FRAMES_RECEIVED = registry.counter(
+    "ws_frames_received_total", "收到的 WebSocket 帧数", ("type",),
+)
+WS_FRAMES_SENT = registry.counter(
+    "ws_frames_sent_total", "发送的 WebSocket 帧数", ("type",),
+)
+WS_FANOUT_SECONDS = registry.histogram(
+    "ws_fanout_duration_seconds", "一次推送发送给全部接收者的耗时", ("type",),
+)
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_checkout_wait_seconds", "从连接池取得数据库连接的等待时间（含新建连接）", ("pool",),
+)
+UPLOAD_BYTES = registry.counter(
+    "upload_bytes_total", "上传文件字节数（rate() 即每秒上传字节数）", ("kind",),
+)
+
+
+class MetricsMiddleware:
+    """
+    HTTP 请求耗时统计（纯 ASGI 中间件，不包装请求体）
+
+    route 标签使用路由模板（如 /api/conversations/{conversation_id}），未匹配的请求记为 unmatched，
+    避免按实际路径产生无限多的标签值。WebSocket 连接不在此统计。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[object, str]] = None
+
+    def _route(self, scope) -> str:
+        if self._route_paths is None:
+            paths = {}
+            for route in scope["app"].routes:
+                endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                if endpoint is not None:
+                    paths[endpoint] = route.path
+            self._route_paths = paths
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, scope["method"], self._route(scope), str(status_code)
+            )
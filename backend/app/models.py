@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship, declarative_base
 import time
 import enum
@@ -70,7 +70,11 @@ class Conversation(Base):
     
     last_message = Column(Text, comment="最后一条消息内容")  # 最后一条消息内容
     last_message_time = Column(Integer, comment="最后消息时间戳")  # 最后消息时间戳
+    # 已读标记：参与者已读到的最大消息ID（用于增量同步下发已读位置）
+    participant1_last_read_id = Column(Integer, default=0, nullable=False, server_default="0", comment="参与者1已读到的最大消息ID")
+    participant2_last_read_id = Column(Integer, default=0, nullable=False, server_default="0", comment="参与者2已读到的最大消息ID")
     created_at = Column(Integer, default=get_timestamp, comment="创建时间戳")  # 创建时间戳
+    # 任何变更（新消息、已读）都会刷新 updated_at，增量同步按 (updated_at, id) 游标扫描
     updated_at = Column(Integer, default=get_timestamp, onupdate=get_timestamp, comment="更新时间戳")  # 更新时间戳
 
     # 关联
@@ -78,6 +82,12 @@ class Conversation(Base):
     participant2 = relationship("User", back_populates="conversations_as_p2", foreign_keys=[participant2_id])
     messages = relationship("Message", back_populates="conversation", order_by="Message.created_at")
 
+    __table_args__ = (
+        # 用户收件箱按更新时间排序 / 增量同步游标
+        Index("ix_conversations_p1_updated", "participant1_id", "updated_at", "id"),
+        Index("ix_conversations_p2_updated", "participant2_id", "updated_at", "id"),
+    )
+
 
 class Message(Base):
     """消息表"""
@@ -95,6 +105,11 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
     sender = relationship("User", back_populates="sent_messages", foreign_keys=[sender_id])
 
+    __table_args__ = (
+        # 会话内按消息ID分页 / 增量同步
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+    )
+
 
 class QuickReply(Base):
     """快捷消息表"""
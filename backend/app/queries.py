@@ -0,0 +1,107 @@
+"""
+热点查询（SQLAlchemy lambda 语句缓存）
+
+按主键取会话、会话消息分页、版本戳等查询在每个消息请求和 WebSocket 事件中都会执行。
+普通写法每次调用都要重新构造 select / where / order_by 对象，并遍历整棵语句树生成缓存键，
+才能命中引擎的编译缓存。这里统一用 lambda_stmt 构造：
+    - 语句结构按 lambda 的代码位置缓存，只在首次调用时构造一次；之后只提取闭包中的参数值
+    - 参数（会话ID、偏移量等）作为绑定参数传入，不同取值共用同一条编译后的 SQL
+
+约束（lambda_stmt 的要求）：
+    - lambda 中只能通过闭包引用参数值，不能包含依赖参数的 Python 分支；结构不同的语句
+      （如正序/倒序）使用不同的 lambda
+    - 闭包参数必须是普通值（int / str），不能是 ORM 对象或列表
+
+调用方式：result = await db.execute(queries.conversation_by_id(conversation_id))
+"""
+from sqlalchemy import case, func, lambda_stmt, select
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from .models import Conversation, Message, QuickReply, User
+
+
+# ==================== 会话 ====================
+
+def conversation_by_id(conversation_id: int) -> StatementLambdaElement:
+    """按ID查询会话（scalar_one_or_none）"""
+    return lambda_stmt(lambda: select(Conversation).where(Conversation.id == conversation_id))
+
+
+def conversation_version(conversation_id: int) -> StatementLambdaElement:
+    """会话版本：(最大消息ID, 参与者1已读标记, 参与者2已读标记)，会话不存在时无结果行"""
+    return lambda_stmt(
+        lambda: select(
+            select(func.max(Message.id))
+            .where(Message.conversation_id == Conversation.id)
+            .scalar_subquery(),
+            Conversation.participant1_last_read_id,
+            Conversation.participant2_last_read_id,
+        ).where(Conversation.id == conversation_id)
+    )
+
+
+# ==================== 消息 ====================
+
+def message_by_id(message_id: int) -> StatementLambdaElement:
+    """按ID查询消息（scalar_one_or_none）"""
+    return lambda_stmt(lambda: select(Message).where(Message.id == message_id))
+
+
+def max_message_id(conversation_id: int) -> StatementLambdaElement:
+    """会话当前最大消息ID（scalar，无消息时为 None）"""
+    return lambda_stmt(
+        lambda: select(func.max(Message.id)).where(Message.conversation_id == conversation_id)
+    )
+
+
+def previous_message_id(conversation_id: int, message_id: int) -> StatementLambdaElement:
+    """会话中 message_id 之前的最新消息ID（scalar，没有时为 None）"""
+    return lambda_stmt(
+        lambda: select(func.max(Message.id))
+        .where(Message.conversation_id == conversation_id)
+        .where(Message.id < message_id)
+    )
+
+
+def message_stamp(conversation_id: int) -> StatementLambdaElement:
+    """会话消息版本戳：(总数, 最大消息ID, 已读数)"""
+    return lambda_stmt(
+        lambda: select(
+            func.count(),
+            func.max(Message.id),
+            func.sum(case((Message.is_read == True, 1), else_=0)),
+        ).where(Message.conversation_id == conversation_id)
+    )
+
+
+def conversation_messages_page(conversation_id: int, ascending: bool, offset: int, limit: int) -> StatementLambdaElement:
+    """
+    会话消息分页（同一秒内的消息按ID排序，与最近消息缓存的顺序一致）
+
+    Args:
+        ascending: True 按时间正序，False 倒序
+    """
+    stmt = lambda_stmt(lambda: select(Message).where(Message.conversation_id == conversation_id))
+    if ascending:
+        stmt += lambda s: s.order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        stmt += lambda s: s.order_by(Message.created_at.desc(), Message.id.desc())
+    stmt += lambda s: s.offset(offset).limit(limit)
+    return stmt
+
+
+# ==================== 用户 ====================
+
+def user_by_id(user_id: str) -> StatementLambdaElement:
+    """按ID查询用户（scalar_one_or_none）"""
+    return lambda_stmt(lambda: select(User).where(User.id == user_id))
+
+
+# ==================== 快捷回复 ====================
+
+def active_quick_replies(user_id: str) -> StatementLambdaElement:
+    """用户启用中的快捷回复（按 sort_order 排序）"""
+    return lambda_stmt(
+        lambda: select(QuickReply)
+        .where(QuickReply.user_id == user_id, QuickReply.is_active == True)
+        .order_by(QuickReply.sort_order)
+    )
@@ -0,0 +1,122 @@
+"""
+SQL 查询计数与 N+1 检测
+
+通过 SQLAlchemy 引擎事件统计每个请求执行的 SQL 条数和累计耗时：
+    - QueryCounterMiddleware：DEBUG=True 时在响应头返回 X-DB-Queries / X-DB-Time-Ms；
+      条数或耗时超过 SQL_WARN_QUERIES / SQL_WARN_MS，或同一语句重复执行
+      SQL_N_PLUS_ONE_THRESHOLD 次以上（疑似 N+1）时记录警告日志
+    - count_queries：在脚本中统计一段代码的 SQL（接口预算检查见 benchmarks/query_budget.py）
+
+统计对象保存在 ContextVar 中，SQLAlchemy 异步引擎在同一上下文中执行同步代码，
+并发请求之间互不影响。
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+import logging
+import time
+from sqlalchemy import event
+from .config import settings
+from .database import engines
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """一段代码执行的 SQL 统计（嵌套统计时同时累加到外层）"""
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        # 语句文本 -> 执行次数
+        self.statements: Counter = Counter()
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+        if self.parent is not None:
+            self.parent.add(statement, seconds)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """执行次数达到 threshold 的语句（参数不同、文本相同，通常是循环内逐条查询）"""
+        if threshold <= 0:
+            return []
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.add(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+# 统计全部命名连接池的语句
+for _engine in engines.values():
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine.sync_engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def count_queries():
+    """统计代码块执行的 SQL（with count_queries() as stats: ...）"""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryCounterMiddleware:
+    """每个 HTTP 请求的 SQL 条数 / 耗时统计（纯 ASGI 中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start" and settings.debug:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(stats.count).encode()))
+                    headers.append((b"x-db-time-ms", f"{stats.seconds * 1000:.1f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+
+        elapsed_ms = stats.seconds * 1000
+        if stats.count > settings.sql_warn_queries or elapsed_ms > settings.sql_warn_ms:
+            logger.warning(
+                "请求 %s %s 执行了 %d 条 SQL，累计 %.1fms",
+                scope["method"], scope["path"], stats.count, elapsed_ms,
+            )
+        for statement, n in stats.repeated(settings.sql_n_plus_one_threshold):
+            logger.warning(
+                "疑似 N+1：请求 %s %s 中同一语句执行了 %d 次：%s",
+                scope["method"], scope["path"], n, " ".join(statement.split())[:200],
+            )
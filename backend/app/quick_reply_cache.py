@@ -0,0 +1,97 @@
+"""
+快捷回复缓存
+
+商家每次打开聊天都会请求快捷回复列表，而数据每月只变化几次（每个用户最多 MAX_QUICK_REPLIES 条）。
+按用户缓存启用中的快捷回复（已序列化列表 + ETag），有界 LRU：
+    - 命中时不访问数据库，If-None-Match 一致时直接返回 304
+    - quick_replies 路由创建/更新/删除后调用 invalidate：清除本进程条目，
+      并通过 app.invalidation 通知其它 worker（任一用户变化时其它进程清空整个缓存，写入很少）
+"""
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from .config import settings
+from .invalidation import invalidation
+from .metrics import registry
+
+# 失效通道中的名称
+CHANNEL = "quick_replies"
+
+
+class QuickReplyCache:
+    """快捷回复缓存（单线程事件循环内使用，无需加锁）"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # user_id -> (序列化列表, ETag)
+        self._entries: "OrderedDict[str, Tuple[List[dict], str]]" = OrderedDict()
+        # 条目所对应的失效通道版本，以及本进程失效次数（查库期间发生失效时丢弃结果）
+        self._version = invalidation.version(CHANNEL)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def sync(self):
+        """
+        检查其它进程是否发布过失效（一次 stat），有则清空缓存
+
+        Returns:
+            当前版本，查库后作为 put 的参数
+        """
+        version = invalidation.version(CHANNEL)
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        return version, self._generation
+
+    def get(self, user_id: str) -> Optional[Tuple[List[dict], str]]:
+        """返回 (序列化列表, ETag)，未命中返回 None（调用前先 sync）"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def put(self, user_id: str, quick_replies: List[dict], etag: str, version) -> None:
+        """写入查库结果；查库期间版本已变化（结果可能已过期）时不写入"""
+        if not self.enabled or version != (self._version, self._generation):
+            return
+        self._entries[user_id] = (quick_replies, etag)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """用户的快捷回复被创建/修改/删除后调用（提交之后）"""
+        self._entries.pop(user_id, None)
+        self._generation += 1
+        invalidation.bump(CHANNEL)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存指标快照"""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# 全局快捷回复缓存
+quick_reply_cache = QuickReplyCache(settings.quick_reply_cache_size)
+
+QUICK_REPLY_CACHE_ENTRIES = registry.gauge("quick_reply_cache_entries", "快捷回复缓存条目数")
+QUICK_REPLY_CACHE_LOOKUPS = registry.counter("quick_reply_cache_lookups_total", "快捷回复缓存查询次数", ("result",))
+
+
+def _collect_quick_reply_cache():
+    stats = quick_reply_cache.stats()
+    QUICK_REPLY_CACHE_ENTRIES.set(stats["entries"])
+    QUICK_REPLY_CACHE_LOOKUPS.set(stats["hits"], "hit")
+    QUICK_REPLY_CACHE_LOOKUPS.set(stats["misses"], "miss")
+
+
+registry.on_collect(_collect_quick_reply_cache)
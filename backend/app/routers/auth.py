@@ -10,7 +10,14 @@ from typing import Optional
 from ..database import get_db
 from ..models import User, UserRole
 from ..schemas import LoginRequest, LoginResponse, UserResponse
-from ..auth import hash_password, verify_password, create_access_token, verify_token
+from ..auth import (
+    verify_password_async,
+    create_access_token,
+    verify_token,
+    principal_cache,
+    PasswordPoolBusy,
+)
+from ..user_directory import user_directory
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 security = HTTPBearer()
@@ -33,6 +40,7 @@ async def login(
         
     Raises:
         HTTPException: 401 - 用户名或密码错误
+        HTTPException: 503 - 密码校验排队已满
     """
     # 查询用户
     result = await db.execute(
@@ -59,7 +67,20 @@ async def login(
             detail="账号未设置密码"
         )
     
-    if not verify_password(login_data.password, user.password_hash):
+    # 结束只读事务，排队和计算 bcrypt 期间不占用数据库连接
+    await db.commit()
+    
+    # bcrypt 在独立线程池中计算，不阻塞事件循环
+    try:
+        password_ok = await verify_password_async(login_data.password, user.password_hash)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="登录请求过多，请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+    
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误"
@@ -123,37 +144,39 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # 验证 Token
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token 无效或已过期",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user_id = payload.get("user_id")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token 数据不完整",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # 查询用户
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    # 已验证过的 Token 直接命中缓存，跳过 JWT 解码
+    user_id = principal_cache.get(token)
+    if user_id is None:
+        # 验证 Token
+        payload = verify_token(token)
+        if not payload:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token 无效或已过期",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        user_id = payload.get("user_id")
+        if not user_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token 数据不完整",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal_cache.put(token, payload)
     
-    if not user:
+    # 用户字段从用户目录读取（命中时不查询数据库，未命中时按主键查询并写入目录）；
+    # 用户被修改、禁用或删除时由 users 路由跨进程失效（get_snapshot 先检查失效通道版本）
+    snapshot = await user_directory.get_snapshot(db, user_id)
+    if snapshot is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户不存在",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    # 与会话无关的 User 对象（不含密码哈希）
+    return User(**snapshot)
 
 
 @router.get("/me", response_model=UserResponse)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from pathlib import Path
+from typing import Optional
+from ..config import settings
+from ..database import get_db
+from ..models import User
+from ..avatar import AvatarCache, normalize_size, avatar_etag
+from ..utils.etag import etag_matches
+
+# 注意：此路由必须在 /api/media 静态目录挂载之前注册，否则会被 StaticFiles 拦截
+router = APIRouter(prefix="/api/media/avatars/generated", tags=["avatars"])
+
+# 生成头像的磁盘缓存目录：media/avatars/generated/
+avatar_cache = AvatarCache(
+    cache_dir=Path(settings.media_dir) / "avatars" / "generated",
+    max_entries=settings.avatar_cache_size,
+    max_workers=settings.avatar_render_workers,
+)
+
+# 头像内容只由用户ID和尺寸决定，可长期强缓存
+AVATAR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{user_id}.png")
+async def get_generated_avatar(
+    user_id: str,
+    request: Request,
+    size: Optional[int] = None,  # 头像尺寸（像素），向上取整到允许的尺寸
+    db: AsyncSession = Depends(get_db)
+):
+    """按用户ID生成头像（由用户ID哈希确定的文字与背景色）"""
+    size = normalize_size(size)
+    etag = avatar_etag(user_id, size)
+    headers = {"Cache-Control": AVATAR_CACHE_CONTROL, "ETag": etag}
+
+    # 客户端已缓存
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    # 缓存未命中时才校验用户存在，避免为任意ID渲染并写盘
+    if avatar_cache.get_cached(user_id, size) is None and not avatar_cache.has_on_disk(user_id, size):
+        result = await db.execute(select(User.id).where(User.id == user_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+    data = await avatar_cache.get(user_id, size)
+    return Response(content=data, media_type="image/png", headers=headers)
@@ -1,31 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_, and_, func, update
 from sqlalchemy.orm import selectinload
 from typing import List
+from .. import queries
+from ..coalesce import coalesced
 from ..database import get_db
+from ..load_shedding import db_priority, HIGH, LOW
 from ..models import Conversation, User, Message
-from ..schemas import ConversationCreate, ConversationResponse, ConversationDetail, MessageResponse, PaginatedResponse
+from ..schemas import ConversationCreate, ConversationResponse, ConversationDetail, PaginatedResponse, MessagePaginatedResponse
+from ..hot_messages import hot_messages
+from ..serializers import conversation_page, message_page, cached_message_page
+from ..user_directory import user_directory
+from ..utils.etag import make_etag, etag_matches, not_modified, etag_headers
 
 router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 
 
 @router.get("/", response_model=PaginatedResponse[ConversationResponse])
+@db_priority(LOW, pool="admin", scoped_by="user_id")
+@coalesced("conversations")
 async def get_conversations(
+    request: Request,
     user_id: str = None,      # 通用用户ID过滤（查询该用户参与的所有会话）
     page: int = 1,
     page_size: int = 20,
     db: AsyncSession = Depends(get_db)
 ):
-    """获取会话列表"""
+    """
+    获取会话列表
+
+    支持 If-None-Match：先用一条聚合查询计算版本戳（总数 + 最大更新时间 + 按会话加权的未读数合计），
+    加上用户资料版本（响应内嵌参与者资料），未变化时直接返回 304，不再执行分页查询和关联加载。
+    """
     # 构建基础查询
     base_query = select(Conversation).options(
         selectinload(Conversation.participant1),
         selectinload(Conversation.participant2)
     )
 
-    # 获取总数的基础查询
-    count_query = select(func.count()).select_from(Conversation)
+    # 版本戳查询（同时得到总数）
+    stamp_query = select(
+        func.count(),
+        func.max(Conversation.updated_at),
+        # 按会话ID加权：同一秒内一个会话未读数 +1、另一个 -1 时合计不会因此抵消
+        func.sum(Conversation.id * (Conversation.participant1_unread * 2 + Conversation.participant2_unread * 3)),
+    ).select_from(Conversation)
 
     # 应用过滤条件
     if user_id:
@@ -35,10 +56,18 @@ async def get_conversations(
             Conversation.participant2_id == user_id
         )
         base_query = base_query.where(filter_condition)
-        count_query = count_query.where(filter_condition)
+        stamp_query = stamp_query.where(filter_condition)
     
-    count_result = await db.execute(count_query)
-    total_count = count_result.scalar()
+    stamp_result = await db.execute(stamp_query)
+    total_count, max_updated_at, unread_sum = stamp_result.one()
+
+    # 数据未变化，返回 304
+    etag = make_etag(
+        "conversations", user_id, page, page_size, total_count, max_updated_at, unread_sum,
+        user_directory.profile_version(),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
     # 计算偏移量
     skip = (page - 1) * page_size
@@ -48,10 +77,11 @@ async def get_conversations(
     result = await db.execute(query)
     conversations = result.scalars().all()
     
-    return PaginatedResponse(count=total_count, results=conversations)
+    return ORJSONResponse(conversation_page(total_count, conversations), headers=etag_headers(etag))
 
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
+@coalesced("conversation")
 async def get_conversation(conversation_id: int, db: AsyncSession = Depends(get_db)):
     """获取单个会话"""
     result = await db.execute(
@@ -73,7 +103,12 @@ async def create_conversation(conversation: ConversationCreate, db: AsyncSession
     """创建会话"""
     # 检查是否已存在
     result = await db.execute(
-        select(Conversation).where(
+        select(Conversation)
+        .options(
+            selectinload(Conversation.participant1),
+            selectinload(Conversation.participant2)
+        )
+        .where(
             or_(
                 and_(
                     Conversation.participant1_id == conversation.participant1_id,
@@ -94,16 +129,20 @@ async def create_conversation(conversation: ConversationCreate, db: AsyncSession
     db_conversation = Conversation(**conversation.dict())
     db.add(db_conversation)
     await db.commit()
-    await db.refresh(db_conversation)
+    # 响应包含参与者信息，需在会话内加载（异步会话不支持序列化时懒加载）
+    await db.refresh(db_conversation, attribute_names=["participant1", "participant2"])
     return db_conversation
 
 
-@router.get("/{conversation_id}/messages", response_model=PaginatedResponse[MessageResponse])
+@router.get("/{conversation_id}/messages", response_model=MessagePaginatedResponse)
+@coalesced("conversation_messages")
 async def get_conversation_messages(
     conversation_id: int,
+    request: Request,
     order: str = 'desc',  # 排序方式：asc（正序，旧→新）或 desc（倒序，新→旧）
     page: int = 1,
     page_size: int = 50,
+    senders: bool = False,  # 为 True 时发送者以 senders 边表返回，消息不再内嵌 sender
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -114,43 +153,85 @@ async def get_conversation_messages(
         order: 排序方式，'asc'（正序，适合聊天界面）或 'desc'（倒序，适合管理界面）
         page: 页码（从1开始）
         page_size: 每页记录数
+        senders: 是否以边表返回发送者（同一发送者每页只出现一次）
     
     Returns:
-        PaginatedResponse[MessageResponse]: 包含消息列表和总数
+        MessagePaginatedResponse: 包含消息列表和总数
+
+    支持 If-None-Match：版本戳为消息数 + 最大消息ID + 已读消息数 + 用户资料版本（发送者资料），未变化时返回 304。
+    倒序第一页优先由最近消息缓存（app.hot_messages）返回，只执行一次版本探测。
     """
-    # 检查会话是否存在
-    conv_result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
+    # 版本探测（会话不存在时为 None），同时提供两方已读标记，未命中时不再单独查询会话
+    version = None
+    if hot_messages.cacheable(order, page, page_size):
+        version = await hot_messages.probe(db, conversation_id)
+        cached = hot_messages.get(conversation_id, version, page_size) if version is not None else None
+        if cached is not None:
+            messages, total_count, read_count = cached
+            etag = make_etag(
+                "messages", conversation_id, order, page, page_size, senders, total_count, version[0], read_count,
+                user_directory.profile_version(),
+            )
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            users = await user_directory.get_serialized_many(db, (m['sender_id'] for m in messages))
+            return ORJSONResponse(cached_message_page(total_count, messages, senders, users), headers=etag_headers(etag))
+
+    # 版本戳查询（同时得到消息总数）
+    stamp_result = await db.execute(queries.message_stamp(conversation_id))
+    total_count, max_message_id, read_count = stamp_result.one()
+
+    # 数据未变化，返回 304（客户端持有 ETag 说明会话此前已存在）
+    etag = make_etag(
+        "messages", conversation_id, order, page, page_size, senders, total_count, max_message_id, read_count,
+        user_directory.profile_version(),
     )
-    conversation = conv_result.scalar_one_or_none()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    # 获取消息总数
-    count_query = select(func.count()).select_from(Message).where(Message.conversation_id == conversation_id)
-    count_result = await db.execute(count_query)
-    total_count = count_result.scalar()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # 检查会话是否存在（版本探测已确认存在时跳过）
+    if version is None:
+        conv_result = await db.execute(queries.conversation_by_id(conversation_id))
+        conversation = conv_result.scalar_one_or_none()
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
     
     # 计算偏移量
     skip = (page - 1) * page_size
     
-    # 获取消息列表（支持排序）
-    query = select(Message).options(selectinload(Message.sender)).where(Message.conversation_id == conversation_id)
-    
-    # 根据 order 参数排序
-    if order == 'asc':
-        query = query.order_by(Message.created_at.asc())
-    else:
-        query = query.order_by(Message.created_at.desc())
-    
-    query = query.offset(skip).limit(page_size)
-    result = await db.execute(query)
+    # 获取消息列表（根据 order 参数排序）
+    result = await db.execute(
+        queries.conversation_messages_page(conversation_id, order == 'asc', skip, page_size)
+    )
     messages = result.scalars().all()
+
+    if version is not None:
+        hot_messages.fill(conversation_id, version, total_count, read_count, messages)
     
-    return PaginatedResponse(count=total_count, results=messages)
+    # 发送者从用户目录填充（未命中的一次查询补齐）
+    users = await user_directory.get_serialized_many(db, (m.sender_id for m in messages))
+    return ORJSONResponse(message_page(total_count, messages, senders=senders, users=users), headers=etag_headers(etag))
+
+
+async def advance_read_marker(db: AsyncSession, conversation: Conversation, reader_id: str):
+    """
+    将 reader_id 的已读标记推进到会话当前最大消息ID（不提交，由调用方 commit）
+
+    已读标记变化会刷新会话 updated_at，增量同步据此下发已读位置
+    """
+    result = await db.execute(queries.max_message_id(conversation.id))
+    max_message_id = result.scalar() or 0
+
+    if reader_id == conversation.participant1_id:
+        if max_message_id > (conversation.participant1_last_read_id or 0):
+            conversation.participant1_last_read_id = max_message_id
+    elif reader_id == conversation.participant2_id:
+        if max_message_id > (conversation.participant2_last_read_id or 0):
+            conversation.participant2_last_read_id = max_message_id
 
 
 @router.put("/{conversation_id}/messages/read-all")
+@db_priority(HIGH, pool="realtime")
 async def mark_conversation_messages_as_read(
     conversation_id: int, 
     reader_id: str = None,  # 添加参数：谁标记的已读
@@ -158,12 +239,10 @@ async def mark_conversation_messages_as_read(
 ):
     """标记会话中发送给当前用户的所有消息为已读"""
     from ..models import Message
-    from ..websocket import manager  # 导入 WebSocket 管理器
+    from ..events import notifier  # 实时通知（同进程或经事件通道转发到 WebSocket 网关）
     
     # 检查会话是否存在
-    conv_result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
+    conv_result = await db.execute(queries.conversation_by_id(conversation_id))
     conversation = conv_result.scalar_one_or_none()
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -177,10 +256,14 @@ async def mark_conversation_messages_as_read(
             .where(Message.sender_id != reader_id)  # 关键：排除自己发送的消息
             .values(is_read=True)
         )
+        await advance_read_marker(db, conversation, reader_id)
         await db.commit()
+        hot_messages.invalidate(conversation_id)
         
         # 通过 WebSocket 实时通知对方消息已读
-        await manager.notify_message_read(conversation_id, reader_id)
+        await notifier.notify_message_read(conversation_id, reader_id)
+        # 推送会话摘要变更（已读标记与 updated_at 已推进）
+        await notifier.notify_conversation_update(conversation)
     else:
         # 如果没有提供 reader_id，则标记所有消息（保持向后兼容）
         await db.execute(
@@ -189,11 +272,13 @@ async def mark_conversation_messages_as_read(
             .values(is_read=True)
         )
         await db.commit()
+        hot_messages.invalidate(conversation_id)
     
     return {"status": "success"}
 
 
 @router.get("/{conversation_id}/detail", response_model=ConversationDetail)
+@db_priority(LOW, pool="admin")
 async def get_conversation_detail(conversation_id: int, db: AsyncSession = Depends(get_db)):
     """获取会话详情（包含消息统计）"""
     # 获取会话基本信息
@@ -235,15 +320,16 @@ async def get_conversation_detail(conversation_id: int, db: AsyncSession = Depen
 
 
 @router.put("/{conversation_id}/read")
+@db_priority(HIGH, pool="realtime")
 async def mark_conversation_as_read(
     conversation_id: int, 
     user_id: str, 
     db: AsyncSession = Depends(get_db)
 ):
     """标记会话为已读"""
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
+    from ..events import notifier  # 实时通知（同进程或经事件通道转发到 WebSocket 网关）
+
+    result = await db.execute(queries.conversation_by_id(conversation_id))
     conversation = result.scalar_one_or_none()
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -255,4 +341,7 @@ async def mark_conversation_as_read(
         conversation.participant2_unread = 0
     
     await db.commit()
+
+    # 推送会话摘要变更（未读数清零）
+    await notifier.notify_conversation_update(conversation)
     return {"status": "success"}
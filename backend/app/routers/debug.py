@@ -0,0 +1,25 @@
+"""
+运行诊断接口（仅管理员）
+
+各接口返回处理该请求的 worker 进程内的数据，多 worker 部署时多次请求可能来自不同进程（见 pid 字段）。
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from ..loop_monitor import loop_monitor
+from ..models import User, UserRole
+from .auth import get_current_user
+
+router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """只允许管理员访问"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="只有管理员可以访问")
+    return current_user
+
+
+@router.get("/loop")
+async def get_loop_stats(current_user: User = Depends(require_admin)):
+    """事件循环延迟统计与最近的阻塞记录（含阻塞时的调用栈）"""
+    return {"pid": os.getpid(), **loop_monitor.stats()}
@@ -1,28 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, func
-from sqlalchemy.orm import selectinload
 from typing import List
 import time
+from .. import queries
+from ..coalesce import coalesced
 from ..database import get_db
-from ..models import Message, Conversation
-from ..schemas import MessageCreate, MessageResponse, PaginatedResponse
+from ..load_shedding import db_priority, HIGH, LOW
+from ..models import Message
+from ..schemas import MessageCreate, MessageResponse, MessagePaginatedResponse
+from ..hot_messages import hot_messages
+from ..serializers import message_page, serialize_message
+from ..user_directory import user_directory
 
 router = APIRouter(prefix="/api/messages", tags=["messages"])
 
 
-@router.get("/", response_model=PaginatedResponse[MessageResponse])
+@router.get("/", response_model=MessagePaginatedResponse)
+@db_priority(LOW, pool="admin")
+@coalesced("messages")
 async def get_all_messages(
     conversation_id: int = None,
     sender_id: str = None,
     message_type: str = None,
     page: int = 1,
     page_size: int = 50,
+    senders: bool = False,  # 为 True 时发送者以 senders 边表返回
     db: AsyncSession = Depends(get_db)
 ):
     """获取所有消息列表（支持筛选、分页）"""
     # 构建基础查询
-    base_query = select(Message).options(selectinload(Message.sender))
+    base_query = select(Message)
     
     # 筛选条件
     if conversation_id:
@@ -51,20 +60,23 @@ async def get_all_messages(
     result = await db.execute(query)
     messages = result.scalars().all()
     
-    return PaginatedResponse(count=total_count, results=messages)
+    # 发送者从用户目录填充（未命中的一次查询补齐）
+    users = await user_directory.get_serialized_many(db, (m.sender_id for m in messages))
+    return ORJSONResponse(message_page(total_count, messages, senders=senders, users=users))
 
 
 @router.post("/", response_model=MessageResponse)
+@db_priority(HIGH, pool="realtime")
 async def create_message(message: MessageCreate, db: AsyncSession = Depends(get_db)):
     """发送消息"""
+    from ..events import notifier  # 实时通知（同进程或经事件通道转发到 WebSocket 网关）
+
     # 创建消息
     db_message = Message(**message.dict())
     db.add(db_message)
 
     # 更新会话信息
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == message.conversation_id)
-    )
+    result = await db.execute(queries.conversation_by_id(message.conversation_id))
     conversation = result.scalar_one_or_none()
     if conversation:
         # 根据消息类型设置友好的显示文本
@@ -90,41 +102,42 @@ async def create_message(message: MessageCreate, db: AsyncSession = Depends(get_
 
     await db.commit()
     await db.refresh(db_message)
+    await hot_messages.append(db, db_message)
+
+    # 推送会话摘要变更（最后消息、未读数）
+    if conversation:
+        await notifier.notify_conversation_update(conversation)
 
-    # 重新加载关联数据
-    result = await db.execute(
-        select(Message)
-        .options(selectinload(Message.sender))
-        .where(Message.id == db_message.id)
-    )
-    return result.scalar_one()
+    # 发送者从用户目录填充，不再重新查询消息及关联数据
+    users = await user_directory.get_serialized_many(db, (db_message.sender_id,))
+    return ORJSONResponse(serialize_message(db_message, users))
 
 
 @router.put("/{message_id}/read")
+@db_priority(HIGH, pool="realtime")
 async def mark_message_as_read(message_id: int, db: AsyncSession = Depends(get_db)):
     """标记消息为已读"""
-    result = await db.execute(
-        select(Message).where(Message.id == message_id)
-    )
+    result = await db.execute(queries.message_by_id(message_id))
     message = result.scalar_one_or_none()
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
 
     message.is_read = True
     await db.commit()
+    hot_messages.invalidate(message.conversation_id)
     return {"status": "success"}
 
 
 @router.delete("/{message_id}")
 async def delete_message(message_id: int, db: AsyncSession = Depends(get_db)):
     """删除消息（硬删除）"""
-    result = await db.execute(
-        select(Message).where(Message.id == message_id)
-    )
+    result = await db.execute(queries.message_by_id(message_id))
     message = result.scalar_one_or_none()
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
+    conversation_id = message.conversation_id
     await db.delete(message)
     await db.commit()
+    hot_messages.invalidate(conversation_id)
     return {"status": "success", "message": "Message deleted successfully"}
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List
+from .. import queries
 from ..database import get_db
 from ..models import QuickReply
+from ..quick_reply_cache import quick_reply_cache
 from ..schemas import QuickReplyCreate, QuickReplyUpdate, QuickReplyResponse
+from ..utils.etag import make_etag, etag_matches, not_modified, etag_headers
 
 router = APIRouter(prefix="/api/quick-replies", tags=["quick-replies"])
 
@@ -15,26 +19,45 @@ MAX_QUICK_REPLIES = 10
 @router.get("/user/{user_id}", response_model=List[QuickReplyResponse])
 async def get_quick_replies(
     user_id: str,  # 用户ID（role=merchant）
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
-    """获取商家用户的快捷回复列表"""
-    result = await db.execute(
-        select(QuickReply)
-        .where(QuickReply.user_id == user_id, QuickReply.is_active == True)
-        .order_by(QuickReply.sort_order)
-    )
-    quick_replies = result.scalars().all()
-    return quick_replies
+    """
+    获取商家用户的快捷回复列表
+
+    支持 If-None-Match：每个用户最多 MAX_QUICK_REPLIES 条，ETag 直接由结果内容计算，
+    未变化时返回 304 免去重复下载。结果与 ETag 缓存在进程内（app.quick_reply_cache），
+    命中时不访问数据库。
+    """
+    version = quick_reply_cache.sync()
+    cached = quick_reply_cache.get(user_id)
+    if cached is not None:
+        quick_replies, etag = cached
+    else:
+        result = await db.execute(queries.active_quick_replies(user_id))
+        quick_replies = [
+            QuickReplyResponse.model_validate(quick_reply).model_dump()
+            for quick_reply in result.scalars().all()
+        ]
+        etag = make_etag("quick_replies", user_id, *(
+            (item["id"], item["sort_order"], item["content"]) for item in quick_replies
+        ))
+        quick_reply_cache.put(user_id, quick_replies, etag, version)
+
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return ORJSONResponse(quick_replies, headers=etag_headers(etag))
 
 
 # 向后兼容：保留旧的API路径
 @router.get("/merchant/{merchant_id}", response_model=List[QuickReplyResponse])
 async def get_quick_replies_compat(
     merchant_id: str,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """获取商家的快捷回复列表（兼容旧版API）"""
-    return await get_quick_replies(merchant_id, db)
+    return await get_quick_replies(merchant_id, request, db)
 
 
 @router.post("/", response_model=QuickReplyResponse)
@@ -60,6 +83,7 @@ async def create_quick_reply(
     db.add(db_quick_reply)
     await db.commit()
     await db.refresh(db_quick_reply)
+    quick_reply_cache.invalidate(db_quick_reply.user_id)
     return db_quick_reply
 
 
@@ -84,6 +108,7 @@ async def update_quick_reply(
     
     await db.commit()
     await db.refresh(quick_reply)
+    quick_reply_cache.invalidate(quick_reply.user_id)
     return quick_reply
 
 
@@ -102,4 +127,5 @@ async def delete_quick_reply(
 
     quick_reply.is_active = False
     await db.commit()
+    quick_reply_cache.invalidate(quick_reply.user_id)
     return {"status": "success", "message": "删除成功"}
@@ -0,0 +1,162 @@
+"""
+增量同步接口
+
+客户端断线重连或页面从后台恢复时，按水位线拉取自上次同步以来的变化，
+而不是从第 1 页重新分页拉取会话和消息。
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_, func
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional, Tuple
+import time
+from ..database import get_db
+from ..models import Conversation, Message
+from ..schemas import SyncResponse
+from ..serializers import serialize_conversation, serialize_message
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+# 每次同步最多返回的会话数
+SYNC_MAX_LIMIT = 200
+
+# 每个会话最多下发的新消息数（超出时客户端重新加载该会话首页）
+SYNC_MESSAGES_PER_CONVERSATION = 50
+
+# 水位线回退秒数：updated_at 为秒级时间戳且在提交前生成，回退一小段时间避免漏掉并发写入（重复下发由客户端按 id 去重）
+SYNC_SAFETY_WINDOW = 5
+
+
+def _parse_since(since: Optional[str]) -> Tuple[int, int, int, int, int]:
+    """
+    解析水位线
+
+    格式：{游标时间}.{游标会话ID}.{消息ID}.{本轮时间}.{本轮消息ID}
+        - 游标时间/游标会话ID：会话按 (updated_at, id) 递增扫描的位置
+        - 消息ID：只下发 ID 大于此值的消息
+        - 本轮时间/本轮消息ID：本轮同步开始时的快照（为 0 表示新一轮），本轮结束后成为下一轮的起点
+    """
+    if not since:
+        return 0, 0, 0, 0, 0
+    try:
+        parts = [int(part) for part in since.split(".")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since watermark")
+    if len(parts) != 5 or any(part < 0 for part in parts):
+        raise HTTPException(status_code=400, detail="Invalid since watermark")
+    return tuple(parts)
+
+
+def _format_since(*parts: int) -> str:
+    """生成水位线"""
+    return ".".join(str(part) for part in parts)
+
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    user_id: str,
+    since: Optional[str] = None,  # 上次同步返回的 next_since，首次同步留空
+    limit: int = 50,  # 每次最多返回的会话数
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    增量同步：返回自水位线以来变化的会话、新消息和已读标记
+
+    - 会话按 (updated_at, id) 游标分页，走 (participant_id, updated_at, id) 索引
+    - 新消息只在本页会话内按 (conversation_id, id) 索引查找，开销与变化量成正比
+    - has_more 为 true 时应立即用 next_since 继续请求，直到 has_more 为 false
+    """
+    limit = max(1, min(limit, SYNC_MAX_LIMIT))
+    cursor_ts, cursor_id, since_message_id, round_ts, round_message_id = _parse_since(since)
+
+    # 新一轮同步：记录开始时的快照，作为本轮结束后的下一轮起点
+    if round_ts == 0:
+        round_ts = max(int(time.time()) - SYNC_SAFETY_WINDOW, 0)
+        max_id_result = await db.execute(select(func.max(Message.id)))
+        round_message_id = max_id_result.scalar() or 0
+
+    # 1. 变化的会话（游标分页）
+    result = await db.execute(
+        select(Conversation)
+        .options(
+            selectinload(Conversation.participant1),
+            selectinload(Conversation.participant2)
+        )
+        .where(
+            or_(
+                Conversation.participant1_id == user_id,
+                Conversation.participant2_id == user_id
+            ),
+            or_(
+                Conversation.updated_at > cursor_ts,
+                and_(Conversation.updated_at == cursor_ts, Conversation.id > cursor_id)
+            )
+        )
+        .order_by(Conversation.updated_at, Conversation.id)
+        .limit(limit + 1)
+    )
+    conversations = result.scalars().all()
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
+
+    # 2. 本页会话中的新消息（每个会话最多 SYNC_MESSAGES_PER_CONVERSATION 条，取最新）
+    messages: List[Message] = []
+    truncated_ids = set()
+    if conversations:
+        ranked = (
+            select(
+                Message.id.label("id"),
+                func.row_number().over(
+                    partition_by=Message.conversation_id,
+                    order_by=Message.id.desc()
+                ).label("rn")
+            )
+            .where(
+                Message.conversation_id.in_([c.id for c in conversations]),
+                Message.id > since_message_id
+            )
+            .subquery()
+        )
+        result = await db.execute(
+            select(Message, ranked.c.rn)
+            .join(ranked, ranked.c.id == Message.id)
+            .where(ranked.c.rn <= SYNC_MESSAGES_PER_CONVERSATION + 1)
+            .order_by(Message.id)
+        )
+        for message, rn in result.all():
+            if rn > SYNC_MESSAGES_PER_CONVERSATION:
+                truncated_ids.add(message.conversation_id)
+            else:
+                messages.append(message)
+
+    # 3. 已读标记
+    read_markers = []
+    for conversation in conversations:
+        read_markers.append({
+            "conversation_id": conversation.id,
+            "reader_id": conversation.participant1_id,
+            "last_read_id": conversation.participant1_last_read_id or 0,
+        })
+        read_markers.append({
+            "conversation_id": conversation.id,
+            "reader_id": conversation.participant2_id,
+            "last_read_id": conversation.participant2_last_read_id or 0,
+        })
+
+    # 4. 下一次水位线：本轮未结束则前进游标，结束则以本轮快照开始新一轮
+    if has_more:
+        last = conversations[-1]
+        next_since = _format_since(last.updated_at, last.id, since_message_id, round_ts, round_message_id)
+    else:
+        next_since = _format_since(round_ts, 0, max(round_message_id, since_message_id), 0, 0)
+
+    users: Dict[str, dict] = {}
+    return ORJSONResponse({
+        "conversations": [serialize_conversation(c, users) for c in conversations],
+        "messages": [serialize_message(m, None) for m in messages],
+        "read_markers": read_markers,
+        "truncated_conversation_ids": sorted(truncated_ids),
+        "next_since": next_since,
+        "has_more": has_more,
+    })
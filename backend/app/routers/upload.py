@@ -1,23 +1,17 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pathlib import Path
 from typing import Tuple
-import os
 import time
 from datetime import datetime
-from dotenv import load_dotenv
+from ..config import settings
+from ..metrics import UPLOAD_BYTES
 from ..schemas import UploadResponse
 from ..utils import build_full_url
 
-# 加载环境变量
-load_dotenv()
-
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
-# 媒体文件目录（从环境变量读取）
-media_dir_str = os.getenv("MEDIA_DIR")
-if media_dir_str is None:
-    raise ValueError("MEDIA_DIR 环境变量未设置，请在 .env 文件中配置")
-MEDIA_DIR = Path(media_dir_str)
+# 媒体文件目录
+MEDIA_DIR = Path(settings.media_dir)
 MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 
 # 允许的文件类型
@@ -31,20 +25,18 @@ ALLOWED_FILE_TYPES = {
     "text/plain"
 }
 
-# 最大文件大小（从环境变量读取）
-max_file_size_str = os.getenv("MAX_FILE_SIZE")
-if max_file_size_str is None:
-    raise ValueError("MAX_FILE_SIZE 环境变量未设置，请在 .env 文件中配置")
-MAX_FILE_SIZE = int(max_file_size_str)
+# 最大文件大小
+MAX_FILE_SIZE = settings.max_file_size
 
 
-async def _save_uploaded_file(file: UploadFile, allowed_types: set) -> Tuple[str, str]:
+async def _save_uploaded_file(file: UploadFile, allowed_types: set, file_type: str) -> Tuple[str, str]:
     """
     通用文件上传处理函数
     
     Args:
         file: 上传的文件对象
         allowed_types: 允许的文件类型集合
+        file_type: 上传类型（image / file，用于上传字节数指标）
         
     Returns:
         tuple: (文件访问URL, 文件名)
@@ -81,6 +73,7 @@ async def _save_uploaded_file(file: UploadFile, allowed_types: set) -> Tuple[str
     # 保存文件
     with open(file_path, "wb") as f:
         f.write(contents)
+    UPLOAD_BYTES.inc(file_type, amount=len(contents))
 
     # 返回完整 URL
     relative_path = f"/api/media/uploads/{year}/{month}/{day}/{filename}"
@@ -91,7 +84,7 @@ async def _save_uploaded_file(file: UploadFile, allowed_types: set) -> Tuple[str
 @router.post("/image", response_model=UploadResponse)
 async def upload_image(file: UploadFile = File(...)):
     """上传图片"""
-    url, original_filename = await _save_uploaded_file(file, ALLOWED_IMAGE_TYPES)
+    url, original_filename = await _save_uploaded_file(file, ALLOWED_IMAGE_TYPES, "image")
     return UploadResponse(
         url=url,
         filename=original_filename,
@@ -103,7 +96,7 @@ async def upload_image(file: UploadFile = File(...)):
 async def upload_file(file: UploadFile = File(...)):
     """上传文件（支持图片和文档）"""
     all_allowed_types = ALLOWED_IMAGE_TYPES | ALLOWED_FILE_TYPES
-    url, original_filename = await _save_uploaded_file(file, all_allowed_types)
+    url, original_filename = await _save_uploaded_file(file, all_allowed_types, "file")
     return UploadResponse(
         url=url,
         filename=original_filename,
@@ -3,14 +3,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
+from ..coalesce import coalesced
 from ..database import get_db
+from ..load_shedding import db_priority, LOW
 from ..models import User, UserRole
+from ..avatar import generated_avatar_path
+from ..events import notifier  # 用户目录失效同时通知 WebSocket 网关
+from ..user_directory import user_directory
 from ..schemas import UserCreate, UserUpdate, UserResponse, PaginatedResponse, UserEnsureRequest, UserEnsureItem
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/", response_model=PaginatedResponse[UserResponse])
+@db_priority(LOW, pool="admin")
+@coalesced("users")
 async def get_users(
     role: Optional[str] = None,  # 按角色过滤：buyer, merchant, admin
     page: int = 1,
@@ -81,6 +88,8 @@ async def update_user(user_id: str, user_update: UserUpdate, db: AsyncSession =
         setattr(user, field, value)
     
     await db.commit()
+    user_directory.invalidate(user_id)
+    await notifier.notify_user_changed(user_id)
     await db.refresh(user)
     return user
 
@@ -100,6 +109,8 @@ async def update_user_status(user_id: str, status: str, db: AsyncSession = Depen
     
     user.status = status
     await db.commit()
+    user_directory.invalidate(user_id)
+    await notifier.notify_user_changed(user_id)
     await db.refresh(user)
     return user
 
@@ -117,6 +128,8 @@ async def delete_user(user_id: str, db: AsyncSession = Depends(get_db)):
     # 软删除：设置状态为deleted
     user.status = "deleted"
     await db.commit()
+    user_directory.invalidate(user_id)
+    await notifier.notify_user_changed(user_id)
     return {"status": "success", "message": "User deleted successfully"}
 
 
@@ -155,19 +168,10 @@ async def ensure_users(request: UserEnsureRequest, db: AsyncSession = Depends(ge
                 username = f"{role_name_map.get(user_item.role, '用户')}{timestamp_ms}"
             
             # 生成默认头像（如果未提供）
+            # 按用户ID动态生成，首次访问时渲染并缓存，无需预先运行脚本
             avatar = user_item.avatar
             if not avatar:
-                # 根据角色选择默认头像（随机 1 或 2）
-                import random
-                
-                if user_item.role == UserRole.BUYER:
-                    # buyer1.png 和 buyer2.png 随机选择
-                    avatar = f"/api/media/avatars/buyer{random.randint(1, 2)}.png"
-                elif user_item.role == UserRole.MERCHANT:
-                    # merchant1.png 和 merchant2.png 随机选择
-                    avatar = f"/api/media/avatars/merchant{random.randint(1, 2)}.png"
-                else:  # ADMIN
-                    avatar = "/api/media/avatars/admin.png"
+                avatar = generated_avatar_path(user_item.id)
             
             # 创建新用户
             new_user = User(
@@ -0,0 +1,187 @@
+"""
+WebSocket 端点
+
+开发模式（WS_EVENT_SOCKET 为空）由 main.py 与 REST 接口一起挂载；
+生产环境由独立网关 gateway.py 挂载，REST worker 通过事件通道（app.events）推送通知。
+"""
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import json
+from .. import queries
+from ..admission import HandshakeAdmission
+from ..config import settings
+from ..hot_messages import hot_messages
+from ..metrics import registry, WS_FRAMES_RECEIVED, WS_FANOUT_SECONDS
+from ..user_directory import user_directory
+from ..websocket import manager, CLOSE_TRY_AGAIN_LATER
+from ..ws_capture import recorder
+
+# 握手准入控制（限制同时查库的握手数，防止重连风暴耗尽连接池）
+admission = HandshakeAdmission(
+    rate=settings.ws_handshake_rate,
+    burst=settings.ws_handshake_burst,
+    max_wait=settings.ws_handshake_max_wait_ms / 1000,
+)
+
+router = APIRouter(tags=["websocket"])
+
+# 客户端可发送的帧类型（其它类型计为 other，避免标签值无限增长）
+CLIENT_FRAME_TYPES = ("message", "read", "typing")
+
+WS_HANDSHAKE_WAITING = registry.gauge("ws_handshake_waiting", "等待准入的 WebSocket 握手数")
+WS_HANDSHAKES = registry.counter("ws_handshakes_total", "WebSocket 握手准入结果", ("result",))
+
+
+def _collect_admission():
+    stats = admission.stats()
+    WS_HANDSHAKE_WAITING.set(stats["waiting"])
+    for result in ("admitted", "deferred", "rejected"):
+        WS_HANDSHAKES.set(stats[result], result)
+
+
+registry.on_collect(_collect_admission)
+
+
+@router.websocket("/api/ws/{user_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    user_id: str
+):
+    """WebSocket连接端点"""
+    # 排空期间不再接受新连接
+    if manager.draining:
+        await manager.reject_draining(websocket, settings.ws_drain_window_ms)
+        return
+    
+    # 握手准入：超出速率时告知稍后重连，不查询数据库
+    retry_after = await admission.acquire()
+    if retry_after is not None:
+        await manager.reject(websocket, int(retry_after * 1000), CLOSE_TRY_AGAIN_LATER, "overloaded")
+        return
+    
+    # 从用户目录读取角色（未命中时才打开会话查询数据库）
+    # 实时路径使用独立的 realtime 连接池，不与管理后台查询争用连接
+    from app.database import session_maker
+    async_session_maker = session_maker("realtime")
+    
+    user = await user_directory.lookup(user_id)
+    if user is None:
+        await websocket.close(code=1008, reason="User not found")
+        return
+    role = user["role"]
+    
+    await manager.connect(websocket, user_id, role)
+    recorder.connected(user_id, role)
+    try:
+        while True:
+            # 接收消息
+            data = await websocket.receive_text()
+            message = json.loads(data)
+            recorder.frame(user_id, message)
+
+            # 处理不同类型的消息
+            message_type = message.get("type")
+            WS_FRAMES_RECEIVED.inc(message_type if message_type in CLIENT_FRAME_TYPES else "other")
+
+            if message_type == "message":
+                conversation_id = message.get("conversation_id")
+                content = message.get("content")
+                msg_content_type = message.get("message_type", "text")
+
+                # 获取会话信息以确定接收者
+                import time
+
+                async with async_session_maker() as db:
+                    result = await db.execute(queries.conversation_by_id(conversation_id))
+                    conversation = result.scalar_one_or_none()
+                    
+                    if conversation:
+                        # 确定参与者
+                        participant1_id = conversation.participant1_id
+                        participant2_id = conversation.participant2_id
+                        
+                        # 构造消息数据
+                        message_data = {
+                            "type": "message",
+                            "conversation_id": conversation_id,
+                            "sender_id": user_id,
+                            "content": content,
+                            "message_type": msg_content_type,
+                            "timestamp": int(time.time())
+                        }
+                        
+                        with WS_FANOUT_SECONDS.time("message"):
+                            # 发送给对方
+                            if user_id == participant1_id:
+                                await manager.send_personal_message(message_data, participant2_id)
+                            else:
+                                await manager.send_personal_message(message_data, participant1_id)
+                                
+                            # 发送给所有管理员
+                            for admin_id in list(manager.admin_users):
+                                if admin_id != user_id:
+                                    await manager.send_personal_message(message_data, admin_id)
+
+            elif message_type == "read":
+                # 标记消息已读
+                conversation_id = message.get("conversation_id")
+                if conversation_id:
+                    from app.models import Message
+                    from sqlalchemy import update
+                    from app.routers.conversations import advance_read_marker
+
+                    async with async_session_maker() as db:
+                        # 更新会话未读数
+                        # 需要根据 user_id 判断是清空 participant1_unread 还是 participant2_unread
+                        result = await db.execute(queries.conversation_by_id(conversation_id))
+                        conversation = result.scalar_one_or_none()
+                        
+                        if conversation:
+                            if conversation.participant1_id == user_id:
+                                conversation.participant1_unread = 0
+                            elif conversation.participant2_id == user_id:
+                                conversation.participant2_unread = 0
+                            
+                            # 标记消息为已读
+                            await db.execute(
+                                update(Message)
+                                .where(Message.conversation_id == conversation_id)
+                                .where(Message.sender_id != user_id) # 只标记对方发的消息
+                                .values(is_read=True)
+                            )
+                            await advance_read_marker(db, conversation, user_id)
+                            await db.commit()
+                            hot_messages.invalidate(conversation_id)
+
+                            # 推送会话摘要变更（未读数清零）
+                            await manager.notify_conversation_update(conversation)
+
+            elif message_type == "typing":
+                # 发送输入状态给会话参与者
+                conversation_id = message.get("conversation_id")
+                if conversation_id:
+                    # 获取会话信息以确定接收者
+                    async with async_session_maker() as db:
+                        result = await db.execute(queries.conversation_by_id(conversation_id))
+                        conversation = result.scalar_one_or_none()
+                        
+                        if conversation:
+                            participant1_id = conversation.participant1_id
+                            participant2_id = conversation.participant2_id
+                            
+                            typing_message = {
+                                "type": "typing",
+                                "user_id": user_id,
+                                "conversation_id": conversation_id,
+                                "is_typing": message.get("is_typing", True)
+                            }
+                            
+                            # 发送给对方
+                            if user_id == participant1_id:
+                                await manager.send_personal_message(typing_message, participant2_id)
+                            else:
+                                await manager.send_personal_message(typing_message, participant1_id)
+
+    except WebSocketDisconnect:
+        recorder.disconnected(user_id)
+        await manager.disconnect(user_id, role)
+        print(f"用户 {user_id} 断开连接")
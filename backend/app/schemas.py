@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_serializer, model_serializer
-from typing import Optional, List, Generic, TypeVar
+from typing import Optional, List, Dict, Generic, TypeVar
 from .models import UserRole, MessageType
 from .utils import build_full_url
 
@@ -103,6 +103,11 @@ class MessageResponse(MessageBase):
         from_attributes = True
 
 
+class MessagePaginatedResponse(PaginatedResponse[MessageResponse]):
+    """消息分页响应（senders=true 时消息不内嵌 sender，改为 senders 边表）"""
+    senders: Optional[Dict[str, UserResponse]] = Field(None, description="发送者边表 {user_id: 用户信息}")
+
+
 # ===== Conversation Schemas =====
 class ConversationBase(BaseModel):
     participant1_id: str = Field(..., description="参与者1 ID")
@@ -132,6 +137,24 @@ class ConversationDetail(ConversationResponse):
     messages: List[MessageResponse] = []
 
 
+# ===== Sync Schemas =====
+class ReadMarker(BaseModel):
+    """会话已读标记：reader_id 已读到 last_read_id（含）为止的消息"""
+    conversation_id: int
+    reader_id: str
+    last_read_id: int
+
+
+class SyncResponse(BaseModel):
+    """增量同步响应"""
+    conversations: List[ConversationResponse] = Field(..., description="自水位线以来变化的会话")
+    messages: List[MessageResponse] = Field(..., description="上述会话中的新消息（不内嵌 sender）")
+    read_markers: List[ReadMarker] = Field(..., description="上述会话的已读标记")
+    truncated_conversation_ids: List[int] = Field(..., description="新消息超出上限的会话，客户端应重新加载首页消息")
+    next_since: str = Field(..., description="下一次同步使用的水位线")
+    has_more: bool = Field(..., description="是否还有未同步的变化（为 true 时应立即继续同步）")
+
+
 # ===== Quick Reply Schemas =====
 class QuickReplyBase(BaseModel):
     content: str
@@ -0,0 +1,197 @@
+"""
+内置数据初始化
+
+initialize_data 只在空库时写入测试用户和快捷回复。启动时执行有两种方式：
+    1. 部署步骤（推荐）：alembic upgrade head 之后运行 python seed_data.py，并设置 SEED_ON_STARTUP=False
+    2. SEED_ON_STARTUP=True：由 lifespan 调用 seed_once，各 worker 在文件锁内依次检查数据库，
+       只有第一个发现空库的 worker 写入，其余 worker 只执行一次 limit 1 的存在性查询
+是否已初始化以数据库内容为准（删库或重新迁移后重启即重新写入），不依赖标记文件。
+"""
+from pathlib import Path
+import asyncio
+import tempfile
+import zlib
+from sqlalchemy import select
+
+try:
+    import fcntl
+except ImportError:  # Windows 无 fcntl，退化为每个进程各自检查
+    fcntl = None
+
+from .auth import hash_password_async
+from .config import settings
+from .database import async_session_maker
+from .models import User, QuickReply, UserRole
+
+
+async def initialize_data() -> bool:
+    """
+    初始化测试数据（已有用户时不做任何操作）
+
+    Returns:
+        是否写入了数据
+    """
+    async with async_session_maker() as db:
+        # 检查是否已有数据
+        result = await db.execute(select(User.id).limit(1))
+        if result.first():
+            return False  # 数据已存在
+
+        # 创建测试用户
+        admin_password_hash = await hash_password_async("admin123")
+        users_data = [
+            # 平台管理员(固定添加)
+            User(
+                id="a2",
+                username="admin",
+                avatar="/api/media/avatars/admin.png",
+                role=UserRole.ADMIN,
+                description="管理员",
+                password_hash=admin_password_hash,
+            ),
+            # 官方客服(固定添加)
+            User(
+                id="p1",
+                username="官方客服",
+                avatar="/api/media/avatars/service.png",
+                role=UserRole.PLATFORM,
+                description="官方客服"
+            ),
+            # 客户/买家(2个)
+            User(
+                id="b1",
+                username="保安堂药房",
+                avatar="/api/media/avatars/buyer1.png",
+                description='一家深植于社区的传统药房，秉承"保安康，济天下"的经营理念。除提供各类中西成药外，还提供代客煎药、健康咨询等贴心服务，是街坊邻里信赖的健康守护站。',
+                role=UserRole.BUYER.value
+            ),
+            User(
+                id="b2",
+                username="异世界药局",
+                avatar="/api/media/avatars/buyer2.png",
+                role=UserRole.BUYER.value,
+                description="一家以创新和客户体验为核心的现代连锁药局。不仅销售药品，还提供个性化的健康解决方案、先进的医疗器械租赁及全程用药指导，旨在成为顾客身边的健康管理伙伴。",
+            ),
+            # 商家（3个）
+            User(
+                id="m1",
+                username="保和堂医药集团",
+                avatar="/api/media/avatars/merchant1.png",
+                role=UserRole.MERCHANT,
+                description="一家融合了百年传承技艺与现代管理体系的大型医药集团。业务涵盖经典名方的研发、中药饮片生产及现代化中成药制造，致力于让传统智慧为当代健康服务。",
+            ),
+            User(
+                id="m2",
+                username="阿纳斯蒂制药",
+                avatar="/api/media/avatars/merchant2.png",
+                role=UserRole.MERCHANT,
+                description="一家专注于神经科学领域前沿研究的创新型药企，以开发调节情绪与认知功能的特种药物而闻名。其产品线基于精准医疗理念，致力于为复杂的神经系统疾病提供突破性治疗方案。"
+            ),
+            User(
+                id="m3",
+                username="梅迪西斯制药",
+                avatar="/api/media/avatars/user1.png",
+                role=UserRole.MERCHANT,
+                description="源自古老的医药世家，将传统配方与现代尖端制药技术相结合。该药厂尤其擅长开发天然植物提取物制成的特效药与高品质保健品，在业界享有崇高声誉。"
+            )
+
+        ]
+        db.add_all(users_data)
+        await db.commit()
+
+        # 创建快捷消息（为所有用户创建）
+        result = await db.execute(select(User))
+        all_users = result.scalars().all()
+
+        quick_replies = []
+        for user in all_users:
+            # 根据角色创建不同的快捷消息
+            if user.role == UserRole.MERCHANT:
+                # 商家的快捷消息（初始化3条，可自行添加到10条）
+                user_quick_replies = [
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，欢迎咨询！请问有什么可以帮到您的？",
+                        sort_order=0
+                    ),
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，我们提供7天无理由退换货服务，请提供您的订单号，我会马上为您处理。",
+                        sort_order=1
+                    ),
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，请提供您的订单号，我会帮您查询订单详情。",
+                        sort_order=2
+                    ),
+                ]
+            elif user.role == UserRole.BUYER:
+                # 买家的快捷消息（初始化3条，可自行添加到10条）
+                user_quick_replies = [
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，在吗？",
+                        sort_order=0
+                    ),
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，我想咨询一下我的订单情况。",
+                        sort_order=1
+                    ),
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，请帮我查一下物流信息，谢谢。",
+                        sort_order=2
+                    ),
+                ]
+            else:  # UserRole.ADMIN
+                # 管理员的快捷消息（初始化3条，可自行添加到10条）
+                user_quick_replies = [
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，我是平台管理员。",
+                        sort_order=0
+                    ),
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，这里是平台客服，请问有什么可以帮到您？",
+                        sort_order=1
+                    ),
+                    QuickReply(
+                        user_id=user.id,
+                        content="您好，我们正在调查相关问题，请提供更多详细信息。",
+                        sort_order=2
+                    ),
+                ]
+            
+            quick_replies.extend(user_quick_replies)
+        
+        db.add_all(quick_replies)
+        await db.commit()
+
+        return True
+
+
+def _lock_path() -> Path:
+    """文件锁路径（按数据库地址区分，每个数据库一个文件）"""
+    key = "%08x" % zlib.crc32(settings.database_url.encode("utf-8"))
+    return Path(tempfile.gettempdir()) / f"live_chat_seed_{key}.lock"
+
+
+async def seed_once() -> bool:
+    """
+    多个 worker 同时启动时串行执行 initialize_data（避免并发写入同一批用户）
+
+    Returns:
+        本进程是否写入了数据
+    """
+    if fcntl is None:
+        return await initialize_data()
+
+    with open(_lock_path(), "a") as lock_file:
+        # 其它 worker 正在初始化时等待其完成（在线程中阻塞，不占用事件循环）
+        await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        try:
+            return await initialize_data()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
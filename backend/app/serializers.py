@@ -0,0 +1,128 @@
+"""
+高性能序列化
+直接从 ORM 对象构造 dict 并用 ORJSONResponse 输出，跳过 Pydantic 的逐行校验。
+输出字段与 schemas 中的 UserResponse / MessageResponse / ConversationResponse 保持一致。
+"""
+from typing import Dict, Iterable, Optional
+from .models import User, Message, Conversation
+from .utils import build_full_url
+
+# 需要拼接完整 URL 的消息类型（用 tuple 做相等比较，兼容 MessageType 枚举与字符串）
+URL_MESSAGE_TYPES = ('image', 'file')
+
+
+def serialize_user(user: User) -> dict:
+    """序列化用户（同 UserResponse）"""
+    avatar = user.avatar
+    return {
+        'id': user.id,
+        'username': user.username,
+        'avatar': build_full_url(avatar) if avatar else None,
+        'role': user.role,
+        'description': user.description,
+        'status': user.status,
+        'created_at': user.created_at,
+    }
+
+
+def _cached_user(user: Optional[User], users: Dict[str, dict]) -> Optional[dict]:
+    """同一页中相同用户只序列化一次"""
+    if user is None:
+        return None
+    data = users.get(user.id)
+    if data is None:
+        data = users[user.id] = serialize_user(user)
+    return data
+
+
+def serialize_message(message: Message, users: Optional[Dict[str, dict]], embed_sender: bool = True) -> dict:
+    """
+    序列化消息（同 MessageResponse）
+
+    Args:
+        message: 消息对象（users 不为 None 且未包含发送者时需已加载 sender）
+        users: 本页已序列化用户表 {user_id: dict}（可由用户目录预先填充），会被就地补充；为 None 时不处理 sender
+        embed_sender: 是否内嵌 sender；为 False 时只写入 users，由调用方作为 senders 边表返回
+    """
+    content = message.content
+    if content and message.message_type in URL_MESSAGE_TYPES:
+        content = build_full_url(content)
+
+    data = {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'sender_id': message.sender_id,
+        'content': content,
+        'message_type': message.message_type,
+        'is_read': message.is_read,
+        'created_at': message.created_at,
+    }
+    if users is not None:
+        sender = users.get(message.sender_id)
+        if sender is None:
+            sender = _cached_user(message.sender, users)
+        if embed_sender:
+            data['sender'] = sender
+    return data
+
+
+def serialize_conversation(conversation: Conversation, users: Dict[str, dict]) -> dict:
+    """序列化会话（同 ConversationResponse，需已加载 participant1/participant2）"""
+    return {
+        'id': conversation.id,
+        'participant1_id': conversation.participant1_id,
+        'participant2_id': conversation.participant2_id,
+        'participant1_unread': conversation.participant1_unread,
+        'participant2_unread': conversation.participant2_unread,
+        'last_message': conversation.last_message,
+        'last_message_time': conversation.last_message_time,
+        'created_at': conversation.created_at,
+        'updated_at': conversation.updated_at,
+        'participant1': _cached_user(conversation.participant1, users),
+        'participant2': _cached_user(conversation.participant2, users),
+    }
+
+
+def message_page(
+    count: int,
+    messages: Iterable[Message],
+    senders: bool = False,
+    users: Optional[Dict[str, dict]] = None,
+) -> dict:
+    """
+    构造消息分页响应
+
+    Args:
+        count: 总记录数
+        messages: 当前页消息
+        senders: 为 True 时消息不内嵌 sender，改为返回 senders 边表（每个用户只出现一次）
+        users: 已序列化的发送者 {user_id: dict}（来自用户目录）；为 None 时从 message.sender 序列化
+    """
+    if users is None:
+        users = {}
+    results = [serialize_message(m, users, embed_sender=not senders) for m in messages]
+    data = {'count': count, 'results': results}
+    if senders:
+        data['senders'] = users
+    return data
+
+
+def cached_message_page(count: int, messages: Iterable[dict], senders: bool, users: Dict[str, dict]) -> dict:
+    """
+    由已序列化（不含 sender）的消息构造分页响应，输出与 message_page 一致
+
+    Args:
+        count: 总记录数
+        messages: 当前页消息 dict（来自 app.hot_messages，不会被修改）
+        senders: 为 True 时返回 senders 边表，否则逐条内嵌 sender
+        users: 已序列化的发送者 {user_id: dict}（来自用户目录）
+    """
+    if senders:
+        return {'count': count, 'results': list(messages), 'senders': users}
+    return {'count': count, 'results': [{**m, 'sender': users.get(m['sender_id'])} for m in messages]}
+
+
+def conversation_page(count: int, conversations: Iterable[Conversation]) -> dict:
+    """构造会话分页响应"""
+    users: Dict[str, dict] = {}
+    return {'count': count, 'results': [serialize_conversation(c, users) for c in conversations]}
@@ -0,0 +1,197 @@
+"""
+用户目录缓存
+
+用户 ID → 用户字段快照（不含密码哈希）与序列化结果（同 UserResponse），有界 LRU + TTL。
+以下路径共用此缓存，命中时不访问数据库：
+    - WebSocket 握手（读取 role）
+    - get_current_user（Token 验证后加载当前用户）
+    - 消息列表 / 发送消息接口的 sender 填充
+
+users 路由修改、禁用、删除用户后调用 invalidate 写穿失效：
+    - 清除本进程条目，并通过 app.invalidation 通知其它 REST worker（版本变化时清空整个缓存，写入很少）
+    - 由 users 路由经事件通道（app.events）通知 WebSocket 网关清除对应条目
+查库期间发生失效时结果不写入缓存。
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import queries
+from .config import settings
+from .database import session_maker
+from .invalidation import invalidation
+from .metrics import registry
+from .models import User
+from .serializers import serialize_user
+
+# 快照中不保存的字段
+_EXCLUDED_COLUMNS = ("password_hash",)
+
+# 失效通道中的名称
+CHANNEL = "users"
+
+
+class UserDirectory:
+    """用户目录（单线程事件循环内使用，无需加锁）"""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # user_id -> (过期时间戳, 字段快照, 序列化结果)
+        self._entries: "OrderedDict[str, Tuple[float, dict, dict]]" = OrderedDict()
+        # 条目所对应的失效通道版本，以及本进程失效次数（查库期间发生失效时丢弃结果）
+        self._version = invalidation.version(CHANNEL)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _get(self, user_id: str) -> Optional[Tuple[float, dict, dict]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def sync(self):
+        """
+        检查其它进程是否发布过失效（一次 stat），有则清空缓存
+
+        Returns:
+            当前版本，查库后作为 put 的参数
+        """
+        version = invalidation.version(CHANNEL)
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        return version, self._generation
+
+    def profile_version(self):
+        """
+        用户资料版本（嵌入用户资料的列表 ETag 使用，用户被修改/禁用/删除后变化）
+
+        配置了 CACHE_INVALIDATION_DIR 时为跨进程一致的失效通道版本，否则为本进程失效次数
+        （只用于单进程部署；deploy/gunicorn.conf.py 在多 worker 且未配置该目录时拒绝启动）
+        """
+        version, generation = self.sync()
+        return version if invalidation.directory else generation
+
+    def put(self, user: User, version=None) -> Tuple[dict, dict]:
+        """
+        写入用户（返回 字段快照, 序列化结果）
+
+        Args:
+            version: 查库前 sync 返回的版本，期间版本已变化（结果可能已过期）时不写入；
+                     None 表示用户刚从数据库读出，直接写入
+        """
+        snapshot = {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+            if column.key not in _EXCLUDED_COLUMNS
+        }
+        serialized = serialize_user(user)
+        if self.enabled and (version is None or version == (self._version, self._generation)):
+            self._entries[user.id] = (time.monotonic() + self.ttl, snapshot, serialized)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot, serialized
+
+    def invalidate(self, user_id: str) -> None:
+        """用户被修改/禁用/删除后调用（提交之后），并通知其它 REST worker"""
+        self.discard(user_id)
+        invalidation.bump(CHANNEL)
+
+    def discard(self, user_id: str) -> None:
+        """只清除本进程条目（网关收到事件通道的失效通知时调用）"""
+        self._entries.pop(user_id, None)
+        self._generation += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_snapshot(self, db: AsyncSession, user_id: str) -> Optional[dict]:
+        """
+        获取用户字段快照（未命中时查询数据库并写入缓存）
+
+        Returns:
+            字段快照，用户不存在时返回 None（不缓存不存在的用户）
+        """
+        version = self.sync()
+        entry = self._get(user_id)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        result = await db.execute(queries.user_by_id(user_id))
+        user = result.scalar_one_or_none()
+        if user is None:
+            return None
+        return self.put(user, version)[0]
+
+    async def lookup(self, user_id: str) -> Optional[dict]:
+        """获取用户字段快照，只在未命中时打开数据库会话（供 WebSocket 握手等无会话的调用方使用，走 realtime 连接池）"""
+        self.sync()
+        entry = self._get(user_id)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        async with session_maker("realtime")() as db:
+            return await self.get_snapshot(db, user_id)
+
+    async def get_serialized_many(self, db: AsyncSession, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        批量获取序列化用户（同 UserResponse），未命中的一次查询补齐
+
+        Returns:
+            {user_id: dict}，不存在的用户不出现在结果中
+        """
+        version = self.sync()
+        users: Dict[str, dict] = {}
+        missing = []
+        for user_id in set(user_ids):
+            entry = self._get(user_id)
+            if entry is None:
+                missing.append(user_id)
+            else:
+                users[user_id] = entry[2]
+        self.hits += len(users)
+        self.misses += len(missing)
+        if missing:
+            result = await db.execute(select(User).where(User.id.in_(missing)))
+            for user in result.scalars():
+                users[user.id] = self.put(user, version)[1]
+        return users
+
+    def stats(self) -> dict:
+        """缓存指标快照"""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# 全局用户目录
+user_directory = UserDirectory(settings.user_directory_size, settings.user_directory_ttl)
+
+USER_DIRECTORY_ENTRIES = registry.gauge("user_directory_entries", "用户目录缓存条数")
+USER_DIRECTORY_LOOKUPS = registry.counter("user_directory_lookups_total", "用户目录查询次数", ("result",))
+
+
+def _collect_user_directory():
+    stats = user_directory.stats()
+    USER_DIRECTORY_ENTRIES.set(stats["size"])
+    USER_DIRECTORY_LOOKUPS.set(stats["hits"], "hit")
+    USER_DIRECTORY_LOOKUPS.set(stats["misses"], "miss")
+
+
+registry.on_collect(_collect_user_directory)
@@ -0,0 +1,48 @@
+"""ETag / If-None-Match 辅助函数"""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+# 列表数据可被浏览器缓存，但每次使用前必须携带 If-None-Match 重新验证
+LIST_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    根据版本戳生成弱 ETag
+
+    Args:
+        parts: 版本戳组成部分（如记录数、最大更新时间、查询参数）
+
+    Returns:
+        形如 W/"<sha1>" 的 ETag
+    """
+    raw = "|".join(str(part) for part in parts).encode("utf-8")
+    return 'W/"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """判断请求的 If-None-Match 是否命中 ETag（弱比较）"""
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """构造 304 响应"""
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+def etag_headers(etag: str) -> dict:
+    """ETag 响应头"""
+    return {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
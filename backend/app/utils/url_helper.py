@@ -1,13 +1,11 @@
 """URL 辅助函数"""
-import os
-from dotenv import load_dotenv
+from ..config import settings
 
-load_dotenv()
+# 基础 URL（由 app.config 统一解析）
+BASE_URL = settings.base_url
 
-# 从环境变量获取基础 URL
-BASE_URL = os.getenv("BASE_URL")
-if not BASE_URL:
-    raise ValueError("BASE_URL 环境变量未设置，请在 .env 文件中配置")
+# 预先计算的 URL 前缀（不以 / 结尾），避免每次拼接时重复处理
+BASE_URL_PREFIX = BASE_URL.rstrip('/')
 
 
 def build_full_url(path: str) -> str:
@@ -24,18 +22,16 @@ def build_full_url(path: str) -> str:
     if not path:
         return None
     
+    # 相对路径（最常见情况）直接拼接预计算前缀
+    if path[0] == '/':
+        return BASE_URL_PREFIX + path
+    
     # 如果已经是完整 URL，直接返回
     if path.startswith(('http://', 'https://')):
         return path
     
-    # 确保 path 以 / 开头
-    if not path.startswith('/'):
-        path = '/' + path
-    
-    # 确保 BASE_URL 不以 / 结尾
-    base = BASE_URL.rstrip('/')
-    
-    return f"{base}{path}"
+    # 补全开头的 /
+    return BASE_URL_PREFIX + '/' + path
 
 
 def extract_relative_path(url: str) -> str:
@@ -1,9 +1,38 @@
 from fastapi import WebSocket, WebSocketDisconnect
 from typing import Dict, Set
+import asyncio
 import json
+import logging
+import random
+import signal
 import time
+from app.metrics import registry, WS_FRAMES_SENT, WS_FANOUT_SECONDS
 from app.utils import build_full_url
 
+logger = logging.getLogger(__name__)
+
+# 关闭码 1012（Service Restart）：服务重启，客户端应稍后重连
+CLOSE_SERVICE_RESTART = 1012
+
+# 关闭码 1013（Try Again Later）：握手过多，客户端按 retry_after_ms 重连
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def conversation_update_frame(conversation) -> dict:
+    """构造 conversation_update 推送帧（只包含可 JSON 序列化的会话摘要字段）"""
+    return {
+        "type": "conversation_update",
+        "conversation_id": conversation.id,
+        "participant1_id": conversation.participant1_id,
+        "participant2_id": conversation.participant2_id,
+        "participant1_unread": conversation.participant1_unread,
+        "participant2_unread": conversation.participant2_unread,
+        "last_message": conversation.last_message,
+        "last_message_time": conversation.last_message_time,
+        "updated_at": conversation.updated_at,
+        "timestamp": int(time.time())
+    }
+
 
 class ConnectionManager:
     """WebSocket连接管理器"""
@@ -15,6 +44,13 @@ class ConnectionManager:
         self.online_users: Set[str] = set()
         # 平台管理员用户ID集合
         self.admin_users: Set[str] = set()
+        # 排空模式：不再接受新连接，已有连接收到 reconnect 帧后关闭
+        self.draining = False
+
+    async def _send(self, websocket: WebSocket, message: dict):
+        """发送一帧（按帧类型计数）"""
+        WS_FRAMES_SENT.inc(message["type"])
+        await websocket.send_json(message)
 
     async def connect(self, websocket: WebSocket, user_id: str, role: str = "buyer"):
         """建立连接"""
@@ -33,7 +69,7 @@ class ConnectionManager:
         # 1. 先发送当前所有在线用户列表给新连接的用户
         online_users_list = list(self.online_users - {user_id})  # 排除自己
         if online_users_list:
-            await websocket.send_json({
+            await self._send(websocket, {
                 "type": "online_users",
                 "users": online_users_list,
                 "timestamp": int(time.time())
@@ -58,14 +94,15 @@ class ConnectionManager:
         if role == "admin" and user_id in self.admin_users:
             self.admin_users.remove(user_id)
         
-        # 广播离线状态
-        await self.broadcast_status(user_id, "offline")
+        # 广播离线状态（排空时所有连接都会断开并重连，无需逐个广播）
+        if not self.draining:
+            await self.broadcast_status(user_id, "offline")
 
     async def send_personal_message(self, message: dict, user_id: str):
         """发送个人消息"""
         if user_id in self.active_connections:
             try:
-                await self.active_connections[user_id].send_json(message)
+                await self._send(self.active_connections[user_id], message)
             except:
                 # 连接已断开
                 await self.disconnect(user_id)
@@ -103,13 +140,14 @@ class ConnectionManager:
             "timestamp": int(time.time())
         }
 
-        for uid, websocket in list(self.active_connections.items()):
-            if uid != user_id:
-                try:
-                    await websocket.send_json(status_message)
-                except Exception as e:
-                    # 连接失败，静默处理，连接管理器会在下次发送时清理
-                    print(f"发送状态消息失败 (用户{uid}): {e}")
+        with WS_FANOUT_SECONDS.time("status"):
+            for uid, websocket in list(self.active_connections.items()):
+                if uid != user_id:
+                    try:
+                        await self._send(websocket, status_message)
+                    except Exception as e:
+                        # 连接失败，静默处理，连接管理器会在下次发送时清理
+                        print(f"发送状态消息失败 (用户{uid}): {e}")
 
     async def notify_unread(self, user_id: str, conversation_id: int, count: int):
         """通知未读消息数"""
@@ -123,15 +161,12 @@ class ConnectionManager:
 
     async def notify_message_read(self, conversation_id: int, reader_id: str):
         """通知会话参与者消息已读"""
-        from app.database import async_session_maker
-        from app.models import Conversation
-        from sqlalchemy import select
+        from app import queries
+        from app.database import session_maker
         
-        # 查询会话信息
-        async with async_session_maker() as db:
-            result = await db.execute(
-                select(Conversation).where(Conversation.id == conversation_id)
-            )
+        # 查询会话信息（实时路径使用 realtime 连接池）
+        async with session_maker("realtime")() as db:
+            result = await db.execute(queries.conversation_by_id(conversation_id))
             conversation = result.scalar_one_or_none()
             
             if not conversation:
@@ -149,12 +184,72 @@ class ConnectionManager:
         }
         
         # 通知会话的另一方（发送者）
-        if reader_id == participant1_id:
-            # 参与者1标记已读 → 通知参与者2
-            await self.send_personal_message(read_message, participant2_id)
-        else:
-            # 参与者2标记已读 → 通知参与者1
-            await self.send_personal_message(read_message, participant1_id)
+        with WS_FANOUT_SECONDS.time("read"):
+            if reader_id == participant1_id:
+                # 参与者1标记已读 → 通知参与者2
+                await self.send_personal_message(read_message, participant2_id)
+            else:
+                # 参与者2标记已读 → 通知参与者1
+                await self.send_personal_message(read_message, participant1_id)
+
+    async def notify_conversation_update(self, conversation):
+        """
+        推送会话摘要变更（最后消息、未读数）给双方参与者和在线管理员
+
+        客户端据此就地更新会话列表，无需重新请求 /api/conversations/
+        """
+        await self.send_conversation_update(conversation_update_frame(conversation))
+
+    async def send_conversation_update(self, update_message: dict):
+        """推送已构造好的 conversation_update 帧（事件通道转发时使用）"""
+        recipients = {update_message["participant1_id"], update_message["participant2_id"]} | self.admin_users
+        with WS_FANOUT_SECONDS.time("conversation_update"):
+            for uid in recipients:
+                await self.send_personal_message(update_message, uid)
+
+    def reconnect_frame(self, retry_after_ms: int, reason: str) -> dict:
+        """构造 reconnect 帧：客户端在 retry_after_ms 毫秒后重连"""
+        return {
+            "type": "reconnect",
+            "retry_after_ms": retry_after_ms,
+            "reason": reason,  # restart: 服务重启  overloaded: 握手过多
+            "timestamp": int(time.time())
+        }
+
+    async def reject(self, websocket: WebSocket, retry_after_ms: int, code: int, reason: str):
+        """拒绝新连接：发送 reconnect 帧后以指定关闭码关闭（不查询数据库、不注册连接）"""
+        await websocket.accept()
+        try:
+            await self._send(websocket, self.reconnect_frame(retry_after_ms, reason))
+        finally:
+            await websocket.close(code=code)
+
+    async def reject_draining(self, websocket: WebSocket, window_ms: int):
+        """排空期间到达的新连接：按随机退避告知稍后重连"""
+        await self.reject(websocket, random.randint(0, max(window_ms, 0)), CLOSE_SERVICE_RESTART, "restart")
+
+    async def drain(self, window_ms: int, flush_timeout: float = 2.0):
+        """
+        排空全部连接
+
+        停止接受新连接，给每个客户端发送带随机退避时间的 reconnect 帧，
+        等待发送完成（每个连接最多 flush_timeout 秒）后以 1012 关闭，
+        使重连请求分散在 window_ms 内，而不是在同一时刻涌向新进程。
+        """
+        self.draining = True
+        connections = list(self.active_connections.items())
+        logger.info("排空 %d 个 WebSocket 连接（重连窗口 %dms）", len(connections), window_ms)
+
+        async def drain_one(websocket: WebSocket):
+            try:
+                frame = self.reconnect_frame(random.randint(0, max(window_ms, 0)), "restart")
+                await asyncio.wait_for(self._send(websocket, frame), flush_timeout)
+                await asyncio.wait_for(websocket.close(code=CLOSE_SERVICE_RESTART), flush_timeout)
+            except Exception:
+                # 连接已断开或发送超时，交给服务器关闭
+                pass
+
+        await asyncio.gather(*(drain_one(websocket) for _, websocket in connections))
 
     def is_online(self, user_id: str) -> bool:
         """检查用户是否在线"""
@@ -163,3 +258,34 @@ class ConnectionManager:
 
 # 全局连接管理器实例
 manager = ConnectionManager()
+
+WS_CONNECTIONS = registry.gauge("ws_connections", "当前进程持有的 WebSocket 连接数")
+registry.on_collect(lambda: WS_CONNECTIONS.set(len(manager.active_connections)))
+
+
+def install_drain_on_exit(window_ms: int):
+    """
+    收到退出信号（SIGTERM/SIGINT）时先排空连接，再交给 uvicorn 原有的退出流程
+
+    uvicorn 在执行 lifespan 关闭之前就会以 1012 直接断开所有 WebSocket，
+    因此排空必须在信号到达时进行。需在 lifespan 启动阶段（uvicorn 已注册信号处理后）调用。
+    再次收到信号时立即退出。
+    """
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def on_exit(sig=sig, previous=previous):
+            if manager.draining:
+                previous(sig, None)
+                return
+            task = loop.create_task(manager.drain(window_ms))
+            task.add_done_callback(lambda _: previous(sig, None))
+
+        try:
+            loop.add_signal_handler(sig, on_exit)
+        except (NotImplementedError, RuntimeError):
+            # Windows 或非主线程：保持原有退出行为
+            return
@@ -0,0 +1,84 @@
+"""
+WebSocket 流量录制
+
+WS_CAPTURE_DIR 非空时，websocket_endpoint 把每个连接的建立、收到的客户端帧、断开按行追加到
+{WS_CAPTURE_DIR}/ws-{主机名}-{pid}.log（每个进程一个文件，无需跨进程加锁），
+由 benchmarks/replay_ws.py 按原始时间间隔（或加速）回放到本地实例，复现线上流量形态。
+
+每行一个 JSON：
+    {"t": 1730812345.123, "u": "b1", "e": "c", "r": "buyer"}     连接（r 为角色）
+    {"t": 1730812345.456, "u": "b1", "e": "f", "d": {...}}       客户端帧
+    {"t": 1730812399.001, "u": "b1", "e": "d"}                   断开
+
+消息内容在写入前替换为等长的占位字符（保留长度用于复现帧大小，不落盘聊天内容）。
+写入先进入内存缓冲，满 256 行或距上次写盘超过 1 秒时追加到文件，进程退出时由 lifespan 调用 close() 写完剩余数据。
+"""
+from typing import List, Optional
+import os
+import socket
+import time
+import orjson
+from .config import settings
+
+FLUSH_LINES = 256
+FLUSH_SECONDS = 1.0
+
+
+class TrafficRecorder:
+    """按进程追加写入的 WebSocket 入站流量日志"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lines: List[bytes] = []
+        self._flushed_at = time.monotonic()
+        self._file = None
+        self.path: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def connected(self, user_id: str, role: str) -> None:
+        if self.enabled:
+            self._append({"t": round(time.time(), 3), "u": user_id, "e": "c", "r": role})
+
+    def frame(self, user_id: str, frame: dict) -> None:
+        if not self.enabled:
+            return
+        if isinstance(frame.get("content"), str):
+            frame = {**frame, "content": "x" * len(frame["content"])}
+        self._append({"t": round(time.time(), 3), "u": user_id, "e": "f", "d": frame})
+
+    def disconnected(self, user_id: str) -> None:
+        if self.enabled:
+            self._append({"t": round(time.time(), 3), "u": user_id, "e": "d"})
+
+    def _append(self, entry: dict) -> None:
+        self._lines.append(orjson.dumps(entry) + b"\n")
+        if len(self._lines) >= FLUSH_LINES or time.monotonic() - self._flushed_at >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        """把缓冲的行追加到文件（单次 write，小块追加写入页缓存，不会明显阻塞事件循环）"""
+        self._flushed_at = time.monotonic()
+        if not self._lines:
+            return
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f"ws-{socket.gethostname()}-{os.getpid()}.log")
+            self._file = open(self.path, "ab", buffering=0)
+        data = b"".join(self._lines)
+        self._lines.clear()
+        self._file.write(data)
+
+    def close(self) -> None:
+        if not self.enabled:
+            return
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# 全局流量录制（WS_CAPTURE_DIR 为空时所有方法直接返回）
+recorder = TrafficRecorder(settings.ws_capture_dir)
@@ -0,0 +1,119 @@
+"""
+热点查询语句开销基准
+
+对比 app.queries 中 lambda 语句与逐次构造的普通 select 语句的 Python 开销（µs/次）：
+    build    构造语句并生成缓存键（每次执行前 SQLAlchemy 查找编译缓存所需的工作）
+    execute  在内存 SQLite 上执行并取回结果（同步引擎，不含事件循环与网络开销，
+             只有一行数据，耗时主要是 Python 侧的语句处理与结果处理）
+
+两种写法都会命中引擎的编译缓存，差别在于普通语句每次都要重建语句树并遍历生成缓存键，
+lambda 语句只在首次调用时构造，之后只提取闭包参数。
+
+使用方法（在 backend 目录下运行，无需 .env）：
+    python -m benchmarks.bench_queries
+    python -m benchmarks.bench_queries --repeat 20000
+"""
+import argparse
+import time
+
+from sqlalchemy import case, create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app import queries
+from app.models import Base, User, UserRole, Conversation, Message
+
+
+def plain_conversation_by_id(conversation_id):
+    return select(Conversation).where(Conversation.id == conversation_id)
+
+
+def plain_message_stamp(conversation_id):
+    return select(
+        func.count(),
+        func.max(Message.id),
+        func.sum(case((Message.is_read == True, 1), else_=0)),
+    ).where(Message.conversation_id == conversation_id)
+
+
+def plain_conversation_version(conversation_id):
+    max_id = (
+        select(func.max(Message.id))
+        .where(Message.conversation_id == Conversation.id)
+        .scalar_subquery()
+    )
+    return (
+        select(max_id, Conversation.participant1_last_read_id, Conversation.participant2_last_read_id)
+        .where(Conversation.id == conversation_id)
+    )
+
+
+def plain_conversation_messages_page(conversation_id, ascending, offset, limit):
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if ascending:
+        query = query.order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+    return query.offset(offset).limit(limit)
+
+
+# (名称, 普通写法, lambda 写法, 参数, 结果处理)
+CASES = [
+    ("conversation_by_id", plain_conversation_by_id, queries.conversation_by_id, (1,), "scalar_one_or_none"),
+    ("message_stamp", plain_message_stamp, queries.message_stamp, (1,), "one"),
+    ("conversation_version", plain_conversation_version, queries.conversation_version, (1,), "one_or_none"),
+    ("conversation_messages_page", plain_conversation_messages_page, queries.conversation_messages_page, (1, False, 0, 50), "all"),
+]
+
+
+def prepare():
+    """内存 SQLite：一个会话，一条消息"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            User(id="bench_buyer", username="买家", role=UserRole.BUYER, status="active"),
+            User(id="bench_merchant", username="商家", role=UserRole.MERCHANT, status="active"),
+        ])
+        session.add(Conversation(id=1, participant1_id="bench_buyer", participant2_id="bench_merchant"))
+        session.add(Message(conversation_id=1, sender_id="bench_buyer", content="基准测试"))
+        session.commit()
+    return engine
+
+
+def timed(fn, repeat: int) -> float:
+    """每次调用的平均耗时（µs），先预热"""
+    for _ in range(min(repeat // 10, 1000)):
+        fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点查询语句开销基准")
+    parser.add_argument("--repeat", type=int, default=5000, help="每项的执行次数")
+    args = parser.parse_args()
+
+    engine = prepare()
+    print(f"{'查询':<28} {'阶段':<8} {'普通 µs':>10} {'lambda µs':>10} {'节省':>8}")
+    with Session(engine) as session:
+        for name, plain, cached, params, fetch in CASES:
+            def build(factory):
+                return lambda: factory(*params)._generate_cache_key()
+
+            def execute(factory):
+                # ORM 对象每次从 identity map 取回前先清空，避免只测到缓存对象
+                def run():
+                    getattr(session.execute(factory(*params)), fetch)()
+                    session.expunge_all()
+                return run
+
+            for stage, wrap in (("build", build), ("execute", execute)):
+                plain_us = timed(wrap(plain), args.repeat)
+                cached_us = timed(wrap(cached), args.repeat)
+                print(f"{name:<28} {stage:<8} {plain_us:>10.1f} {cached_us:>10.1f} {1 - cached_us / plain_us:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
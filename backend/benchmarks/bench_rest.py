@@ -0,0 +1,277 @@
+"""
+REST 热点接口基准（进程内 ASGI）
+
+在进程内启动 main:app（httpx ASGITransport，不经过网络和 uvicorn），连接本地 SQLite 库，
+按可配置规模写入用户、会话、消息后，对以下接口分别并发压测，统计吞吐与 p50/p99 延迟：
+    create_message                       POST /api/messages/
+    get_conversation_messages            GET  /api/conversations/{id}/messages
+    get_conversations                    GET  /api/conversations/?user_id=
+    mark_conversation_messages_as_read   PUT  /api/conversations/{id}/messages/read-all
+    ensure_users                         POST /api/users/ensure
+
+结果以 JSON 输出（含当前提交号与数据规模），可用 --compare 与另一次结果对比，
+用于衡量各提交对热点接口的影响。SQLite 与生产 MySQL 的绝对数值不可比，只比较相对变化。
+
+数据库文件按规模命名并保存在 --data-dir 中，相同规模再次运行时直接复用（写入百万级消息需要数十秒）。
+注意：create_message 等写接口会改变数据，对比结果时应使用同一规模的新库（--fresh）或接受少量偏差。
+
+使用方法（在 backend 目录下运行，先 pip install -r requirements-dev.txt）：
+    python -m benchmarks.bench_rest
+    python -m benchmarks.bench_rest --users 10000 --conversations 20000 --messages 1000000 --requests 2000 --concurrency 32
+    python -m benchmarks.bench_rest --output results/HEAD.json --compare results/base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="REST 热点接口基准（进程内 ASGI）")
+    parser.add_argument("--users", type=int, default=2000, help="用户数（其中 1/20 为商家）")
+    parser.add_argument("--conversations", type=int, default=5000, help="会话数")
+    parser.add_argument("--messages", type=int, default=200000, help="消息数")
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    parser.add_argument("--scenario", action="append", help="只运行指定场景（可重复）")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "live_chat_bench"), help="数据库文件目录")
+    parser.add_argument("--fresh", action="store_true", help="重新生成数据库")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    parser.add_argument("--output", help="结果 JSON 文件（默认只输出到标准输出）")
+    parser.add_argument("--compare", help="与之对比的历史结果 JSON 文件")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+# 必须在导入 app 之前指定数据库（.env 中的 DATABASE_URL 不会覆盖已有环境变量）
+os.makedirs(ARGS.data_dir, exist_ok=True)
+DB_PATH = os.path.join(ARGS.data_dir, f"bench_u{ARGS.users}_c{ARGS.conversations}_m{ARGS.messages}.db")
+if ARGS.fresh and os.path.exists(DB_PATH):
+    os.unlink(DB_PATH)
+SEEDED = os.path.exists(DB_PATH)
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ["SEED_ON_STARTUP"] = "False"
+
+import logging
+
+import httpx
+from sqlalchemy import event, insert
+
+from app.database import engine, engines, dispose_engines
+from app.models import Base, User, UserRole, Conversation, Message, MessageType
+from main import app
+
+# 错误只计入结果中的 errors，不逐条输出日志
+logging.disable(logging.ERROR)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL + 忙等待：并发写请求排队等待写锁，而不是立即报 database is locked"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+# 各命名连接池使用独立的引擎
+for _engine in engines.values():
+    event.listen(_engine.sync_engine, "connect", _sqlite_pragmas)
+
+# 写入数据时每批行数
+BATCH = 20000
+
+
+def user_ids(count: int):
+    """(买家ID列表, 商家ID列表)"""
+    merchants = max(count // 20, 1)
+    return [f"bench_b{i}" for i in range(count - merchants)], [f"bench_m{i}" for i in range(merchants)]
+
+
+async def seed(rng: random.Random):
+    """建表并按规模批量写入数据（Core insert，不经过 ORM）"""
+    buyers, merchants = user_ids(ARGS.users)
+    now = int(time.time())
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        rows = [{"id": uid, "username": uid, "role": UserRole.BUYER, "status": "active", "created_at": now} for uid in buyers]
+        rows += [{"id": uid, "username": uid, "role": UserRole.MERCHANT, "status": "active", "created_at": now} for uid in merchants]
+        for i in range(0, len(rows), BATCH):
+            await conn.execute(insert(User), rows[i:i + BATCH])
+
+        pairs = [(buyers[i % len(buyers)], merchants[i % len(merchants)]) for i in range(ARGS.conversations)]
+        rows = [
+            {
+                "participant1_id": buyer, "participant2_id": merchant,
+                "participant1_unread": 0, "participant2_unread": 0,
+                "last_message": "", "last_message_time": now, "created_at": now, "updated_at": now - i,
+            }
+            for i, (buyer, merchant) in enumerate(pairs)
+        ]
+        for i in range(0, len(rows), BATCH):
+            await conn.execute(insert(Conversation), rows[i:i + BATCH])
+
+        started = time.perf_counter()
+        for offset in range(0, ARGS.messages, BATCH):
+            rows = []
+            for i in range(offset, min(offset + BATCH, ARGS.messages)):
+                # 会话按幂律分布：少数会话有大量消息
+                cid = min(int(rng.paretovariate(1.2)), ARGS.conversations)
+                buyer, merchant = pairs[cid - 1]
+                rows.append({
+                    "conversation_id": cid,
+                    "sender_id": buyer if i % 2 else merchant,
+                    "content": f"基准消息 {i}",
+                    "message_type": MessageType.TEXT,
+                    "is_read": i % 3 != 0,
+                    "created_at": now - ARGS.messages + i,
+                })
+            await conn.execute(insert(Message), rows)
+        print(f"写入 {ARGS.messages} 条消息耗时 {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return pairs
+
+
+def scenarios(pairs, rng: random.Random):
+    """场景名 -> 生成单个请求参数的函数（method, url, json）"""
+    buyers, merchants = user_ids(ARGS.users)
+    counter = iter(range(10 ** 9))
+
+    def create_message():
+        cid = rng.randint(1, len(pairs))
+        return "POST", "/api/messages/", {"conversation_id": cid, "sender_id": pairs[cid - 1][0], "content": "基准新消息"}
+
+    def get_conversation_messages():
+        cid = min(int(rng.paretovariate(1.2)), len(pairs))
+        return "GET", f"/api/conversations/{cid}/messages?page=1&page_size=50", None
+
+    def get_conversations():
+        return "GET", f"/api/conversations/?user_id={rng.choice(merchants)}&page=1&page_size=20", None
+
+    def mark_conversation_messages_as_read():
+        cid = rng.randint(1, len(pairs))
+        return "PUT", f"/api/conversations/{cid}/messages/read-all?reader_id={pairs[cid - 1][1]}", None
+
+    def ensure_users():
+        # 每批 10 个：一半已存在，一半新建
+        n = next(counter)
+        users = [{"id": rng.choice(buyers), "role": "buyer"} for _ in range(5)]
+        users += [{"id": f"bench_new_{n}_{i}", "role": "buyer", "username": f"bench_new_{n}_{i}"} for i in range(5)]
+        return "POST", "/api/users/ensure", {"users": users}
+
+    return {
+        "create_message": create_message,
+        "get_conversation_messages": get_conversation_messages,
+        "get_conversations": get_conversations,
+        "mark_conversation_messages_as_read": mark_conversation_messages_as_read,
+        "ensure_users": ensure_users,
+    }
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    """并发执行 requests 个请求，返回吞吐与延迟统计"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, body = make_request()
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_table(results: dict, baseline: dict = None):
+    print(f"{'场景':<38}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'错误':>6}", file=sys.stderr)
+    for name, r in results.items():
+        line = f"{name:<38}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>6}"
+        base = (baseline or {}).get(name)
+        if base:
+            line += f"   rps {(r['throughput_rps'] / base['throughput_rps'] - 1) * 100:+.1f}%  p99 {(r['p99_ms'] / base['p99_ms'] - 1) * 100:+.1f}%"
+        print(line, file=sys.stderr)
+
+
+async def main_async() -> dict:
+    rng = random.Random(ARGS.seed)
+    if SEEDED:
+        buyers, merchants = user_ids(ARGS.users)
+        pairs = [(buyers[i % len(buyers)], merchants[i % len(merchants)]) for i in range(ARGS.conversations)]
+        print(f"复用数据库 {DB_PATH}", file=sys.stderr)
+    else:
+        pairs = await seed(rng)
+
+    selected = scenarios(pairs, rng)
+    if ARGS.scenario:
+        selected = {name: selected[name] for name in ARGS.scenario}
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in selected.items():
+            # 预热（建立连接池、填充缓存）
+            await run_scenario(client, make_request, min(ARGS.concurrency * 2, ARGS.requests), ARGS.concurrency)
+            results[name] = await run_scenario(client, make_request, ARGS.requests, ARGS.concurrency)
+    await dispose_engines()
+    return results
+
+
+def main():
+    results = asyncio.run(main_async())
+    report = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "database": "sqlite",
+        "scale": {"users": ARGS.users, "conversations": ARGS.conversations, "messages": ARGS.messages},
+        "results": results,
+    }
+    baseline = None
+    if ARGS.compare:
+        with open(ARGS.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    if ARGS.output:
+        os.makedirs(os.path.dirname(os.path.abspath(ARGS.output)), exist_ok=True)
+        with open(ARGS.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    print(data)
+
+
+if __name__ == "__main__":
+    main()
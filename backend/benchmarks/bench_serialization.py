@@ -0,0 +1,96 @@
+"""
+序列化性能基准
+
+对比消息分页响应的三种序列化方式（rows/sec）：
+    1. pydantic：PaginatedResponse[MessageResponse] + 标准 json（原实现）
+    2. fast：serializers.message_page + orjson（内嵌 sender）
+    3. fast+senders：serializers.message_page(senders=True) + orjson（发送者边表）
+
+使用方法（在 backend 目录下运行，需要 .env 中的 BASE_URL）：
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rows 50 --senders 2 --repeat 2000
+"""
+import argparse
+import json
+import time
+
+import orjson
+
+from app.models import User, Message, UserRole, MessageType
+from app.schemas import PaginatedResponse, MessageResponse
+from app.serializers import message_page
+
+
+def build_page(rows: int, sender_count: int):
+    """构造一页内存中的消息（不访问数据库）"""
+    users = [
+        User(
+            id=f"u{i}",
+            username=f"用户{i}",
+            avatar=f"/api/media/avatars/generated/u{i}.png",
+            role=UserRole.BUYER if i % 2 else UserRole.MERCHANT,
+            description="基准测试用户",
+            status="active",
+            created_at=1700000000,
+        )
+        for i in range(sender_count)
+    ]
+    messages = []
+    for i in range(rows):
+        sender = users[i % sender_count]
+        message_type = MessageType.IMAGE if i % 10 == 0 else MessageType.TEXT
+        messages.append(Message(
+            id=i + 1,
+            conversation_id=1,
+            sender_id=sender.id,
+            sender=sender,
+            content="/api/media/uploads/2025/01/01/a.png" if message_type == MessageType.IMAGE else f"消息内容 {i}",
+            message_type=message_type,
+            is_read=bool(i % 3),
+            created_at=1700000000 + i,
+        ))
+    return messages
+
+
+def serialize_pydantic(messages):
+    page = PaginatedResponse[MessageResponse](count=len(messages), results=messages)
+    return json.dumps(page.model_dump(mode="json"), ensure_ascii=False).encode("utf-8")
+
+
+def serialize_fast(messages):
+    return orjson.dumps(message_page(len(messages), messages))
+
+
+def serialize_fast_senders(messages):
+    return orjson.dumps(message_page(len(messages), messages, senders=True))
+
+
+def run(name, func, messages, repeat):
+    """执行基准并打印 rows/sec 与响应体大小"""
+    func(messages)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = func(messages)
+    elapsed = time.perf_counter() - start
+    rows_per_sec = len(messages) * repeat / elapsed
+    print(f"{name:<16} {rows_per_sec:>14,.0f} rows/sec  {elapsed / repeat * 1e6:>10.1f} us/page  {len(body):>8} bytes/page")
+    return rows_per_sec
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消息分页序列化基准")
+    parser.add_argument("--rows", type=int, default=50, help="每页消息数")
+    parser.add_argument("--senders", type=int, default=2, help="每页不同发送者数量")
+    parser.add_argument("--repeat", type=int, default=1000, help="重复次数")
+    args = parser.parse_args()
+
+    messages = build_page(args.rows, args.senders)
+    print(f"rows={args.rows} senders={args.senders} repeat={args.repeat}")
+    baseline = run("pydantic", serialize_pydantic, messages, args.repeat)
+    fast = run("fast", serialize_fast, messages, args.repeat)
+    fast_senders = run("fast+senders", serialize_fast_senders, messages, args.repeat)
+    print(f"speedup: fast x{fast / baseline:.1f}, fast+senders x{fast_senders / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+登录洪峰压测
+
+在登录洪峰期间持续测量 WebSocket 往返延迟，验证 bcrypt 不再阻塞事件循环：
+    1. b1、m1 两个用户建立 WebSocket，b1 周期性发送 typing，测量 m1 收到的延迟
+    2. 先空闲测量 --idle 秒作为基线
+    3. 并发发起 --logins 次管理员登录（bcrypt 校验），期间继续测量
+    4. 输出两个阶段的延迟分位数及登录状态码分布
+
+使用方法（先启动服务，依赖 initialize_data 写入的 b1 / m1 / admin 测试数据）：
+    pip install -r requirements-dev.txt
+    python -m benchmarks.load_login_burst --url http://localhost:11075
+    python -m benchmarks.load_login_burst --logins 200 --concurrency 50
+
+对比：以 PASSWORD_HASH_WORKERS=0（事件循环内直接计算）启动服务再运行一次，
+burst 阶段的延迟会随登录数线性上升。
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+
+import httpx
+import websockets
+
+
+def percentile(values, p):
+    """计算分位数（values 需已排序）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def report(name, samples):
+    """打印延迟分位数（毫秒）"""
+    values = sorted(samples)
+    if not values:
+        print(f"{name:<6} 无样本")
+        return
+    print(
+        f"{name:<6} n={len(values):<5} "
+        f"p50={percentile(values, 50):7.2f}ms  p95={percentile(values, 95):7.2f}ms  "
+        f"p99={percentile(values, 99):7.2f}ms  max={values[-1]:7.2f}ms  mean={statistics.mean(values):7.2f}ms"
+    )
+
+
+async def find_conversation(client: httpx.AsyncClient, buyer_id: str, merchant_id: str) -> int:
+    """查找（必要时创建）买家与商户之间的会话"""
+    for attempt in range(2):
+        response = await client.get("/api/conversations/", params={"user_id": buyer_id, "page_size": 100})
+        response.raise_for_status()
+        for conversation in response.json()["results"]:
+            if {conversation["participant1_id"], conversation["participant2_id"]} == {buyer_id, merchant_id}:
+                return conversation["id"]
+        if attempt == 0:
+            await client.post("/api/conversations/", json={"participant1_id": buyer_id, "participant2_id": merchant_id})
+    raise RuntimeError(f"无法创建会话 {buyer_id} <-> {merchant_id}")
+
+
+async def probe(ws_url, conversation_id, buyer_id, merchant_id, interval, phase, samples, stop):
+    """周期性发送 typing 并记录对端收到的延迟"""
+    async with websockets.connect(f"{ws_url}/api/ws/{buyer_id}") as sender, \
+            websockets.connect(f"{ws_url}/api/ws/{merchant_id}") as receiver:
+        frame = json.dumps({"type": "typing", "conversation_id": conversation_id, "is_typing": True})
+        while not stop.is_set():
+            started = time.perf_counter()
+            await sender.send(frame)
+            while True:
+                data = json.loads(await receiver.recv())
+                if data.get("type") == "typing" and data.get("user_id") == buyer_id:
+                    break
+            samples[phase[0]].append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(interval)
+
+
+async def login_burst(client: httpx.AsyncClient, total, concurrency, username, password):
+    """并发发起登录请求，返回状态码分布和耗时"""
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+
+    async def login():
+        async with semaphore:
+            response = await client.post("/api/auth/login", json={"username": username, "password": password})
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(total)))
+    return statuses, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="登录洪峰期间的 WebSocket 延迟压测")
+    parser.add_argument("--url", default="http://localhost:11075", help="服务地址")
+    parser.add_argument("--logins", type=int, default=200, help="登录请求总数")
+    parser.add_argument("--concurrency", type=int, default=50, help="登录并发数")
+    parser.add_argument("--idle", type=float, default=3.0, help="基线测量秒数")
+    parser.add_argument("--interval", type=float, default=0.02, help="typing 探测间隔（秒）")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--buyer", default="b1")
+    parser.add_argument("--merchant", default="m1")
+    args = parser.parse_args()
+
+    ws_url = args.url.replace("http://", "ws://").replace("https://", "wss://")
+    samples = {"idle": [], "burst": []}
+    phase = ["idle"]
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        conversation_id = await find_conversation(client, args.buyer, args.merchant)
+        probe_task = asyncio.create_task(
+            probe(ws_url, conversation_id, args.buyer, args.merchant, args.interval, phase, samples, stop)
+        )
+        await asyncio.sleep(args.idle)
+
+        phase[0] = "burst"
+        statuses, elapsed = await login_burst(client, args.logins, args.concurrency, args.username, args.password)
+
+        stop.set()
+        await probe_task
+
+    print(f"logins={args.logins} concurrency={args.concurrency} elapsed={elapsed:.2f}s "
+          f"({args.logins / elapsed:.1f} logins/sec) statuses={dict(statuses)}")
+    report("idle", samples["idle"])
+    report("burst", samples["burst"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
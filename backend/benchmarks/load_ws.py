@@ -0,0 +1,352 @@
+"""
+WebSocket 负载生成与扇出基准
+
+回答"单个 worker 能承载多少并发连接、每秒多少条消息"：
+    1. 通过 /api/users/ensure 创建模拟买家、商家、管理员，为每个买家准备一个与商家的会话
+    2. 按 --steps 逐级增加连接数 N（已建立的连接保留），每一级：
+       - 记录新增连接的建连速率与被拒绝（overloaded / draining）的连接数
+       - 读取服务进程 RSS（--pid，可重复），换算每连接内存
+       - 买家与商家按 --rate（每客户端每秒帧数）和 --mix 比例发送 message / typing / read 帧，
+         持续 --duration 秒，统计端到端投递延迟：
+             message  对端收到消息（内容中携带发送时间）
+             admin    管理员收到同一条消息的镜像
+             typing   对端收到输入状态
+             read     收到会话摘要更新（conversation_update）
+       - 抓取 /api/metrics 中 ws_fanout_duration_seconds 的增量，得到 status（上线广播）、message、
+         conversation_update 等扇出的平均耗时，观察其随 N 增长的趋势
+
+客户端与服务在同一台机器上时，压测进程本身也会占用 CPU，建连和延迟数值偏保守；
+大规模连接需要提高文件描述符上限（ulimit -n）。生产环境网关（WS_EVENT_SOCKET 非空）时
+--url 指向网关端口，--api-url 指向 REST 服务；单 worker 运行服务才能得到单 worker 的承载能力。
+
+使用方法（先启动服务）：
+    python -m benchmarks.load_ws --url http://localhost:11075 --steps 100,500,1000 --pid $(pgrep -f "uvicorn main:app")
+    python -m benchmarks.load_ws --url http://localhost:11076 --api-url http://localhost:11075 --admins 5 --rate 1 --mix message=0.5,typing=0.4,read=0.1
+    python -m benchmarks.load_ws --steps 200 --duration 30 --output load_ws.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+
+import httpx
+import websockets
+
+PREFIX = "load"
+
+
+def percentile(values, p):
+    """计算分位数（values 需已排序）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def read_rss(pids) -> int:
+    """服务进程常驻内存合计（字节），未指定进程时返回 0"""
+    total = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+    return total
+
+
+_METRIC_LINE = re.compile(r'^ws_fanout_duration_seconds_(sum|count)\{([^}]*)\} (\S+)$')
+
+
+async def scrape_fanout(client: httpx.AsyncClient) -> dict:
+    """{扇出类型: [累计秒数, 次数]}（各 worker 合计）"""
+    response = await client.get("/api/metrics")
+    response.raise_for_status()
+    totals = defaultdict(lambda: [0.0, 0])
+    for line in response.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if not match:
+            continue
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2)))
+        value = float(match.group(3))
+        if match.group(1) == "sum":
+            totals[labels["type"]][0] += value
+        else:
+            totals[labels["type"]][1] += int(value)
+    return totals
+
+
+class Stats:
+    """一级压测的统计"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.sent = 0
+        self.received = 0
+        self.rejected = 0
+        # 尚未收到回执的 typing / read：键 -> 发送时间
+        self.pending = {}
+
+
+class Client:
+    """一个模拟用户：一条 WebSocket 连接 + 接收任务"""
+
+    def __init__(self, user_id: str, role: str, conversations):
+        self.user_id = user_id
+        self.role = role
+        self.conversations = conversations
+        self.ws = None
+        self.reader = None
+        # 当前一级的统计（每级开始时替换）
+        self.stats = None
+
+    async def connect(self, ws_url: str):
+        self.ws = await websockets.connect(f"{ws_url}/api/ws/{self.user_id}", max_size=None, open_timeout=60)
+        self.reader = asyncio.create_task(self.read())
+
+    async def read(self):
+        try:
+            async for raw in self.ws:
+                now = time.perf_counter_ns()
+                frame = json.loads(raw)
+                stats = self.stats
+                stats.received += 1
+                kind = frame.get("type")
+                if kind == "message" and frame.get("content", "").startswith(PREFIX):
+                    sent_ns = int(frame["content"].split()[1])
+                    bucket = "admin" if self.role == "admin" else "message"
+                    stats.latencies[bucket].append((now - sent_ns) / 1e6)
+                elif kind == "typing":
+                    sent_ns = stats.pending.pop(("typing", frame["conversation_id"], frame["user_id"]), None)
+                    if sent_ns is not None:
+                        stats.latencies["typing"].append((now - sent_ns) / 1e6)
+                elif kind == "conversation_update":
+                    sent_ns = stats.pending.pop(("read", frame["conversation_id"]), None)
+                    if sent_ns is not None:
+                        stats.latencies["read"].append((now - sent_ns) / 1e6)
+                elif kind == "reconnect":
+                    stats.rejected += 1
+                    return
+        except websockets.ConnectionClosed:
+            pass
+
+    async def drive(self, rate: float, mix, deadline: float, rng: random.Random):
+        """按泊松过程发送帧直到 deadline"""
+        kinds, weights = zip(*mix)
+        stats = self.stats
+        while True:
+            await asyncio.sleep(rng.expovariate(rate))
+            if time.monotonic() >= deadline or self.ws.state is not websockets.State.OPEN:
+                return
+            conversation_id = rng.choice(self.conversations)
+            kind = rng.choices(kinds, weights)[0]
+            now = time.perf_counter_ns()
+            if kind == "message":
+                frame = {"type": "message", "conversation_id": conversation_id, "content": f"{PREFIX} {now}"}
+            elif kind == "typing":
+                stats.pending[("typing", conversation_id, self.user_id)] = now
+                frame = {"type": "typing", "conversation_id": conversation_id, "is_typing": True}
+            else:
+                stats.pending[("read", conversation_id)] = now
+                frame = {"type": "read", "conversation_id": conversation_id}
+            try:
+                await self.ws.send(json.dumps(frame))
+            except websockets.ConnectionClosed:
+                return
+            stats.sent += 1
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await self.reader
+
+
+async def prepare(client: httpx.AsyncClient, buyers: int, merchants: int, admins: int):
+    """创建用户与会话，返回 (买家, 商家, 管理员) Client 列表"""
+    users = [{"id": f"{PREFIX}_b{i}", "role": "buyer", "username": f"{PREFIX}_b{i}"} for i in range(buyers)]
+    users += [{"id": f"{PREFIX}_m{i}", "role": "merchant", "username": f"{PREFIX}_m{i}"} for i in range(merchants)]
+    users += [{"id": f"{PREFIX}_a{i}", "role": "admin", "username": f"{PREFIX}_a{i}"} for i in range(admins)]
+    for i in range(0, len(users), 100):
+        response = await client.post("/api/users/ensure", json={"users": users[i:i + 100]})
+        response.raise_for_status()
+
+    semaphore = asyncio.Semaphore(20)
+    pairs = {}
+
+    async def find_conversation(buyer_id: str, merchant_id: str):
+        """查找（必要时创建）买家与商家之间的会话"""
+        async with semaphore:
+            for attempt in range(2):
+                response = await client.get("/api/conversations/", params={"user_id": buyer_id, "page_size": 100})
+                response.raise_for_status()
+                for conversation in response.json()["results"]:
+                    if {conversation["participant1_id"], conversation["participant2_id"]} == {buyer_id, merchant_id}:
+                        pairs[buyer_id] = (merchant_id, conversation["id"])
+                        return
+                if attempt == 0:
+                    await client.post("/api/conversations/", json={"participant1_id": buyer_id, "participant2_id": merchant_id})
+            raise RuntimeError(f"无法创建会话 {buyer_id} <-> {merchant_id}")
+
+    await asyncio.gather(*(
+        find_conversation(f"{PREFIX}_b{i}", f"{PREFIX}_m{i % merchants}") for i in range(buyers)
+    ))
+
+    merchant_conversations = defaultdict(list)
+    buyer_clients = []
+    for i in range(buyers):
+        merchant_id, conversation_id = pairs[f"{PREFIX}_b{i}"]
+        merchant_conversations[merchant_id].append(conversation_id)
+        buyer_clients.append(Client(f"{PREFIX}_b{i}", "buyer", [conversation_id]))
+    merchant_clients = [
+        Client(f"{PREFIX}_m{i}", "merchant", merchant_conversations[f"{PREFIX}_m{i}"]) for i in range(merchants)
+    ]
+    admin_clients = [Client(f"{PREFIX}_a{i}", "admin", []) for i in range(admins)]
+    return buyer_clients, merchant_clients, admin_clients
+
+
+async def connect_all(clients, ws_url: str, concurrency: int) -> float:
+    """并发建立连接，返回耗时（秒）"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect(c: Client):
+        async with semaphore:
+            await c.connect(ws_url)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connect(c) for c in clients))
+    return time.perf_counter() - started
+
+
+def summarize(stats: Stats) -> dict:
+    result = {}
+    for kind in ("message", "admin", "typing", "read"):
+        values = sorted(stats.latencies[kind])
+        result[kind] = {
+            "n": len(values),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+    return result
+
+
+def fanout_delta(before: dict, after: dict) -> dict:
+    """两次抓取之间各扇出类型的平均耗时（毫秒）与次数"""
+    result = {}
+    for kind, (seconds, count) in after.items():
+        prev_seconds, prev_count = before.get(kind, (0.0, 0))
+        n = count - prev_count
+        if n > 0:
+            result[kind] = {"n": n, "mean_ms": round((seconds - prev_seconds) / n * 1000, 3)}
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket 负载生成与扇出基准")
+    parser.add_argument("--url", default="http://localhost:11075", help="WebSocket 服务地址（网关或开发服务）")
+    parser.add_argument("--api-url", help="REST 服务地址（默认同 --url）")
+    parser.add_argument("--steps", default="100,500,1000", help="逐级连接数（买家+商家，逗号分隔）")
+    parser.add_argument("--merchant-ratio", type=float, default=0.1, help="商家占比")
+    parser.add_argument("--admins", type=int, default=2, help="管理员连接数（接收全部消息镜像）")
+    parser.add_argument("--rate", type=float, default=0.5, help="每个客户端每秒发送帧数")
+    parser.add_argument("--mix", default="message=0.6,typing=0.3,read=0.1", help="帧类型比例")
+    parser.add_argument("--duration", type=float, default=10.0, help="每级发送持续秒数")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="并发建连数")
+    parser.add_argument("--pid", type=int, action="append", default=[], help="服务进程 PID（可重复），用于统计内存")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    args = parser.parse_args()
+
+    steps = sorted(int(n) for n in args.steps.split(","))
+    mix = [(kind, float(weight)) for kind, weight in (item.split("=") for item in args.mix.split(","))]
+    ws_url = args.url.replace("http://", "ws://").replace("https://", "wss://")
+    rng = random.Random(args.seed)
+
+    total = steps[-1]
+    merchants = max(int(total * args.merchant_ratio), 1)
+    async with httpx.AsyncClient(base_url=args.api_url or args.url, timeout=60) as client:
+        buyers, merchant_clients, admins = await prepare(client, total - merchants, merchants, args.admins)
+        # 按比例交错，使每一级都同时包含买家和商家
+        ordered = sorted(
+            buyers + merchant_clients,
+            key=lambda c: int(c.user_id.rsplit("_", 1)[1][1:]) / (len(merchant_clients) if c.role == "merchant" else len(buyers)),
+        )
+
+        baseline_rss = read_rss(args.pid)
+        connected = []
+        results = []
+        for c in admins:
+            c.stats = Stats()
+        await connect_all(admins, ws_url, args.connect_concurrency)
+
+        for n in steps:
+            stats = Stats()
+            batch = ordered[len(connected):n]
+            for c in admins + connected + batch:
+                c.stats = stats
+
+            fanout_before = await scrape_fanout(client)
+            elapsed = await connect_all(batch, ws_url, args.connect_concurrency)
+            connected.extend(batch)
+            await asyncio.sleep(1)
+            fanout_connect = await scrape_fanout(client)
+            rss = read_rss(args.pid)
+
+            deadline = time.monotonic() + args.duration
+            await asyncio.gather(*(c.drive(args.rate, mix, deadline, rng) for c in connected))
+            await asyncio.sleep(1)
+            fanout_after = await scrape_fanout(client)
+
+            row = {
+                "connections": n + len(admins),
+                "connect_rate": round(len(batch) / elapsed, 1) if batch else None,
+                "rejected": stats.rejected,
+                "rss_mb": round(rss / 2 ** 20, 1) if rss else None,
+                "rss_kb_per_connection": round((rss - baseline_rss) / 1024 / len(connected), 1) if rss else None,
+                "frames_sent": stats.sent,
+                "frames_received": stats.received,
+                "sent_per_sec": round(stats.sent / args.duration, 1),
+                "latency": summarize(stats),
+                "fanout_connect": fanout_delta(fanout_before, fanout_connect),
+                "fanout_traffic": fanout_delta(fanout_connect, fanout_after),
+            }
+            results.append(row)
+
+            latency = row["latency"]
+            status = row["fanout_connect"].get("status", {})
+            print(
+                f"N={row['connections']:<6} connect={row['connect_rate'] or 0:>7.1f}/s rejected={row['rejected']:<4} "
+                f"rss={row['rss_mb'] or '-'}MB ({row['rss_kb_per_connection'] or '-'}KB/conn) "
+                f"sent={row['sent_per_sec']}/s recv={stats.received}"
+            )
+            for kind in ("message", "admin", "typing", "read"):
+                print(
+                    f"    {kind:<8} n={latency[kind]['n']:<6} p50={latency[kind]['p50_ms']:8.2f}ms "
+                    f"p99={latency[kind]['p99_ms']:8.2f}ms max={latency[kind]['max_ms']:8.2f}ms"
+                )
+            fanout = {**row["fanout_traffic"], "status": status}
+            print("    fanout  " + "  ".join(f"{k}={v['mean_ms']:.3f}ms×{v['n']}" for k, v in sorted(fanout.items()) if v))
+
+        await asyncio.gather(*(c.close() for c in connected + admins))
+
+    if args.output:
+        report = {
+            "url": args.url,
+            "timestamp": int(time.time()),
+            "rate": args.rate,
+            "mix": dict(mix),
+            "duration": args.duration,
+            "admins": args.admins,
+            "steps": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
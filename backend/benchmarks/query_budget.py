@@ -0,0 +1,147 @@
+"""
+接口 SQL 条数预算检查
+
+在临时 SQLite 库中写入一组会话/消息数据，逐个请求主要接口（进程内 ASGI，不经过网络），
+统计每个请求执行的 SQL 条数。超过 BUDGETS 中的上限时列出全部语句并以非 0 退出码结束，
+可放在 CI 中防止新增 selectinload 遗漏、循环内查询（N+1）、多余的 refresh / 重新查询。
+
+缓存（认证主体、用户目录、最近消息、快捷回复）在每个请求前清空，BUDGETS 按冷缓存计算；
+WARM_BUDGETS 先预热一次再统计，检查缓存命中时不访问数据库（如认证为 0 条 SQL）。
+接口改动导致 SQL 条数变化时，确认合理后同步修改 BUDGETS。
+
+使用方法（在 backend 目录下运行，先 pip install -r requirements-dev.txt）：
+    python -m benchmarks.query_budget
+    python -m benchmarks.query_budget --senders 20 --messages 200 -v
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+# 使用临时库（必须在导入 app 之前设置，.env 中的 DATABASE_URL 不会覆盖已有环境变量）
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="query_budget_"), "budget.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+
+import httpx
+
+from app.auth import create_access_token, principal_cache
+from app.database import engine, async_session_maker, dispose_engines
+from app.hot_messages import hot_messages
+from app.models import Base, User, UserRole, Conversation, Message
+from app.quick_reply_cache import quick_reply_cache
+from app.query_counter import count_queries
+from app.user_directory import user_directory
+from main import app
+
+# (名称, 方法, 路径, 请求体, SQL 条数上限)；路径中的 {cid} / {buyer} / {merchant} 运行时替换
+BUDGETS = [
+    ("认证用户信息", "GET", "/api/auth/me", None, 1),
+    ("用户列表", "GET", "/api/users/?page_size=50", None, 2),
+    ("会话列表", "GET", "/api/conversations/?user_id={merchant}", None, 4),
+    ("会话详情", "GET", "/api/conversations/{cid}", None, 3),
+    ("会话消息", "GET", "/api/conversations/{cid}/messages?page_size=50", None, 4),
+    ("会话消息（发送者边表）", "GET", "/api/conversations/{cid}/messages?page_size=50&senders=true", None, 4),
+    ("消息列表", "GET", "/api/messages/?conversation_id={cid}&page_size=50", None, 3),
+    ("增量同步", "GET", "/api/sync?user_id={merchant}", None, 5),
+    ("快捷回复", "GET", "/api/quick-replies/merchant/{merchant}", None, 1),
+    ("发送消息", "POST", "/api/messages/", {"conversation_id": "{cid}", "sender_id": "{buyer}", "content": "预算检查"}, 5),
+    ("会话已读", "PUT", "/api/conversations/{cid}/read?user_id={merchant}", None, 2),
+]
+
+# 缓存命中时的预算（先请求一次预热，再统计第二次请求）
+WARM_BUDGETS = [
+    ("认证用户信息（缓存命中）", "GET", "/api/auth/me", None, 0),
+    ("快捷回复（缓存命中）", "GET", "/api/quick-replies/merchant/{merchant}", None, 0),
+]
+
+
+async def prepare(senders: int, messages: int) -> dict:
+    """建表并写入测试数据：一个商家与 senders 个买家各一个会话，第一个会话写入 messages 条消息"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with async_session_maker() as db:
+        db.add(User(id="budget_admin", username="预算管理员", role=UserRole.ADMIN, status="active"))
+        db.add(User(id="budget_merchant", username="预算商家", role=UserRole.MERCHANT, status="active"))
+        buyers = [f"budget_buyer_{i}" for i in range(senders)]
+        for buyer in buyers:
+            db.add(User(id=buyer, username=buyer, role=UserRole.BUYER, status="active"))
+        await db.flush()
+
+        conversations = []
+        for buyer in buyers:
+            conversation = Conversation(participant1_id=buyer, participant2_id="budget_merchant")
+            db.add(conversation)
+            conversations.append(conversation)
+        await db.flush()
+
+        first = conversations[0]
+        for i in range(messages):
+            sender = "budget_merchant" if i % 2 else buyers[i % len(buyers)]
+            db.add(Message(conversation_id=first.id, sender_id=sender, content=f"消息 {i}"))
+        await db.commit()
+
+    return {"cid": str(first.id), "buyer": buyers[0], "merchant": "budget_merchant"}
+
+
+def _fill(value, params: dict):
+    if isinstance(value, str):
+        value = value.format(**params)
+        return int(value) if value.isdigit() else value
+    if isinstance(value, dict):
+        return {key: _fill(item, params) for key, item in value.items()}
+    return value
+
+
+async def check(params: dict, verbose: bool) -> int:
+    """逐个请求接口，返回超出预算的接口数"""
+    token = create_access_token({"user_id": "budget_admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+    failures = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+        for warm, (name, method, path, body, budget) in [(False, b) for b in BUDGETS] + [(True, b) for b in WARM_BUDGETS]:
+            principal_cache.clear()
+            user_directory.clear()
+            hot_messages.clear()
+            quick_reply_cache.clear()
+            if warm:
+                await client.request(method, _fill(path, params), json=_fill(body, params), headers=headers)
+            with count_queries() as stats:
+                response = await client.request(method, _fill(path, params), json=_fill(body, params), headers=headers)
+            ok = response.status_code < 400 and stats.count <= budget
+            status = "OK  " if ok else "FAIL"
+            print(f"{status} {name:<24} {stats.count:>3} / {budget:<3} SQL  {stats.seconds * 1000:>7.1f}ms  HTTP {response.status_code}")
+            if not ok:
+                failures += 1
+            if not ok or verbose:
+                for statement, n in stats.statements.most_common():
+                    print(f"       {n} x {' '.join(statement.split())[:160]}")
+    return failures
+
+
+async def main_async(args) -> int:
+    params = await prepare(args.senders, args.messages)
+    try:
+        return await check(params, args.verbose)
+    finally:
+        await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口 SQL 条数预算检查")
+    parser.add_argument("--senders", type=int, default=10, help="买家（会话）数量")
+    parser.add_argument("--messages", type=int, default=50, help="第一个会话的消息数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="列出每个接口执行的语句")
+    args = parser.parse_args()
+
+    failures = asyncio.run(main_async(args))
+    if failures:
+        print(f"\n{failures} 个接口超出 SQL 预算")
+        sys.exit(1)
+    print("\n全部接口在 SQL 预算内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+WebSocket 流量回放
+
+把 WS_CAPTURE_DIR 录制的日志（app/ws_capture.py）按原始时间间隔回放到本地实例，
+用真实的连接/帧时序对比 ConnectionManager 等改动前后的表现：
+    1. 读取全部日志文件，按时间戳合并（每个进程一个文件）
+    2. 通过 /api/users/ensure 创建出现过的用户（角色取自连接记录）
+    3. 按帧中出现的发送者为每个会话在本地创建对应会话并替换 conversation_id
+       （只有一方发过帧的会话由 replay_peer_{会话ID} 商家补齐；--no-remap 时保留原 ID，用于回放到线上库副本）
+    4. 按 --speed 倍速回放连接、帧、断开（每个用户一个有序队列，慢连接不阻塞其他用户），
+       消息内容替换为带发送时间的等长文本，统计：
+           lag      实际发送时间落后于计划时间（回放端或服务端跟不上时增大）
+           message  对端/管理员收到消息的延迟
+           typing   对端收到输入状态的延迟
+           read     收到会话摘要更新（conversation_update）的延迟
+       以及回放期间 /api/metrics 中各类扇出的平均耗时
+
+使用方法（先启动服务）：
+    python -m benchmarks.replay_ws /var/log/live_chat/ws-capture/*.log --url http://localhost:11075
+    python -m benchmarks.replay_ws capture/*.log --speed 10 --output replay.json
+    python -m benchmarks.replay_ws capture/*.log --speed 0 --limit 100000        # 不等待，尽快发送
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import websockets
+
+from benchmarks.load_ws import percentile, scrape_fanout, fanout_delta
+
+MARKER = "replay"
+
+
+def load_events(paths, limit: int):
+    """按时间戳合并多个日志文件的事件"""
+    def read(path):
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    events = []
+    for entry in heapq.merge(*(read(p) for p in paths), key=lambda e: e["t"]):
+        events.append(entry)
+        if limit and len(events) >= limit:
+            break
+    return events
+
+
+def plan_setup(events):
+    """(用户角色, 会话参与者) —— 角色取自连接记录，参与者取自帧的发送者"""
+    roles = {}
+    senders = defaultdict(list)
+    for entry in events:
+        if entry["e"] == "c":
+            roles[entry["u"]] = entry["r"]
+        elif entry["e"] == "f":
+            roles.setdefault(entry["u"], "buyer")
+            cid = entry["d"].get("conversation_id")
+            if cid is not None and entry["u"] not in senders[cid] and len(senders[cid]) < 2:
+                senders[cid].append(entry["u"])
+    return roles, senders
+
+
+async def prepare(client: httpx.AsyncClient, roles: dict, senders: dict, remap: bool) -> dict:
+    """创建用户与会话，返回 {原会话ID: 本地会话ID}"""
+    users = dict(roles)
+    if remap:
+        for cid, participants in senders.items():
+            if len(participants) == 1:
+                users[f"replay_peer_{cid}"] = "merchant"
+    items = [{"id": uid, "role": role, "username": uid} for uid, role in users.items()]
+    for i in range(0, len(items), 100):
+        response = await client.post("/api/users/ensure", json={"users": items[i:i + 100]})
+        response.raise_for_status()
+
+    if not remap:
+        return {}
+    mapping = {}
+    semaphore = asyncio.Semaphore(20)
+
+    async def create(cid, participants):
+        first = participants[0]
+        second = participants[1] if len(participants) > 1 else f"replay_peer_{cid}"
+        async with semaphore:
+            response = await client.post("/api/conversations/", json={"participant1_id": first, "participant2_id": second})
+            response.raise_for_status()
+            mapping[cid] = response.json()["id"]
+
+    await asyncio.gather(*(create(cid, participants) for cid, participants in senders.items()))
+    return mapping
+
+
+class Replayer:
+    def __init__(self, ws_url: str, mapping: dict):
+        self.ws_url = ws_url
+        self.mapping = mapping
+        self.queues = {}
+        self.workers = []
+        self.lags = []
+        self.latencies = defaultdict(list)
+        self.pending = {}
+        self.sent = Counter()
+        self.connects = 0
+        self.failed = 0
+
+    def schedule(self, entry, due: float):
+        """把事件放入该用户的有序队列（不等待执行）"""
+        queue = self.queues.get(entry["u"])
+        if queue is None:
+            queue = self.queues[entry["u"]] = asyncio.Queue()
+            self.workers.append(asyncio.create_task(self.run_user(entry["u"], queue)))
+        queue.put_nowait((entry, due))
+
+    async def run_user(self, user_id: str, queue: asyncio.Queue):
+        ws = None
+        reader = None
+        while True:
+            entry, due = await queue.get()
+            if entry is None:
+                break
+            kind = entry["e"]
+            if kind == "d" or (kind == "c" and ws is not None):
+                if ws is not None:
+                    await ws.close()
+                    await reader
+                    ws = None
+                if kind == "d":
+                    continue
+            if ws is None:
+                try:
+                    ws = await websockets.connect(f"{self.ws_url}/api/ws/{user_id}", max_size=None, open_timeout=60)
+                except (OSError, websockets.InvalidHandshake):
+                    self.failed += 1
+                    continue
+                self.connects += 1
+                reader = asyncio.create_task(self.read(ws))
+            if kind == "f":
+                self.lags.append((time.monotonic() - due) * 1000)
+                frame = self.rewrite(user_id, entry["d"])
+                try:
+                    await ws.send(json.dumps(frame))
+                except websockets.ConnectionClosed:
+                    ws = None
+                    continue
+                self.sent[frame.get("type")] += 1
+        if ws is not None:
+            await ws.close()
+            await reader
+
+    def rewrite(self, user_id: str, frame: dict) -> dict:
+        frame = dict(frame)
+        cid = frame.get("conversation_id")
+        if cid in self.mapping:
+            frame["conversation_id"] = cid = self.mapping[cid]
+        now = time.perf_counter_ns()
+        kind = frame.get("type")
+        if kind == "message":
+            marker = f"{MARKER} {now} "
+            frame["content"] = marker + "x" * max(len(frame.get("content") or "") - len(marker), 0)
+        elif kind == "typing":
+            self.pending[("typing", cid, user_id)] = now
+        elif kind == "read":
+            self.pending[("read", cid)] = now
+        return frame
+
+    async def read(self, ws):
+        try:
+            async for raw in ws:
+                now = time.perf_counter_ns()
+                frame = json.loads(raw)
+                kind = frame.get("type")
+                if kind == "message" and (frame.get("content") or "").startswith(MARKER):
+                    self.latencies["message"].append((now - int(frame["content"].split()[1])) / 1e6)
+                elif kind == "typing":
+                    sent = self.pending.pop(("typing", frame["conversation_id"], frame["user_id"]), None)
+                    if sent is not None:
+                        self.latencies["typing"].append((now - sent) / 1e6)
+                elif kind == "conversation_update":
+                    sent = self.pending.pop(("read", frame["conversation_id"]), None)
+                    if sent is not None:
+                        self.latencies["read"].append((now - sent) / 1e6)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def finish(self):
+        for queue in self.queues.values():
+            queue.put_nowait((None, 0))
+        await asyncio.gather(*self.workers)
+
+
+def summarize(values) -> dict:
+    values = sorted(values)
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket 流量回放")
+    parser.add_argument("files", nargs="+", help="录制日志文件（WS_CAPTURE_DIR 下的 ws-*.log）")
+    parser.add_argument("--url", default="http://localhost:11075", help="WebSocket 服务地址（网关或开发服务）")
+    parser.add_argument("--api-url", help="REST 服务地址（默认同 --url）")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速，0 表示不等待")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的事件数，0 表示全部")
+    parser.add_argument("--tail", type=float, default=2.0, help="最后一个事件后等待投递的秒数")
+    parser.add_argument("--no-remap", action="store_true", help="保留原会话ID（目标库为线上数据副本时）")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    args = parser.parse_args()
+
+    events = load_events(args.files, args.limit)
+    if not events:
+        print("日志中没有事件")
+        return
+    roles, senders = plan_setup(events)
+    ws_url = args.url.replace("http://", "ws://").replace("https://", "wss://")
+    captured = events[-1]["t"] - events[0]["t"]
+    print(f"事件 {len(events)}，用户 {len(roles)}，会话 {len(senders)}，录制时长 {captured:.1f}s，倍速 {args.speed or '不限'}")
+
+    async with httpx.AsyncClient(base_url=args.api_url or args.url, timeout=60) as client:
+        mapping = await prepare(client, roles, senders, not args.no_remap)
+        replayer = Replayer(ws_url, mapping)
+        fanout_before = await scrape_fanout(client)
+
+        started = time.monotonic()
+        origin = events[0]["t"]
+        for entry in events:
+            due = started + (entry["t"] - origin) / args.speed if args.speed > 0 else time.monotonic()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            replayer.schedule(entry, due)
+        await asyncio.sleep(args.tail)
+        await replayer.finish()
+        elapsed = time.monotonic() - started
+        fanout = fanout_delta(fanout_before, await scrape_fanout(client))
+
+    result = {
+        "events": len(events),
+        "captured_seconds": round(captured, 1),
+        "replay_seconds": round(elapsed, 1),
+        "speed": args.speed,
+        "connects": replayer.connects,
+        "connect_failures": replayer.failed,
+        "frames_sent": dict(replayer.sent),
+        "lag": summarize(replayer.lags),
+        "latency": {kind: summarize(replayer.latencies[kind]) for kind in ("message", "typing", "read")},
+        "fanout": fanout,
+    }
+    print(f"回放耗时 {elapsed:.1f}s，连接 {replayer.connects}（失败 {replayer.failed}），发送帧 {dict(replayer.sent)}")
+    for name, stats in [("lag", result["lag"])] + list(result["latency"].items()):
+        print(f"    {name:<8} n={stats['n']:<6} p50={stats['p50_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms max={stats['max_ms']:8.2f}ms")
+    print("    fanout  " + "  ".join(f"{k}={v['mean_ms']:.3f}ms×{v['n']}" for k, v in sorted(fanout.items())))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
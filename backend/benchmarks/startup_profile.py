@@ -0,0 +1,96 @@
+"""
+冷启动耗时分析
+
+在独立子进程中测量 worker 冷启动（import main + lifespan 启动钩子），
+并用 python -X importtime 列出导入最慢的模块，超出预算时以非 0 状态码退出（可用于 CI）。
+
+使用方法（在 backend 目录下运行，需要 .env）：
+    python -m benchmarks.startup_profile
+    python -m benchmarks.startup_profile --top 30 --budget-ms 2000 --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# 子进程：测量导入耗时与启动钩子耗时（毫秒）
+MEASURE_SCRIPT = """
+import asyncio, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def run():
+    async with main.lifespan(main.app):
+        pass
+asyncio.run(run())
+ready = time.perf_counter()
+print(f"{(imported - started) * 1000:.1f} {(ready - imported) * 1000:.1f}")
+"""
+
+
+def measure(runs: int):
+    """多次冷启动，返回 [(导入毫秒, 启动钩子毫秒)]"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE_SCRIPT],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        import_ms, lifespan_ms = (float(part) for part in output.split())
+        results.append((import_ms, lifespan_ms))
+    return results
+
+
+def import_profile():
+    """python -X importtime 导入 main，返回 [(自身微秒, 累计微秒, 模块名)]"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # 模块名前的缩进表示嵌套层级（顶层模块无缩进）
+        rows.append((int(self_us), int(cumulative_us), name[1:].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动耗时与导入分析")
+    parser.add_argument("--runs", type=int, default=3, help="冷启动测量次数")
+    parser.add_argument("--top", type=int, default=20, help="列出最慢的模块数")
+    parser.add_argument("--budget-ms", type=int, default=None, help="冷启动预算（默认读取 STARTUP_BUDGET_MS）")
+    args = parser.parse_args()
+
+    budget_ms = args.budget_ms
+    if budget_ms is None:
+        from app.config import settings
+        budget_ms = settings.startup_budget_ms
+
+    rows = import_profile()
+    top_level = [row for row in rows if not row[2].startswith(" ")]
+    print(f"导入模块数: {len(rows)}  顶层模块累计: {sum(row[1] for row in top_level) / 1000:.1f}ms")
+    print(f"\n累计耗时最长的 {args.top} 个模块（含子模块）:")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name.strip()}")
+    print(f"\n自身耗时最长的 {args.top} 个模块:")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: row[0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms  {name.strip()}")
+
+    results = measure(args.runs)
+    totals = [import_ms + lifespan_ms for import_ms, lifespan_ms in results]
+    print(f"\n冷启动（{args.runs} 次）:")
+    print(f"  import main  中位数 {statistics.median(r[0] for r in results):8.1f}ms")
+    print(f"  lifespan     中位数 {statistics.median(r[1] for r in results):8.1f}ms")
+    print(f"  合计         中位数 {statistics.median(totals):8.1f}ms  最大 {max(totals):.1f}ms  预算 {budget_ms}ms")
+
+    if max(totals) > budget_ms:
+        print("❌ 超出冷启动预算")
+        sys.exit(1)
+    print("✅ 在冷启动预算内")
+
+
+if __name__ == "__main__":
+    main()
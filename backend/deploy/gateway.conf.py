@@ -0,0 +1,65 @@
+# ==================== WebSocket 网关 Gunicorn 配置 ====================
+# 启动：gunicorn gateway:app -c deploy/gateway.conf.py
+#
+# 网关只承载 /api/ws/{user_id}，与 REST（deploy/gunicorn.conf.py）分开部署和重启。
+# ConnectionManager 是进程内状态，网关必须单 worker；REST worker 通过 WS_EVENT_SOCKET 推送事件。
+
+# ==================== 基础配置 ====================
+
+# 监听地址和端口（Nginx 将 /api/ws/ 转发到此端口）
+bind = '0.0.0.0:11011'
+
+# 设置守护进程（False 可以交给 supervisor/systemd 管理）
+daemon = False
+
+# 进程命名（方便 ps 命令查看）
+proc_name = 'live_chat_gateway'
+
+# ==================== Worker 配置 ====================
+
+# 单 worker：所有连接和在线状态在同一进程内
+workers = 1
+
+# Worker 类型：使用 Uvicorn 的 ASGI Worker（支持 WebSocket）
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# ==================== 超时配置 ====================
+
+# Worker 心跳超时（秒）
+# UvicornWorker 下只检测 worker 进程是否存活，与单个连接时长无关
+timeout = 120
+
+# 优雅关闭超时（秒）
+# 重启/停止时给已连接客户端收尾的时间，客户端随后自动重连
+graceful_timeout = 30
+
+# ==================== 长连接 ====================
+
+# 不按请求数回收 worker：回收会断开该 worker 上的全部 WebSocket，引发重连风暴
+max_requests = 0
+
+# ==================== 日志配置 ====================
+
+# 设置进程文件目录
+pidfile = '/var/log/backend/gunicorn/pid/gateway.pid'
+
+# 访问日志（设置为 '-' 输出到 stdout）
+accesslog = '/var/log/backend/gunicorn/gateway_access.log'
+
+# 错误日志（设置为 '-' 输出到 stderr）
+errorlog = '/var/log/backend/gunicorn/gateway_error.log'
+
+# 日志级别：debug, info, warning, error, critical
+loglevel = 'info'
+
+# ==================== 钩子函数 ====================
+
+def on_starting(server):
+    """服务器启动时调用"""
+    # 在 fork worker 之前导入，child_exit 在信号处理中执行，不能在其中首次导入模块
+    import app.metrics  # noqa: F401
+
+def child_exit(server, worker):
+    """Worker 退出后调用：把其累计指标并入 METRICS_DIR/archive.json"""
+    import app.metrics
+    app.metrics.archive_worker(worker.pid)
@@ -38,6 +38,8 @@ keepalive = 5
 
 # 最大请求数（防止内存泄漏）
 # Worker 处理完指定数量的请求后会自动重启
+# WS_EVENT_SOCKET 为空（WebSocket 与 REST 同进程）时 on_starting 改为 0：回收会以 1012 断开
+# 该 worker 上的全部 WebSocket，且不经过 WS_DRAIN_WINDOW_MS 的分散重连
 max_requests = 1000
 max_requests_jitter = 100  # 随机偏移，避免所有 worker 同时重启
 
@@ -84,6 +86,21 @@ limit_request_field_size = 8190
 def on_starting(server):
     """服务器启动时调用"""
     print(f"Gunicorn 正在启动... (PID: {os.getpid()})")
+    # 在 fork worker 之前导入，child_exit 在信号处理中执行，不能在其中首次导入模块
+    import app.metrics  # noqa: F401
+    from app.config import settings
+    # 多 worker 时用户目录、快捷回复、最近消息缓存及 ETag 依赖共享目录中的版本文件失效，
+    # 未配置时各 worker 只看到自己的写入（响应与 ETag 不一致），拒绝启动
+    if server.cfg.workers > 1 and not settings.cache_invalidation_dir:
+        raise RuntimeError(
+            f"workers = {server.cfg.workers} 时必须配置 CACHE_INVALIDATION_DIR（跨 worker 缓存失效），"
+            "或改为 workers = 1"
+        )
+    # worker 持有 WebSocket 连接时不按请求数回收（与 deploy/gateway.conf.py 一致）
+    if not settings.ws_event_socket and server.cfg.max_requests:
+        server.cfg.set("max_requests", 0)
+        server.cfg.set("max_requests_jitter", 0)
+        print("WS_EVENT_SOCKET 未配置，WebSocket 由 REST worker 承载，已关闭 max_requests 回收")
 
 def on_reload(server):
     """重新加载配置时调用"""
@@ -101,6 +118,11 @@ def worker_abort(worker):
     """Worker 异常退出时调用"""
     print(f"Worker {worker.pid} 异常退出")
 
+def child_exit(server, worker):
+    """Worker 退出后调用：把其累计指标并入 METRICS_DIR/archive.json"""
+    import app.metrics
+    app.metrics.archive_worker(worker.pid)
+
 def post_worker_init(worker):
     """Worker 初始化完成后调用"""
     print(f"Worker {worker.pid} 已启动")
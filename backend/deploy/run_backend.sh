@@ -4,20 +4,24 @@ echo "======================================"
 echo "  Live Chat Backend Startup Script"
 echo "======================================"
 # 1. 创建日志目录
-echo "[1/4] 创建日志目录..."
+echo "[1/5] 创建日志目录..."
 mkdir -p /var/log/backend/gunicorn/pid
 # 2. 安装依赖
-echo "[2/4] 安装 Python 依赖..."
+echo "[2/5] 安装 Python 依赖..."
 pip install -i https://mirrors.aliyun.com/pypi/simple/ -r requirements.txt
 # 3. 数据库迁移
-echo "[3/4] 应用数据库迁移..."
+echo "[3/5] 应用数据库迁移..."
 # alembic upgrade head 会自动判断：
 # - 如果是全新数据库 → 创建所有表
 # - 如果已是最新版本 → 不做任何操作
 # - 如果版本落后 → 执行必要的升级
 alembic upgrade head
-# 4. 启动 Gunicorn 服务
-echo "[4/4] 启动 Gunicorn + Uvicorn 服务..."
+# 4. 写入内置数据（只执行一次，worker 启动时不再访问数据库做初始化检查）
+echo "[4/5] 写入内置数据..."
+python seed_data.py
+export SEED_ON_STARTUP=False
+# 5. 启动 Gunicorn 服务
+echo "[5/5] 启动 Gunicorn + Uvicorn 服务..."
 echo "配置文件: deploy/gunicorn.conf.py"
 echo "Worker 类型: uvicorn.workers.UvicornWorker"
 # 使用配置文件启动
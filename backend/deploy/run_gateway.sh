@@ -0,0 +1,15 @@
+#!/bin/bash
+set -e
+echo "======================================"
+echo "  Live Chat WebSocket Gateway Startup"
+echo "======================================"
+# 1. 创建日志目录
+echo "[1/3] 创建日志目录..."
+mkdir -p /var/log/backend/gunicorn/pid
+# 2. 安装依赖
+echo "[2/3] 安装 Python 依赖..."
+pip install -i https://mirrors.aliyun.com/pypi/simple/ -r requirements.txt
+# 3. 启动网关（数据库迁移和内置数据由 run_backend.sh 负责）
+echo "[3/3] 启动 WebSocket 网关..."
+echo "配置文件: deploy/gateway.conf.py"
+gunicorn gateway:app -c deploy/gateway.conf.py
@@ -0,0 +1,103 @@
+"""
+WebSocket 网关入口
+
+只承载 /api/ws/{user_id} 和 ConnectionManager，与 REST worker（main.py）分开部署：
+    - REST worker 可按 max_requests 回收、随意扩缩容，不会断开任何 WebSocket
+    - 网关单进程持有全部连接（ConnectionManager 为进程内状态），不设置 max_requests
+    - REST worker 产生的通知通过 WS_EVENT_SOCKET（Unix socket）推送到网关
+
+启动方式：
+    开发：python gateway.py（同时以 WS_EVENT_SOCKET 启动 main.py）
+    生产：gunicorn gateway:app -c deploy/gateway.conf.py
+"""
+import time
+
+# 冷启动计时起点（进程导入 gateway 模块）
+_STARTUP_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+from fastapi import FastAPI
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+from app.config import settings
+from app.database import dispose_engines
+from app.events import start_event_server
+from app.loop_monitor import loop_monitor
+from app.ws_capture import recorder
+from app.metrics import registry
+from app.routers import ws
+from app.websocket import manager, install_drain_on_exit
+
+if not settings.ws_event_socket:
+    raise ValueError("WS_EVENT_SOCKET 环境变量为空，网关模式必须配置事件通道 socket 路径")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """网关生命周期：启动/关闭事件通道"""
+    event_server = await start_event_server(settings.ws_event_socket)
+    # 重启/停止时先排空连接，客户端按随机退避分散重连
+    install_drain_on_exit(settings.ws_drain_window_ms)
+    # 连接数、推送耗时等指标写入 METRICS_DIR，由 REST 的 /api/metrics 汇总
+    metrics_flusher = asyncio.create_task(registry.flush_forever())
+    # 网关事件循环阻塞会直接推迟所有实时推送
+    loop_monitor.start()
+
+    startup_ms = (time.perf_counter() - _STARTUP_STARTED) * 1000
+    logger.info("WebSocket 网关启动耗时 %.0fms（pid=%d）", startup_ms, os.getpid())
+
+    yield
+
+    loop_monitor.stop()
+    recorder.close()
+    metrics_flusher.cancel()
+    registry.flush()
+    event_server.close()
+    await event_server.wait_closed()
+    if os.path.exists(settings.ws_event_socket):
+        os.unlink(settings.ws_event_socket)
+    await dispose_engines()
+
+
+app = FastAPI(
+    title=f"{settings.app_title} WebSocket 网关",
+    version=settings.app_version,
+    lifespan=lifespan,
+    docs_url=None,
+    redoc_url=None,
+    openapi_url=None,
+)
+
+app.include_router(ws.router)
+
+
+@app.get("/api/ws-health")
+async def health_check():
+    """网关健康检查"""
+    return {
+        "status": "healthy",
+        "connections": len(manager.active_connections),
+        "draining": manager.draining,
+        "admission": ws.admission.stats(),
+        "loop": loop_monitor.stats(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "gateway:app",
+        host=settings.host,
+        port=settings.ws_gateway_port,
+        reload=settings.reload
+    )
@@ -1,10 +1,12 @@
 """
-生成默认头像
+生成预设头像（管理员、客服等固定头像）
 使用 PIL/Pillow 生成彩色背景 + 文字的头像
+
+说明：普通用户无需运行此脚本，默认头像由 /api/media/avatars/generated/{user_id}.png 接口按需生成
 """
-from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
-import os
+
+from app.avatar import render_avatar, DEFAULT_AVATAR_SIZE
 
 # 创建头像目录（同时创建到 static/avatars 和 media/avatars）
 STATIC_AVATAR_DIR = Path("static/avatars")
@@ -14,22 +16,7 @@ STATIC_AVATAR_DIR.mkdir(parents=True, exist_ok=True)
 MEDIA_AVATAR_DIR.mkdir(parents=True, exist_ok=True)
 
 # 头像配置
-AVATAR_SIZE = 200  # 头像尺寸
-FONT_SIZE = 80     # 字体大小
-
-# 预设颜色方案（背景色）
-COLORS = [
-    "#FF6B6B",  # 红色
-    "#4ECDC4",  # 青色
-    "#45B7D1",  # 蓝色
-    "#FFA07A",  # 橙色
-    "#98D8C8",  # 薄荷绿
-    "#F7DC6F",  # 黄色
-    "#BB8FCE",  # 紫色
-    "#85C1E2",  # 天蓝色
-    "#F8B739",  # 金色
-    "#52B788",  # 绿色
-]
+AVATAR_SIZE = DEFAULT_AVATAR_SIZE  # 头像尺寸
 
 # 预设头像列表
 AVATARS = [
@@ -46,12 +33,6 @@ AVATARS = [
 ]
 
 
-def hex_to_rgb(hex_color):
-    """将十六进制颜色转换为 RGB"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-
-
 def generate_avatar(text, color, filename):
     """
     生成头像
@@ -61,45 +42,7 @@ def generate_avatar(text, color, filename):
         color: 背景颜色（十六进制）
         filename: 保存的文件名
     """
-    # 创建图像
-    img = Image.new('RGB', (AVATAR_SIZE, AVATAR_SIZE), hex_to_rgb(color))
-    draw = ImageDraw.Draw(img)
-    
-    # 尝试使用系统字体，如果失败则使用默认字体
-    try:
-        # Windows 系统字体
-        font = ImageFont.truetype("msyh.ttc", FONT_SIZE)  # 微软雅黑
-    except:
-        try:
-            # Linux/Mac 系统字体
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", FONT_SIZE)
-        except:
-            # 使用默认字体
-            font = ImageFont.load_default()
-    
-    # 计算文字位置（居中）
-    bbox = draw.textbbox((0, 0), text, font=font)
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-    
-    position = (
-        (AVATAR_SIZE - text_width) // 2,
-        (AVATAR_SIZE - text_height) // 2 - 5  # 稍微向上调整
-    )
-    
-    # 绘制文字（白色）
-    draw.text(position, text, fill=(255, 255, 255), font=font)
-    
-    # 添加圆角效果（可选）
-    # 创建圆角遮罩
-    mask = Image.new('L', (AVATAR_SIZE, AVATAR_SIZE), 0)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
-    
-    # 创建圆形头像
-    output = Image.new('RGBA', (AVATAR_SIZE, AVATAR_SIZE), (0, 0, 0, 0))
-    output.paste(img, (0, 0))
-    output.putalpha(mask)
+    output = render_avatar(text, color, AVATAR_SIZE)
     
     # 保存图像（保存到两个目录）
     static_path = STATIC_AVATAR_DIR / filename
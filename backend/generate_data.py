@@ -0,0 +1,280 @@
+"""
+批量生成规模测试数据的命令行工具
+
+按生产环境的数据形态生成用户、会话、消息，用于在本地验证索引、分页和列表接口在大数据量下的表现：
+    - 用户：买家 + 少量商家（--merchant-ratio），ID 以 --prefix 开头，可与已有数据共存
+    - 会话：商家按 Zipf 分布被选中（--skew 越大越集中），少数商家拥有巨量会话
+    - 消息：会话活跃度按 Pareto 分布，少数会话占大部分消息；时间在 --days 天内递增，
+      类型按 文本 90% / 图片 7% / 文件 3%；最近 --unread-ratio 比例的消息为未读
+会话的最后消息、未读数、已读标记与生成的消息一致（先模拟一遍消息流统计，再写入）。
+
+写入使用多行 INSERT（每批 --batch 行，每批提交一次）并显示进度。生成前检查 --prefix 是否已被使用。
+目标库为 .env 中的 DATABASE_URL，表结构需已由 alembic upgrade head 创建。
+
+使用方法：
+    python generate_data.py --users 200000 --conversations 500000 --messages 10000000
+    python generate_data.py --users 2000 --conversations 5000 --messages 200000 --prefix dev --yes
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, func, insert
+from app.avatar import generated_avatar_path
+from app.database import engine
+from app.models import User, UserRole, Conversation, Message, MessageType
+from app.utils import build_full_url
+
+TEXTS = [
+    "你好，请问这款还有货吗？",
+    "在的，亲，有货的",
+    "什么时候能发货？",
+    "今天下单明天就能发出",
+    "可以便宜一点吗",
+    "已经是活动价了哦",
+    "好的，我拍下了",
+    "收到，马上为您安排",
+    "物流到哪里了？",
+    "我帮您查一下物流信息",
+    "尺码偏大还是偏小？",
+    "正常尺码，按平时穿的选就可以",
+    "收到货了，质量很好",
+    "感谢支持，欢迎再次光临",
+    "能开发票吗？",
+    "可以的，请提供抬头和税号",
+]
+
+# (类型, 累计权重)
+TYPE_MIX = [(MessageType.TEXT, 0.90), (MessageType.IMAGE, 0.97), (MessageType.FILE, 1.0)]
+LAST_MESSAGE_TEXT = {MessageType.IMAGE: "[图片]", MessageType.FILE: "[文件]"}
+
+
+def progress(label: str, done: int, total: int, started: float):
+    """单行刷新的进度（行数、速率、预计剩余时间）"""
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0
+    remaining = (total - done) / rate if rate > 0 else 0
+    print(
+        f"\r  {label}: {done}/{total} ({done * 100 // max(total, 1)}%)  {rate:,.0f} 行/秒  剩余 {remaining:.0f}s   ",
+        end="", flush=True,
+    )
+    if done >= total:
+        print()
+
+
+async def insert_batches(model, rows, total: int, batch: int, label: str):
+    """分批多行插入，每批提交一次"""
+    started = time.perf_counter()
+    done = 0
+    async with engine.connect() as conn:
+        while True:
+            chunk = list(itertools.islice(rows, batch))
+            if not chunk:
+                break
+            await conn.execute(insert(model), chunk)
+            await conn.commit()
+            done += len(chunk)
+            progress(label, done, total, started)
+    if total == 0:
+        print(f"  {label}: 0")
+
+
+class Generator:
+    """数据规模与随机分布（同一 seed 两次模拟得到相同的消息流）"""
+
+    def __init__(self, args, conversation_base: int, message_base: int):
+        self.args = args
+        self.conversation_base = conversation_base
+        self.message_base = message_base
+        self.now = int(time.time())
+        self.start = self.now - args.days * 86400
+        self.cutoff = self.now - int(args.days * 86400 * args.unread_ratio)
+
+        merchants = max(int(args.users * args.merchant_ratio), 1)
+        self.merchants = [f"{args.prefix}_m{i}" for i in range(merchants)]
+        self.buyers = [f"{args.prefix}_b{i}" for i in range(args.users - merchants)]
+
+        rng = random.Random(args.seed)
+        self.pairs = self._pairs(rng)
+        # 会话活跃度（Pareto）的累计权重，用于按权重抽取消息所属会话
+        self.activity = list(itertools.accumulate(rng.paretovariate(1.1) for _ in self.pairs))
+
+    def _pairs(self, rng: random.Random):
+        """(买家, 商家) 会话列表，商家按 Zipf 分布，同一对只有一个会话"""
+        weights = list(itertools.accumulate(1 / (k + 1) ** self.args.skew for k in range(len(self.merchants))))
+        limit = len(self.buyers) * len(self.merchants)
+        if self.args.conversations > limit:
+            raise ValueError(f"会话数超过买家×商家组合数 {limit}")
+        seen = set()
+        pairs = []
+        while len(pairs) < self.args.conversations:
+            merchant = bisect.bisect(weights, rng.random() * weights[-1])
+            buyer = rng.randrange(len(self.buyers))
+            if (buyer, merchant) not in seen:
+                seen.add((buyer, merchant))
+                pairs.append((self.buyers[buyer], self.merchants[merchant]))
+        return pairs
+
+    def message_stream(self):
+        """按时间顺序产生 (序号, 会话下标, 是否买家发送, 类型, 时间戳)"""
+        rng = random.Random(self.args.seed + 1)
+        total = self.args.messages
+        span = self.now - self.start
+        for i in range(total):
+            index = min(bisect.bisect(self.activity, rng.random() * self.activity[-1]), len(self.pairs) - 1)
+            from_buyer = rng.random() < 0.55
+            roll = rng.random()
+            kind = next(t for t, w in TYPE_MIX if roll < w)
+            yield i, index, from_buyer, kind, self.start + span * i // total
+
+    def content(self, i: int, kind: MessageType, timestamp: int) -> str:
+        if kind == MessageType.TEXT:
+            return TEXTS[i % len(TEXTS)]
+        day = datetime.fromtimestamp(timestamp).strftime("%Y/%m/%d")
+        name = f"image_{i}.jpg" if kind == MessageType.IMAGE else f"file_{i}.pdf"
+        return build_full_url(f"/api/media/uploads/{day}/{name}")
+
+    def user_rows(self):
+        for role, ids in ((UserRole.MERCHANT, self.merchants), (UserRole.BUYER, self.buyers)):
+            label = "商家" if role == UserRole.MERCHANT else "买家"
+            for i, user_id in enumerate(ids):
+                yield {
+                    "id": user_id,
+                    "username": f"{label}{user_id}",
+                    "avatar": generated_avatar_path(user_id),
+                    "role": role,
+                    "status": "active",
+                    "created_at": self.start,
+                }
+
+    def conversation_rows(self):
+        """先模拟一遍消息流，得到每个会话的最后消息、未读数和已读标记"""
+        n = len(self.pairs)
+        first = [0] * n
+        last = [-1] * n
+        last_read = [-1] * n
+        buyer_unread = [0] * n
+        merchant_unread = [0] * n
+        last_kind = [MessageType.TEXT] * n
+        started = time.perf_counter()
+        for i, index, from_buyer, kind, timestamp in self.message_stream():
+            if last[index] < 0:
+                first[index] = timestamp
+            last[index] = i
+            last_kind[index] = kind
+            if timestamp <= self.cutoff:
+                last_read[index] = i
+            elif from_buyer:
+                merchant_unread[index] += 1
+            else:
+                buyer_unread[index] += 1
+            if i % 200000 == 0:
+                progress("统计消息分布", i, self.args.messages, started)
+        progress("统计消息分布", self.args.messages, self.args.messages, started)
+
+        span = self.now - self.start
+        for index, (buyer, merchant) in enumerate(self.pairs):
+            if last[index] >= 0:
+                i = last[index]
+                last_time = self.start + span * i // self.args.messages
+                kind = last_kind[index]
+                last_message = LAST_MESSAGE_TEXT.get(kind) or self.content(i, kind, last_time)[:100]
+                created_at = first[index]
+            else:
+                last_time = None
+                last_message = None
+                created_at = self.start
+            read_id = self.message_base + last_read[index] if last_read[index] >= 0 else 0
+            yield {
+                "id": self.conversation_base + index,
+                "participant1_id": buyer,
+                "participant2_id": merchant,
+                "participant1_unread": buyer_unread[index],
+                "participant2_unread": merchant_unread[index],
+                "participant1_last_read_id": read_id,
+                "participant2_last_read_id": read_id,
+                "last_message": last_message,
+                "last_message_time": last_time,
+                "created_at": created_at,
+                "updated_at": last_time or created_at,
+            }
+
+    def message_rows(self):
+        for i, index, from_buyer, kind, timestamp in self.message_stream():
+            buyer, merchant = self.pairs[index]
+            yield {
+                "id": self.message_base + i,
+                "conversation_id": self.conversation_base + index,
+                "sender_id": buyer if from_buyer else merchant,
+                "content": self.content(i, kind, timestamp),
+                "message_type": kind,
+                "is_read": timestamp <= self.cutoff,
+                "created_at": timestamp,
+            }
+
+
+async def generate(args):
+    # 批量写入时关闭 SQL 日志（DEBUG_SQL=True 时每批语句都会完整输出）
+    engine.sync_engine.echo = False
+
+    async with engine.connect() as conn:
+        used = await conn.scalar(
+            select(func.count()).select_from(User).where(User.id.startswith(f"{args.prefix}_", autoescape=True))
+        )
+        if used:
+            print(f"❌ 错误：已存在 {used} 个以 '{args.prefix}_' 开头的用户，请更换 --prefix")
+            return False
+        conversation_base = (await conn.scalar(select(func.max(Conversation.id))) or 0) + 1
+        message_base = (await conn.scalar(select(func.max(Message.id))) or 0) + 1
+
+    generator = Generator(args, conversation_base, message_base)
+    started = time.perf_counter()
+    await insert_batches(User, generator.user_rows(), args.users, args.batch, "用户")
+    await insert_batches(Conversation, generator.conversation_rows(), args.conversations, args.batch, "会话")
+    await insert_batches(Message, generator.message_rows(), args.messages, args.batch, "消息")
+
+    top = Counter(merchant for _, merchant in generator.pairs).most_common(3)
+    print(f"\n✅ 生成完成，耗时 {time.perf_counter() - started:.1f}s")
+    print(f"   用户: {args.users}（商家 {len(generator.merchants)}）")
+    print(f"   会话: {args.conversations}（ID 从 {conversation_base} 开始）")
+    print(f"   消息: {args.messages}（ID 从 {message_base} 开始）")
+    print(f"   会话最多的商家: {', '.join(f'{merchant}（{n}）' for merchant, n in top)}")
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="批量生成规模测试数据")
+    parser.add_argument("--users", type=int, default=200000, help="用户数（含商家）")
+    parser.add_argument("--merchant-ratio", type=float, default=0.01, help="商家占用户比例")
+    parser.add_argument("--conversations", type=int, default=500000, help="会话数")
+    parser.add_argument("--messages", type=int, default=10000000, help="消息数")
+    parser.add_argument("--skew", type=float, default=1.2, help="商家会话分布的 Zipf 指数")
+    parser.add_argument("--days", type=int, default=180, help="消息时间跨度（天）")
+    parser.add_argument("--unread-ratio", type=float, default=0.01, help="未读消息占时间跨度的比例")
+    parser.add_argument("--batch", type=int, default=5000, help="每批插入行数")
+    parser.add_argument("--prefix", default="gen", help="生成用户的ID前缀")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    parser.add_argument("--yes", action="store_true", help="不确认直接写入")
+    args = parser.parse_args()
+
+    print(f"目标数据库: {engine.url.render_as_string(hide_password=True)}")
+    print(f"将生成 用户 {args.users} / 会话 {args.conversations} / 消息 {args.messages}")
+    if not args.yes and input("确认写入？(y/N): ").strip().lower() != "y":
+        print("已取消")
+        return
+
+    try:
+        success = await generate(args)
+    finally:
+        await engine.dispose()
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
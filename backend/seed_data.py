@@ -0,0 +1,26 @@
+"""
+写入内置测试数据的命令行工具
+
+作为部署步骤在 alembic upgrade head 之后执行一次，worker 启动时不再检查和写入数据
+（此时应设置 SEED_ON_STARTUP=False）。已有用户数据时不做任何操作。
+
+使用方法：
+    python seed_data.py
+"""
+import asyncio
+from app.database import engine
+from app.seed import initialize_data
+
+
+async def main():
+    try:
+        if await initialize_data():
+            print("✅ 内置数据初始化完成")
+        else:
+            print("✅ 已有用户数据，跳过初始化")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
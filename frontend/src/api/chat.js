@@ -71,6 +71,11 @@ export default Object.assign(api, {
     })
   },
 
+  // 增量同步：since 为上次返回的 next_since，has_more 为 true 时继续请求
+  sync(params) {
+    return api.get('/sync', { params })
+  },
+
   // 消息相关
   getMessages(conversationId, params = {}) {
     // 支持分页参数
@@ -78,7 +83,8 @@ export default Object.assign(api, {
       params: { 
         page: params.page || 1,
         page_size: params.page_size || 50,
-        order: params.order || 'desc'
+        order: params.order || 'desc',
+        senders: params.senders || false  // 为 true 时发送者以 senders 边表返回
       }
     })
   },
@@ -24,6 +24,9 @@ export const useChatStore = defineStore('chat', () => {
   const quickReplies = ref([])
   const ws = ref(null)
   const isConnected = ref(false)
+  let hasConnected = false     // 是否已成功连接过（用于判断重连）
+  let syncWatermark = null     // 增量同步水位线（/api/sync 返回的 next_since）
+  let reconnectDelay = null    // 服务端 reconnect 帧给出的重连等待时间（毫秒）
   
   // 在线用户状态
   const onlineUsers = ref(new Set())  // 在线用户ID集合
@@ -148,7 +151,8 @@ export const useChatStore = defineStore('chat', () => {
       const response = await api.getMessages(conversationId, { 
         page, 
         page_size: pageSize.value,
-        order: 'desc' // 降序获取（最新在前）
+        order: 'desc', // 降序获取（最新在前）
+        senders: true  // 聊天界面按 sender_id 渲染头像，无需每条消息内嵌发送者
       })
       
       totalMessages.value = response.count
@@ -225,8 +229,7 @@ export const useChatStore = defineStore('chat', () => {
         }))
       }
 
-      // 异步更新会话列表（不阻塞 UI）
-      loadConversations().catch(err => console.error('更新会话列表失败:', err))
+      // 会话列表由服务端推送的 conversation_update 就地更新，无需重新加载
     } catch (error) {
       console.error('发送消息失败:', error)
       
@@ -406,6 +409,11 @@ export const useChatStore = defineStore('chat', () => {
     ws.value.onopen = () => {
       console.log('WebSocket 连接成功')
       isConnected.value = true
+      // 重连后增量补齐断线期间的变化，而不是重新拉取会话列表和消息
+      if (hasConnected) {
+        syncSince()
+      }
+      hasConnected = true
     }
 
     ws.value.onmessage = (event) => {
@@ -420,8 +428,10 @@ export const useChatStore = defineStore('chat', () => {
     ws.value.onclose = () => {
       console.log('WebSocket 连接关闭')
       isConnected.value = false
-      // 5秒后重连
-      setTimeout(connectWebSocket, 5000)
+      // 服务端排空时按其给出的随机退避重连；否则 5~10 秒随机重连，避免所有客户端同时重连
+      const delay = reconnectDelay !== null ? reconnectDelay : 5000 + Math.random() * 5000
+      reconnectDelay = null
+      setTimeout(connectWebSocket, delay)
     }
   }
 
@@ -461,21 +471,24 @@ export const useChatStore = defineStore('chat', () => {
             is_read: shouldMarkAsRead // 如果正在查看且是别人发的且不是管理员，标记为已读
           })
           
-          // 如果需要标记为已读，先调用 API 更新数据库，再更新会话列表
+          // 如果需要标记为已读，调用 API 更新数据库（会同步更新本地会话列表的未读数）
           if (shouldMarkAsRead) {
-            // 等待标记已读完成（会同步更新本地会话列表的未读数）
             await markAsRead(data.conversation_id).catch(err => {
               console.error('标记已读失败:', err)
             })
           }
-          
-          // 更新会话列表（更新最后一条消息和时间）
-          // 如果已标记为已读，此时会话的未读数应该是0
-          await loadConversations()
-        } else {
-          // 不是当前会话，只需更新会话列表
-          await loadConversations()
         }
+        // 会话列表的最后消息、未读数由 conversation_update 推送更新
+        break
+
+      case 'reconnect':
+        // 服务端即将重启：记录退避时间，连接关闭后按此时间重连
+        reconnectDelay = data.retry_after_ms
+        break
+
+      case 'conversation_update':
+        // 会话摘要变更（新消息、已读），就地更新会话列表
+        applyConversationUpdate(data)
         break
 
       case 'read':
@@ -515,6 +528,90 @@ export const useChatStore = defineStore('chat', () => {
     }
   }
 
+  function applyConversationUpdate(data) {
+    const conv = conversations.value.find(c => c.id === data.conversation_id)
+    if (!conv) {
+      // 列表中还没有该会话（新会话或不在当前页），重新加载列表
+      loadConversations().catch(err => console.error('更新会话列表失败:', err))
+      return
+    }
+
+    conv.participant1_unread = data.participant1_unread
+    conv.participant2_unread = data.participant2_unread
+    conv.last_message = data.last_message
+    conv.last_message_time = data.last_message_time
+    conv.updated_at = data.updated_at
+
+    // 保持与接口一致的排序（最近更新在前）
+    conversations.value.sort((a, b) => (b.updated_at || 0) - (a.updated_at || 0))
+  }
+
+  function initialSyncWatermark() {
+    // 以已加载数据为起点：会话最大 updated_at（回退 5 秒）与当前会话最大消息 ID
+    const maxUpdatedAt = conversations.value.reduce((max, c) => Math.max(max, c.updated_at || 0), 0)
+    const maxMessageId = messages.value.reduce((max, m) => Math.max(max, m.id || 0), 0)
+    return `${Math.max(maxUpdatedAt - 5, 0)}.0.${maxMessageId}.0.0`
+  }
+
+  async function syncSince() {
+    // 管理员查看全部会话，不走按用户的增量同步
+    if (!userId.value || currentUser.value?.role === 'admin') {
+      return
+    }
+
+    try {
+      let since = syncWatermark || initialSyncWatermark()
+      let response
+      do {
+        response = await api.sync({ user_id: currentUser.value.id, since })
+        applySyncResponse(response)
+        since = response.next_since
+      } while (response.has_more)
+      syncWatermark = since
+    } catch (error) {
+      console.error('增量同步失败:', error)
+    }
+  }
+
+  function applySyncResponse(response) {
+    // 1. 合并会话
+    response.conversations.forEach(updated => {
+      const index = conversations.value.findIndex(c => c.id === updated.id)
+      if (index === -1) {
+        conversations.value.push(updated)
+      } else {
+        conversations.value[index] = updated
+      }
+    })
+    conversations.value.sort((a, b) => (b.updated_at || 0) - (a.updated_at || 0))
+
+    const current = currentConversation.value
+    if (!current) {
+      return
+    }
+
+    // 2. 当前会话的新消息（按 id 去重）；新消息过多时直接重新加载首页
+    if (response.truncated_conversation_ids.includes(current.id)) {
+      loadMessages(current.id, 1)
+    } else {
+      const known = new Set(messages.value.map(m => m.id))
+      response.messages
+        .filter(m => m.conversation_id === current.id && !known.has(m.id))
+        .forEach(m => messages.value.push(m))
+    }
+
+    // 3. 已读标记：对方已读到的位置之前，自己发送的消息标记为已读
+    response.read_markers
+      .filter(r => r.conversation_id === current.id && r.reader_id !== currentUser.value.id)
+      .forEach(r => {
+        messages.value.forEach(msg => {
+          if (msg.sender_id === currentUser.value.id && msg.id <= r.last_read_id) {
+            msg.is_read = true
+          }
+        })
+      })
+  }
+
   function disconnectWebSocket() {
     if (ws.value) {
       ws.value.close()
@@ -555,6 +652,7 @@ export const useChatStore = defineStore('chat', () => {
     loadQuickReplies,
     connectWebSocket,
     disconnectWebSocket,
+    syncSince,  // 增量同步（重连时自动调用）
     // 消息分页相关
     loadMoreMessages,
     hasMoreMessages,